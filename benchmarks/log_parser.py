@@ -0,0 +1,243 @@
+#! /usr/bin/env python
+#
+# benchmarks/log_parser.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Compares the time taken to read the summary and the X blocks of large SDPT3
+logs by the single scan parser of sdpt3glue.result and by the line by line
+parser it replaced, and checks that both read the same values.
+
+Usage:
+    python benchmarks/log_parser.py [--sizes N ...] [LOG.txt ...]
+
+Without log files, logs with an N x N X block (and a y and an N x N Z
+block) are made up for each of sizes.
+"""
+from __future__ import absolute_import
+import argparse
+import os
+import re
+import sys
+import time
+from StringIO import StringIO
+
+import numpy as np
+
+import sdpt3glue.result as res
+
+
+LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, "tests", "data", "sdpt3_log.txt")
+
+
+def legacy_extract_prop_dict(msg):
+    '''
+    result.extract_prop_dict as it was before the single scan parser: the
+    regular expression runs over the whole log, blocks included.
+    '''
+    result_dict = {}
+    for key in res._KEY_LIST.values():
+        result_dict[key] = None
+
+    line_pattern = re.compile(
+        r'\w[ \w:=.()]*[ \<\>]*=[ <>]*[ \d\.\-+e]*[\d\.\-+e]')
+    phrase_pattern = re.compile(r'[\w\d\.\-+()][ \w\d\.\-+()]*')
+
+    line_list = line_pattern.findall(msg)
+    for line in line_list:
+        line_parts = phrase_pattern.findall(line)
+        key = line_parts[0].rstrip().replace("dual  ", "dual")
+        val = res.handle_msg_item(line_parts[-1].strip())
+
+        if key in res._KEY_LIST and res._KEY_LIST[key] is not None:
+            result_dict[res._KEY_LIST[key]] = val
+    return result_dict
+
+
+def legacy_extract_X(msg):
+    '''
+    result.extract_X as it was before the single scan parser, parsing one
+    number at a time.
+    '''
+    # First pull out the definitions.  Each starts with 'X{numbers} ='
+    # and we'll keep grabbing text until we hit any of the characters >, <, *,
+    # or X
+    var_pattern = re.compile(r'X\{[\d]*\} =[^><\*X]*')
+    var_list = var_pattern.findall(msg)
+
+    # Xlist will hold the solution variables or matrices
+    Xlist = [None] * len(var_list)
+
+    for i, Xmsg in enumerate(var_list):
+        # Drop the "X{something} =" and strip extra whitespace
+        Xstart = Xmsg.find('=') + 1
+        Xmsg = Xmsg[Xstart:].strip()
+
+        # From Xmsg we can judge if the current variable is a matrix displaying in chunks
+        # due to display width constraints, a matrix displaying all in one chunk,
+        # or a scalar.
+        if 'Column' in Xmsg:
+            # If X[i] is a chunked matrix, each chunk has a header containing 'Column'
+            # Split the data into chunks
+            chunk_pattern = re.compile('Column[^C]*')
+            chunk_list = chunk_pattern.findall(Xmsg)
+
+            # Use regular expressions to split the data into header parts and
+            # data parts
+            header = re.compile(r'Columns* [\d]+[ through [\d]+]?')
+            header_list = header.findall(Xmsg)
+            chunk_list = header.split(Xmsg)[1:]  # drop the first, which is ''
+            assert len(header_list) == len(chunk_list)
+
+            # Find out how many columns the matrix has by grabbing the last column number
+            # from the last header
+            int_pattern = re.compile(r'\d[\d]*')
+            int_list = int_pattern.findall(header_list[-1])
+            cols = int(int_list[-1])
+            # We'll count rows and initialize the matrix during the processing of
+            # the first chunk.
+
+            # Take a matching header and chunk and place the chunk's data in
+            # the columns of Xlist[i] which are indicated by the header.
+            for header, chunk in zip(header_list, chunk_list):
+                # Grab the column numbers from the header, note the first one. It's
+                # the start column we'll use to place the chunk's data in the
+                # matrix.
+                int_list = [int(x) for x in int_pattern.findall(header)]
+                col_start = int_list[0] - 1
+
+                # Split the chunk into rows
+                chunk = chunk.strip()
+                chunk = re.sub(' *\n *', '\n', chunk)
+                chunk_lines = chunk.split('\n')
+
+                # Initialize the matrix now if it hasn't been done yet.
+                if Xlist[i] is None:
+                    rows = len(chunk_lines)
+                    Xlist[i] = np.zeros((rows, cols))
+
+                # Plug the row's data into the matrix
+                for row, line in enumerate(chunk_lines):
+                    for k, item in enumerate(re.split(r'\s+', line)):
+                        Xlist[i][row, col_start + k] = float(item)
+            print "Imported X[{0}] as a matrix with shape {1}.".format(i, Xlist[i].shape)
+
+        elif ' ' in Xmsg or '\n' in Xmsg:
+            # Otherwise if it has spaces or line breaks it's a non-chunked
+            # matrix
+            Xmsg = Xmsg.strip()
+            Xmsg = re.sub(' +', ' ', Xmsg)
+            Xmsg = re.sub(' *\n *', '\n', Xmsg)
+            Xmsg_lines = Xmsg.split('\n')
+
+            # Initialize the matrix.
+            rows = len(Xmsg_lines)
+            cols = len(Xmsg_lines[0].split())
+            Xlist[i] = np.zeros((rows, cols))
+
+            # Plug the row's data into the matrix
+            for row, line in enumerate(Xmsg_lines):
+                for k, item in enumerate(re.split(r'\s+', line.strip())):
+                    Xlist[i][row, k] = float(item)
+            print "Imported X[{0}] as a matrix with shape {1}.".format(i, Xlist[i].shape)
+
+        else:
+            # Otherwise it's a scalar
+            Xlist[i] = float(Xmsg)
+            print "Imported X[{0}] as a scalar.".format(i)
+
+    return Xlist
+
+
+def make_log(size, seed=0):
+    '''
+    Returns the text of a log with the summary of the test log and an X, a
+    y and a Z block as SDPT3report prints them, X and Z being size x size.
+    '''
+    rng = np.random.RandomState(seed)
+    with open(LOG_PATH) as fp:
+        summary = fp.read().split("X{1} =")[0]
+    parts = [summary]
+    for header, shape in (("X{1} =", (size, size)), ("y =", (size, 1)),
+                          ("Z{1} =", (size, size))):
+        block = rng.randn(*shape)
+        rows = "\n".join(" ".join("%.15g" % x for x in row) for row in block)
+        parts.append("{0}\n{1}\n>>\n".format(header, rows))
+    return "".join(parts)
+
+
+def best_time(func, text, repeat):
+    '''
+    Returns the best of repeat wall clock times of func(text), with its
+    prints silenced, and its value.
+    '''
+    best = None
+    for _ in range(repeat):
+        stdout, sys.stdout = sys.stdout, StringIO()
+        try:
+            start = time.time()
+            value = func(text)
+            elapsed = time.time() - start
+        finally:
+            sys.stdout = stdout
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+
+def same_blocks(first, second):
+    ''' Whether two lists of blocks hold the same values. '''
+    return len(first) == len(second) and all(
+        np.array_equal(a, b) for a, b in zip(first, second))
+
+
+def main():
+    """ The main function.
+
+    Returns:
+      exit code.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("logs", nargs="*")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[100, 300, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.logs:
+        cases = []
+        for path in args.logs:
+            with open(path) as fp:
+                cases.append((os.path.basename(path), fp.read()))
+    else:
+        cases = [("n = {0}".format(size), make_log(size))
+                 for size in args.sizes]
+
+    status = 0
+    print "{0:20} {1:>8} {2:>10} {3:>10} {4:>10} {5:>10} {6:>5}".format(
+        "log", "MB", "summary", "scan", "X", "scan", "same")
+    for name, text in cases:
+        old_summary, old_props = best_time(
+            legacy_extract_prop_dict, text, args.repeat)
+        new_summary, new_props = best_time(
+            res.extract_prop_dict, text, args.repeat)
+        old_X, old_blocks = best_time(legacy_extract_X, text, args.repeat)
+        new_X, new_blocks = best_time(res.extract_X, text, args.repeat)
+        same = old_props == new_props and same_blocks(old_blocks, new_blocks)
+        if not same:
+            status = 1
+        print ("{0:20} {1:>8.1f} {2:>10.4f} {3:>10.4f} {4:>10.4f} {5:>10.4f} "
+               "{6:>5}").format(name, len(text) / 2. ** 20, old_summary,
+                                new_summary, old_X, new_X,
+                                "yes" if same else "NO")
+    print "(times in seconds, best of {0})".format(args.repeat)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#! /usr/bin/env python
+#
+# benchmarks/reordering.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Compares the fill of the Schur complement's Cholesky factor, and optionally
+the solve time, with and without fill-reducing constraint reordering.
+
+Usage:
+    python benchmarks/reordering.py [--mode octave --cmd CMD] FILE.mat ...
+"""
+from __future__ import absolute_import
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import sdpt3glue
+import sdpt3glue.sedumi_writer as sw
+
+
+def cholesky_nnz(pattern):
+    '''
+    Returns the number of nonzeros in the Cholesky factor of a symmetric
+    matrix with the given sparsity pattern, by symbolic factorization along
+    the elimination tree.
+    '''
+    pattern = pattern.tocsr()
+    n = pattern.shape[0]
+    struct = [None] * n
+    children = [[] for _ in range(n)]
+    total = 0
+    for k in range(n):
+        cols = pattern.indices[pattern.indptr[k]:pattern.indptr[k + 1]]
+        below = set(cols[cols > k])
+        for child in children[k]:
+            below |= struct[child]
+            struct[child] = None
+        below.discard(k)
+        struct[k] = below
+        total += len(below) + 1
+        if below:
+            children[min(below)].append(k)
+    return total
+
+
+def solve_time(matfile, mode, cmd):
+    '''
+    Solves matfile, keeping it, and returns the wall clock time it took.
+    The solve log goes to a temporary file, which is removed afterwards.
+    '''
+    log_folder = tempfile.mkdtemp()
+    try:
+        start = time.time()
+        sdpt3glue.sdpt3_solve_mat(
+            matfile, mode, output_target=os.path.join(log_folder, "log.txt"),
+            discard_matfile=False, cmd=cmd, no_prompt=True)
+        return time.time() - start
+    finally:
+        shutil.rmtree(log_folder)
+
+
+def main():
+    """ The main function.
+
+    Returns:
+      exit code.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("matfiles", nargs="+")
+    parser.add_argument("--mode", help="also solve both orderings with this mode")
+    parser.add_argument("--cmd", default="octave")
+    args = parser.parse_args()
+
+    temp_folder = tempfile.mkdtemp()
+    try:
+        print "{0:30} {1:>8} {2:>12} {3:>12} {4:>10} {5:>10}".format(
+            "instance", "m", "nnz(L)", "nnz(L) rcm", "time", "time rcm")
+        for path in args.matfiles:
+            A, b, c, K = sw.read_sedumi_mat(path)
+            pattern = sw.schur_complement_pattern(A, K)
+            A_rcm, b_rcm, row_perm = sw.reorder_constraints(A, b, K)
+            fill = cholesky_nnz(pattern)
+            fill_rcm = cholesky_nnz(pattern[row_perm, :][:, row_perm])
+
+            times = ["", ""]
+            if args.mode:
+                reordered = os.path.join(temp_folder, "reordered.mat")
+                sw.write_sedumi_to_mat(A_rcm, b_rcm, c, K, reordered)
+                times = ["{0:.2f}".format(solve_time(f, args.mode, args.cmd))
+                         for f in (os.path.abspath(path), reordered)]
+                os.remove(reordered)
+
+            print "{0:30} {1:>8} {2:>12} {3:>12} {4:>10} {5:>10}".format(
+                os.path.basename(path), A.shape[0], fill, fill_rcm, *times)
+    finally:
+        shutil.rmtree(temp_folder)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
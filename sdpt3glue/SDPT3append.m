@@ -0,0 +1,51 @@
+function SDPT3append(key, in_file, result_file)
+%% Solves the problem held in memory under key.  If in_file holds a complete
+%% problem (A, b, c, K) it replaces whatever was held under key.  If it holds
+%% a delta (dA, db, m0) those rows are appended to the held problem and the
+%% previous solution is used as the starting point.
+%% result_file, if given, is where obj, X, y, Z and info are saved as a -v7
+%% .mat file; otherwise obj, X, y and Z are printed (see SDPT3report.m).
+
+data = load(in_file);
+
+if isfield(data, 'dA')
+    if ~SDPT3store('has', key)
+        error('SDPT3glue:notheld', 'No problem is held under key %s.', key);
+    end
+    held = SDPT3store('get', key);
+    if size(held.A, 1) ~= data.m0
+        error('SDPT3glue:mismatch', ...
+              'The delta starts after row %d but %d rows are held.', ...
+              data.m0, size(held.A, 1));
+    end
+    held.A = [held.A; data.dA];
+    held.b = [held.b; data.db(:)];
+else
+    held = struct('A', data.A, 'b', data.b(:), 'c', data.c, 'y', []);
+    held.K = data.K;
+end
+
+[blk,At,C,b] = read_sedumi(held.A, held.b, held.c, held.K);
+if isempty(held.y)
+    [obj,X,y,Z,info] = sqlp(blk,At,C,b);
+else
+    %% The appended rows start with zero multipliers.
+    warm.X0 = held.X;
+    warm.y0 = [held.y; zeros(length(b) - length(held.y), 1)];
+    warm.Z0 = held.Z;
+    [X0,y0,Z0] = SDPT3warmstart(blk,At,C,b,warm);
+    [obj,X,y,Z,info] = sqlp(blk,At,C,b,[],X0,y0,Z0);
+end
+
+held.X = X;
+held.y = y;
+held.Z = Z;
+SDPT3store('set', key, held);
+
+if nargin >= 3 && ~isempty(result_file)
+    save(result_file, 'obj', 'X', 'y', 'Z', 'info', '-v7');
+else
+    SDPT3report(obj, X, y, Z);
+end
+
+end
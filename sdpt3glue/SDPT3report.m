@@ -0,0 +1,26 @@
+function SDPT3report(obj, X, y, Z)
+%% Prints the objective, X and, if given, y and Z in a way that will be easy
+%% to extract
+
+disp('obj =');
+disp(num2str(obj,12));
+disp('>>');
+
+for i=1:length(X)
+    disp(['X{' num2str(i) '} =']);
+    disp(num2str(X{i},12));
+    disp('>>');
+end
+
+if nargin >= 4
+    disp('y =');
+    disp(num2str(y,12));
+    disp('>>');
+    for i=1:length(Z)
+        disp(['Z{' num2str(i) '} =']);
+        disp(num2str(Z{i},12));
+        disp('>>');
+    end
+end
+
+end
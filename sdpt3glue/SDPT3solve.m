@@ -1,27 +1,41 @@
-function SDPT3solve(in_file)
-%% in_file is a .mat file
+function SDPT3solve(in_file, settings_file, result_file)
+%% in_file is a .mat file holding a Sedumi format problem and, optionally,
+%% an OPTIONS struct for sqlp.  settings_file, if given and not empty, is a
+%% .mat file whose OPTIONS fields take precedence over those of in_file, and
+%% whose starting point X0, y0, Z0 is used (see SDPT3warmstart.m).
+%% result_file, if given, is where obj, X, y, Z and info are saved as a -v7
+%% .mat file; otherwise obj, X, y and Z are printed (see SDPT3report.m).
 
-[blk,At,C,b] = read_sedumi(in_file);
-[obj,X,y,Z] = sqlp(blk,At,C,b);
+data = load(in_file);
+[blk,At,C,b] = read_sedumi(data.A, data.b, data.c, data.K);
 
-%% Print out the objective in a way that will be easy to extract
-disp('obj =');
-disp(num2str(obj,12));
-disp('>>');
+settings = struct();
+if nargin >= 2 && ~isempty(settings_file)
+    settings = load(settings_file);
+end
+
+OPTIONS = [];
+for source = {data, settings}
+    if isfield(source{1}, 'OPTIONS')
+        names = fieldnames(source{1}.OPTIONS);
+        for i = 1:numel(names)
+            OPTIONS.(names{i}) = source{1}.OPTIONS.(names{i});
+        end
+    end
+end
+clear data;
 
-%% Print out X in a way that will be easy to extract
-for i=1:length(X)
-    disp(['X{' num2str(i) '} =']);
-    disp(num2str(X{i},12));
-    disp('>>');
+if any(isfield(settings, {'X0', 'y0', 'Z0'}))
+    [X0,y0,Z0] = SDPT3warmstart(blk,At,C,b,settings);
+    [obj,X,y,Z,info] = sqlp(blk,At,C,b,OPTIONS,X0,y0,Z0);
+else
+    [obj,X,y,Z,info] = sqlp(blk,At,C,b,OPTIONS);
 end
 
-%% Not currently being used:
-% disp('y=');
-% disp(num2str(y,12));
-% disp('Z=');
-% for i=1:length(Z)
-%     disp(num2str(Z{i},12));
-% end
+if nargin >= 3 && ~isempty(result_file)
+    save(result_file, 'obj', 'X', 'y', 'Z', 'info', '-v7');
+else
+    SDPT3report(obj, X, y, Z);
+end
 
 end
@@ -0,0 +1,24 @@
+function varargout = SDPT3store(action, key, value)
+%% Keeps problems and their last solutions in memory between the jobs of a
+%% long-lived solver process.  action is one of 'has', 'get', 'set' or
+%% 'clear'.
+
+persistent held;
+if isempty(held)
+    held = containers.Map();
+end
+
+switch action
+    case 'has'
+        varargout{1} = isKey(held, key);
+    case 'get'
+        varargout{1} = held(key);
+    case 'set'
+        held(key) = value;
+    case 'clear'
+        if isKey(held, key)
+            remove(held, key);
+        end
+end
+
+end
@@ -0,0 +1,53 @@
+function SDPT3update(key, in_file, result_file)
+%% Solves the problem whose constraint matrix is held in memory under key,
+%% with the right hand side b and objective c found in in_file.  If in_file
+%% also holds A and K, the problem is converted and held under key first.
+%% in_file may also hold a starting point X0, y0, Z0 (see SDPT3warmstart.m)
+%% and an OPTIONS struct for sqlp.
+%% result_file, if given, is where obj, X, y, Z and info are saved as a -v7
+%% .mat file; otherwise obj, X, y and Z are printed (see SDPT3report.m).
+
+data = load(in_file);
+
+if isfield(data, 'A')
+    [blk,At,C,b] = read_sedumi(data.A, data.b, data.c, data.K);
+    held = struct('blk', {blk}, 'At', {At}, 'K', data.K, ...
+                  'm', size(data.A, 1), 'n', size(data.A, 2));
+    SDPT3store('set', key, held);
+else
+    if ~SDPT3store('has', key)
+        error('SDPT3glue:notheld', 'No problem is held under key %s.', key);
+    end
+    held = SDPT3store('get', key);
+    if numel(data.b) ~= held.m || numel(data.c) ~= held.n
+        error('SDPT3glue:mismatch', ...
+              'b and c must have %d and %d entries for the held problem.', ...
+              held.m, held.n);
+    end
+    blk = held.blk;
+    At = held.At;
+    b = full(data.b(:));
+    %% c is converted the way read_sedumi converts it, which only depends
+    %% on the cone structure, so a single empty row stands in for A.
+    [~,~,C] = read_sedumi(sparse(1, held.n), 0, data.c, held.K);
+end
+
+OPTIONS = [];
+if isfield(data, 'OPTIONS')
+    OPTIONS = data.OPTIONS;
+end
+
+if any(isfield(data, {'X0', 'y0', 'Z0'}))
+    [X0,y0,Z0] = SDPT3warmstart(blk,At,C,b,data);
+    [obj,X,y,Z,info] = sqlp(blk,At,C,b,OPTIONS,X0,y0,Z0);
+else
+    [obj,X,y,Z,info] = sqlp(blk,At,C,b,OPTIONS);
+end
+
+if nargin >= 3 && ~isempty(result_file)
+    save(result_file, 'obj', 'X', 'y', 'Z', 'info', '-v7');
+else
+    SDPT3report(obj, X, y, Z);
+end
+
+end
@@ -0,0 +1,71 @@
+function [X0,y0,Z0] = SDPT3warmstart(blk,At,C,b,warm)
+%% Builds a starting point for sqlp from the struct warm, whose optional
+%% fields X0, y0 and Z0 usually hold the solution of an earlier, similar
+%% problem.  A part which is missing or doesn't fit the structure of the
+%% current problem is taken from SDPT3's default starting point, and the
+%% cone blocks of X0 and Z0 are moved strictly inside their cones.
+
+[Xd,yd,Zd] = infeaspt(blk,At,C,b);
+
+X0 = Xd;
+if isfield(warm, 'X0') && warmstart_fits(warm.X0, Xd)
+    X0 = warm.X0;
+elseif isfield(warm, 'X0')
+    disp('SDPT3glue: X0 does not fit the problem, using the default X0.');
+end
+y0 = yd;
+if isfield(warm, 'y0') && numel(warm.y0) == numel(yd)
+    y0 = full(warm.y0(:));
+elseif isfield(warm, 'y0')
+    disp('SDPT3glue: y0 does not fit the problem, using the default y0.');
+end
+Z0 = Zd;
+if isfield(warm, 'Z0') && warmstart_fits(warm.Z0, Zd)
+    Z0 = warm.Z0;
+elseif isfield(warm, 'Z0')
+    disp('SDPT3glue: Z0 does not fit the problem, using the default Z0.');
+end
+
+for p = 1:size(blk,1)
+    X0{p} = warmstart_interior(blk(p,:), X0{p});
+    Z0{p} = warmstart_interior(blk(p,:), Z0{p});
+end
+
+end
+
+
+function ok = warmstart_fits(V, D)
+%% True if the cell array V has blocks of the same sizes as D.
+
+ok = iscell(V) && numel(V) == numel(D);
+for p = 1:numel(D)
+    ok = ok && isequal(size(V{p}), size(D{p}));
+end
+
+end
+
+
+function V = warmstart_interior(blk, V)
+%% Moves the block V of cone type blk{1} strictly inside its cone.  A
+%% solution lies on the boundary of its cone, where sqlp can't start from.
+
+margin = 1e-6 * max(1, max(abs(V(:))));
+switch blk{1}
+    case 's'
+        V = full((V + V') / 2);
+        lambda = min(eig(V));
+        if lambda < margin
+            V = V + (margin - lambda) * eye(size(V, 1));
+        end
+    case 'q'
+        first = 1;
+        for n = blk{2}
+            rest = first+1:first+n-1;
+            V(first) = max(V(first), norm(V(rest)) + margin);
+            first = first + n;
+        end
+    case 'l'
+        V = max(V, margin);
+end
+
+end
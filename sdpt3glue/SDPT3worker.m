@@ -0,0 +1,31 @@
+function SDPT3worker()
+%% Serves jobs read from standard input, one per line.  Each line holds a job
+%% id, the name of a function to run and that function's arguments, separated
+%% by tabs.  The output of every job is framed by begin and end markers so the
+%% caller can tell the jobs apart.  An empty line or the end of the input
+%% stops the worker.
+
+while true
+    try
+        line = input('', 's');
+    catch
+        break;
+    end
+    if isempty(line)
+        break;
+    end
+
+    parts = regexp(line, '\t', 'split');
+    disp(['@@SDPT3GLUE BEGIN ' parts{1}]);
+    try
+        feval(parts{2}, parts{3:end});
+    catch err
+        disp(['@@SDPT3GLUE ERROR ' err.identifier char(9) err.message]);
+    end
+    disp(['@@SDPT3GLUE END ' parts{1}]);
+    if exist('OCTAVE_VERSION', 'builtin')
+        fflush(stdout);
+    end
+end
+
+end
@@ -12,11 +12,33 @@
 """
 
 from solve import check_output_target
+from solve import check_options
 from solve import sdpt3_solve_problem
 from solve import sdpt3_solve_mat
 from solve import MATLAB
 from solve import OCTAVE
 from solve import NEOS
+from solve import CVXOPT
+from solve import AUTO
+from solve import REMOTE
 from sedumi_writer import write_cvxpy_to_mat
 from sedumi_writer import write_sedumi_to_mat
 from result import print_summary
+from result import SolveResult
+from incremental import IncrementalProblem
+from resident import ResidentProblem
+from worker import SolverProcess
+from worker import SolverPool
+from batch import sdpt3_solve_many
+from batch import sdpt3_solve_as_completed
+from batch import SolvePipeline
+from background import BackgroundSolver
+from dispatch import HybridDispatcher
+from remote import RemoteClient
+from remote import SolverServer
+from progressive import ProgressiveSolve
+from workspace import RAM
+from workspace import DISK
+from cores import CoreScheduler
+from cost_model import CostModel
+from cache import ResultCache
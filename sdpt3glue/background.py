@@ -0,0 +1,247 @@
+#
+# sdpt3glue/background.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Non-blocking counterparts of sdpt3_solve_problem and sdpt3_solve_mat.  A
+submitted solve returns a SolveHandle straight away; its callbacks make it
+easy to hand the result over to an event loop.
+"""
+
+import os
+import os.path
+import shutil
+import threading
+from multiprocessing.pool import ThreadPool
+
+import sedumi_writer as sw
+import solve as slv
+import result as res
+import workspace as ws
+
+
+class SolveHandle(object):
+    '''
+    Stands for the result of a solve which may not have finished yet.
+    '''
+
+    def __init__(self):
+        self._finished = threading.Event()
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._result = None
+        self._error = None
+
+    def done(self):
+        ''' True once the solve has finished, successfully or not. '''
+        return self._finished.is_set()
+
+    def result(self, timeout=None):
+        '''
+        Waits up to timeout seconds (forever if None) for the solve and
+        returns its result dict, or raises the error it ended with.
+
+        Raises:
+            RuntimeError: When the solve hasn't finished within timeout.
+        '''
+        if not self._finished.wait(timeout):
+            raise RuntimeError("The solve hasn't finished yet.")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def exception(self, timeout=None):
+        '''
+        Waits like result does and returns the error the solve ended with, or
+        None if it succeeded.
+        '''
+        if not self._finished.wait(timeout):
+            raise RuntimeError("The solve hasn't finished yet.")
+        return self._error
+
+    def cancel(self):
+        '''
+        Asks a local solve to stop.  Its solver process group is stopped and
+        the handle finishes with a result marked cancelled.  NEOS jobs can't
+        be cancelled once submitted.
+
+        Returns:
+            False if the solve had already finished, True otherwise.
+        '''
+        if self.done():
+            return False
+        self._cancel.set()
+        return True
+
+    def add_done_callback(self, callback):
+        '''
+        Arranges for callback(handle) to be called once the solve finishes,
+        from whichever thread finishes it.  With asyncio-like event loops,
+        the callback should pass the handle on with a thread-safe call.
+        '''
+        with self._lock:
+            if not self.done():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _finish(self, result=None, error=None):
+        with self._lock:
+            self._result = result
+            self._error = error
+            self._finished.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+
+class BackgroundSolver(object):
+    '''
+    Runs solves in the background.  Conversion and local Matlab/Octave
+    solves run on a pool of max_workers threads.  NEOS solves use a pool
+    thread only to submit the job.  After that, a single NeosPoller thread
+    follows every NEOS job in flight, so hundreds of them can be outstanding
+    at once.
+    '''
+
+    def __init__(self, max_workers=4, neos_interval=20):
+        self._pool = ThreadPool(max_workers)
+        self._neos_interval = neos_interval
+        self._poller = None
+        self._poller_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def submit_problem(self, problem, mode, matfile_target=None,
+                       output_target=None, discard_matfile=True,
+                       reorder=False, transport=None, **kwargs):
+        '''
+        The non-blocking counterpart of sdpt3_solve_problem.
+
+        Returns:
+            A SolveHandle for the result.
+        '''
+        if matfile_target is not None:
+            assert transport is None, \
+                "transport can only be given without a matfile_target."
+            assert not os.path.exists(matfile_target), \
+                ("Something already exists at matfile_target, we won't "
+                 "overwrite it:\n{0}".format(matfile_target))
+        slv.check_output_target(mode, output_target)
+        options = slv.check_options(kwargs.pop('options', None))
+
+        def job(handle):
+            folder = None
+            target = matfile_target
+            if target is None:
+                folder = ws.make_workspace(transport or ws.RAM)
+                target = os.path.join(folder, "problem.mat")
+            try:
+                problem_data = problem.get_problem_data('CVXOPT')
+                restore = sw.write_cvxpy_to_mat(
+                    problem_data, target, reorder=reorder, options=options)
+                solve_kwargs = dict(kwargs)
+                if solve_kwargs.get('warm_start') is not None:
+                    solve_kwargs['warm_start'] = res.reorder_warm_start(
+                        solve_kwargs['warm_start'], restore)
+                self._solve_mat(handle, os.path.abspath(target), mode,
+                                output_target, discard_matfile, restore,
+                                solve_kwargs)
+            finally:
+                # NEOS has its own copy of the problem once it is submitted.
+                if folder is not None:
+                    shutil.rmtree(folder, ignore_errors=True)
+
+        return self._submit(job)
+
+    def submit_mat(self, matfile_path, mode, output_target=None,
+                   discard_matfile=True, **kwargs):
+        '''
+        The non-blocking counterpart of sdpt3_solve_mat.
+
+        Returns:
+            A SolveHandle for the result.
+        '''
+        matfile_path = os.path.abspath(matfile_path)
+        slv.check_output_target(mode, output_target)
+
+        def job(handle):
+            self._solve_mat(handle, matfile_path, mode, output_target,
+                            discard_matfile, None, kwargs)
+
+        return self._submit(job)
+
+    def close(self):
+        '''
+        Waits for the pool's jobs to finish and stops following NEOS jobs.
+        Handles of NEOS jobs still in flight then never finish, so wait on
+        them first if their results are wanted.
+        '''
+        self._pool.close()
+        self._pool.join()
+        if self._poller is not None:
+            self._poller.stop()
+
+    def _submit(self, job):
+        handle = SolveHandle()
+
+        def run():
+            try:
+                job(handle)
+            except Exception as err:  # pylint: disable=broad-except
+                handle._finish(error=err)
+
+        self._pool.apply_async(run)
+        return handle
+
+    def _solve_mat(self, handle, matfile_path, mode, output_target,
+                   discard_matfile, restore, kwargs):
+        '''
+        Solves locally right away, or submits to NEOS and leaves the rest to
+        the poller.  Either way, the handle is finished with the outcome.
+        '''
+        if mode != slv.NEOS:
+            result = slv.sdpt3_solve_mat(
+                matfile_path, mode, output_target=output_target,
+                discard_matfile=discard_matfile, cancel=handle._cancel,
+                **kwargs)
+            handle._finish(result=res.restore_duals(result, restore))
+            return
+
+        import solve_neos as ns
+        options = slv.check_options(kwargs.get('options'))
+        if options:
+            # NEOS only gets the .mat file, so the options go in a copy.
+            with ws.workspace(ws.DISK) as folder:
+                copy = os.path.join(folder, os.path.basename(matfile_path))
+                sw.write_options_to_mat(options, matfile_path, copy)
+                jobid, pwd = ns.handle_submission(copy, no_prompt=True)
+        else:
+            jobid, pwd = ns.handle_submission(matfile_path, no_prompt=True)
+
+        def finish(msg):
+            try:
+                if discard_matfile and os.path.exists(matfile_path):
+                    os.remove(matfile_path)
+                result = slv.finish_solve(msg, output_target)
+                handle._finish(result=res.restore_duals(result, restore))
+            except Exception as err:  # pylint: disable=broad-except
+                handle._finish(error=err)
+
+        self._neos_poller(ns).watch(jobid, pwd, finish)
+
+    def _neos_poller(self, ns):
+        with self._poller_lock:
+            if self._poller is None:
+                self._poller = ns.NeosPoller(interval=self._neos_interval)
+            return self._poller
@@ -0,0 +1,439 @@
+#
+# sdpt3glue/batch.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Solving many problems at once.  Each job converts and solves its problem in a
+working folder of its own, so jobs can run side by side.
+"""
+
+import collections
+import contextlib
+import multiprocessing
+import os
+import os.path
+import Queue
+import shutil
+import tempfile
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+import cost_model as cm
+import sedumi_writer as sw
+import solve as slv
+import result as res
+import workspace as ws
+
+
+BatchItem = collections.namedtuple(
+    "BatchItem", ["index", "source", "result", "error"])
+"""
+The outcome of one job of a batch: index is the position of source in the
+input, and exactly one of result (the result dict) and error (the exception
+the job raised) is not None.
+"""
+
+
+def sdpt3_solve_many(problems_or_matfiles, mode, max_workers=None,
+                     workdir=None, output_folder=None, cost_model=None,
+                     **kwargs):
+    '''
+    Solves every cvxpy problem or Sedumi .mat file in problems_or_matfiles
+    with up to max_workers jobs running at once.
+
+    Args:
+        problems_or_matfiles: a list of cvxpy problems and/or paths of .mat
+        files.  The .mat files are never modified or deleted.
+        mode: one of MATLAB, OCTAVE, NEOS, CVXOPT, AUTO or REMOTE.
+        max_workers: the number of jobs to run at once, by default the number
+        of CPUs.
+        workdir: the folder in which each job's working folder is made.  By
+        default it is made where a transport keyword argument says (see
+        sdpt3_solve_problem), or else in the system's temporary folder.
+        output_folder: if given, the solve log of the job at index i is saved
+        there as job<i>.txt, replacing any earlier log of that name.
+        cost_model: a cost_model.CostModel.  If given, the .mat file jobs
+        are run longest predicted first, ahead of the cvxpy problems, and
+        those predicted to need more memory than is available fail with
+        InsufficientMemory without being run.  The solves are recorded in
+        the model, to be fitted on later.
+        kwargs: passed on to sdpt3_solve_problem or sdpt3_solve_mat.  A
+        cores.CoreScheduler given as scheduler shares the CPUs out between
+        the jobs running at once, by the size of their problems.
+
+    Returns:
+        A list of BatchItem, in the order of problems_or_matfiles.  A job
+        which failed has its exception in the error field instead of stopping
+        the batch.
+    '''
+    items = _solve_iter(problems_or_matfiles, mode, max_workers, workdir,
+                        output_folder, cost_model, kwargs, ordered=True)
+    return sorted(items, key=lambda item: item.index)
+
+
+def sdpt3_solve_as_completed(problems_or_matfiles, mode, max_workers=None,
+                             workdir=None, output_folder=None,
+                             cost_model=None, **kwargs):
+    '''
+    Like sdpt3_solve_many, but yields each BatchItem as soon as its job
+    finishes.
+    '''
+    return _solve_iter(problems_or_matfiles, mode, max_workers, workdir,
+                       output_folder, cost_model, kwargs, ordered=False)
+
+
+def _solve_iter(problems_or_matfiles, mode, max_workers, workdir,
+                output_folder, cost_model, kwargs, ordered):
+    '''
+    Runs the jobs on a thread pool and yields their BatchItems.  Threads are
+    enough here since each job spends its time waiting on a solver process.
+    '''
+    assert mode in slv.MODES, \
+        "Please choose mode from {0}.".format(", ".join(slv.MODES))
+    if 'output_target' in kwargs:
+        raise ValueError("Use output_folder to keep the logs of a batch.")
+    if output_folder and not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    transport = kwargs.pop('transport', None)
+    if workdir is None and transport is not None:
+        workdir = ws.transport_folder(transport)
+
+    def run(job):
+        return _solve_job(job, mode, workdir, output_folder, kwargs)
+
+    jobs = list(enumerate(problems_or_matfiles))
+    features = {}
+    if cost_model is not None:
+        jobs, features, refused = _plan(jobs, cost_model)
+        for item in refused:
+            yield item
+
+    pool = ThreadPool(max_workers or multiprocessing.cpu_count())
+    try:
+        if ordered:
+            items = pool.imap(run, jobs)
+        else:
+            items = pool.imap_unordered(run, jobs)
+        for item in items:
+            if item.result is not None and item.index in features:
+                cost_model.record(features[item.index], item.result)
+            yield item
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _plan(jobs, cost_model):
+    '''
+    Orders jobs by the cost_model.CostModel cost_model, longest predicted
+    solve first, with the cvxpy problems (which can't be predicted before
+    they are converted) last.
+
+    Returns:
+        The jobs to run, in order, the features of each .mat file job by
+        index, and the BatchItems of the jobs refused for lack of memory.
+    '''
+    features = {}
+    refused = []
+    predicted = {}
+    for index, source in jobs:
+        if not isinstance(source, basestring):
+            continue
+        try:
+            features[index] = cm.matfile_features(source)
+            cost_model.check_memory(features[index])
+        except Exception as err:  # pylint: disable=broad-except
+            features.pop(index, None)
+            refused.append(BatchItem(index, source, None, err))
+            continue
+        predicted[index] = cost_model.predict(features[index])['solve_time']
+
+    refused_indices = set(item.index for item in refused)
+    jobs = [job for job in jobs if job[0] not in refused_indices]
+    jobs.sort(key=lambda job: -predicted.get(job[0], -1.))
+    return jobs, features, refused
+
+
+def _solve_job(job, mode, workdir, output_folder, kwargs):
+    '''
+    Solves one job in a fresh working folder and returns its BatchItem.
+    '''
+    index, source = job
+    jobdir = tempfile.mkdtemp(prefix="sdpt3job{0}_".format(index), dir=workdir)
+    try:
+        matfile = os.path.join(jobdir, "problem.mat")
+        output_target = os.path.join(
+            output_folder or jobdir, "job{0}.txt".format(index))
+        if os.path.exists(output_target):
+            os.remove(output_target)
+
+        if isinstance(source, basestring):
+            ws.stage(source, matfile)
+            result = slv.sdpt3_solve_mat(
+                matfile, mode, output_target=output_target, workdir=jobdir,
+                **kwargs)
+        else:
+            result = slv.sdpt3_solve_problem(
+                source, mode, matfile, output_target=output_target,
+                workdir=jobdir, **kwargs)
+        if not output_folder:
+            result.load_log()
+        return BatchItem(index, source, result, None)
+
+    except Exception as err:  # pylint: disable=broad-except
+        return BatchItem(index, source, None, err)
+
+    finally:
+        shutil.rmtree(jobdir, ignore_errors=True)
+
+
+class SolvePipeline(object):
+    '''
+    A batch runner in two stages: one thread converts each cvxpy problem to
+    a .mat file (or stages a given .mat file) while solver threads solve the
+    problems converted before it.  So the Python side work of one problem
+    overlaps the solves of the ones before it.
+
+    Converted problems wait for a solver in a queue of at most max_queued,
+    and conversion pauses while it is full.  So at most max_queued + solvers
+    + 1 converted problems (counting the one waiting for room) exist at
+    once.
+
+    After run, the stats attribute gives, for each stage, its busy time, the
+    time it spent blocked (the converter waiting for room in the queue, the
+    solvers waiting for work) and its utilization, i.e. the share of the
+    run's wall time its threads were busy.
+    '''
+
+    def __init__(self, mode, solvers=1, max_queued=2, workdir=None,
+                 output_folder=None, **kwargs):
+        '''
+        Args:
+            mode: one of MATLAB, OCTAVE, NEOS, CVXOPT, AUTO or REMOTE.
+            solvers: the number of solves run at once.
+            max_queued: the most converted problems waiting for a solver.
+            workdir, output_folder: as for sdpt3_solve_many.
+            kwargs: passed on to sdpt3_solve_mat.  reorder and options are
+            used when converting cvxpy problems, as in sdpt3_solve_problem.
+        '''
+        assert mode in slv.MODES, \
+            "Please choose mode from {0}.".format(", ".join(slv.MODES))
+        if 'output_target' in kwargs:
+            raise ValueError("Use output_folder to keep the logs of a batch.")
+        if solvers < 1 or max_queued < 1:
+            raise ValueError("solvers and max_queued must be at least 1.")
+        self.mode = mode
+        self.solvers = solvers
+        self.max_queued = max_queued
+        self.output_folder = output_folder
+        transport = kwargs.pop('transport', None)
+        if workdir is None and transport is not None:
+            workdir = ws.transport_folder(transport)
+        self.workdir = workdir
+        self.reorder = kwargs.pop('reorder', False)
+        self.options = slv.check_options(kwargs.pop('options', None))
+        self.kwargs = kwargs
+        self.stats = None
+
+    def solve_all(self, problems_or_matfiles):
+        '''
+        Runs the pipeline and returns the list of BatchItem, in the order of
+        problems_or_matfiles.
+        '''
+        return sorted(self.run(problems_or_matfiles),
+                      key=lambda item: item.index)
+
+    def run(self, problems_or_matfiles):
+        '''
+        Runs the pipeline, yielding each BatchItem as soon as its job
+        finishes.  Stopping the iteration early stops the pipeline once the
+        solves under way are done.
+        '''
+        if self.output_folder and not os.path.exists(self.output_folder):
+            os.makedirs(self.output_folder)
+        jobs = Queue.Queue(self.max_queued)
+        done = Queue.Queue()
+        stop = threading.Event()
+        clocks = {'convert': _StageClock(), 'solve': _StageClock()}
+        start = time.time()
+
+        converter = threading.Thread(
+            target=self._convert_all,
+            args=(enumerate(problems_or_matfiles), jobs, done, stop,
+                  clocks['convert']))
+        solvers = [threading.Thread(target=self._solve_all,
+                                    args=(jobs, done, stop, clocks['solve']))
+                   for _ in range(self.solvers)]
+        for thread in [converter] + solvers:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            finished = 0
+            while finished < len(solvers):
+                item = done.get()
+                if item is None:
+                    finished += 1
+                else:
+                    yield item
+        finally:
+            stop.set()
+            converter.join()
+            for thread in solvers:
+                thread.join()
+            while not jobs.empty():
+                job = jobs.get()
+                if job is not None:
+                    shutil.rmtree(job[2], ignore_errors=True)
+            wall_time = time.time() - start
+            self.stats = dict(
+                (stage, clock.summary(
+                    wall_time, 1 if stage == 'convert' else self.solvers))
+                for stage, clock in clocks.items())
+            self.stats['wall_time'] = wall_time
+
+    def _put(self, queue, job, stop, clock):
+        '''
+        Puts job on the bounded queue, waiting for room unless stop is set.
+        Returns False if the pipeline was stopped.
+        '''
+        with clock.blocked():
+            while not stop.is_set():
+                try:
+                    queue.put(job, timeout=0.1)
+                    return True
+                except Queue.Full:
+                    pass
+        return False
+
+    def _convert_all(self, jobs_in, jobs, done, stop, clock):
+        try:
+            for index, source in jobs_in:
+                if stop.is_set():
+                    return
+                jobdir = tempfile.mkdtemp(
+                    prefix="sdpt3job{0}_".format(index), dir=self.workdir)
+                try:
+                    with clock.busy():
+                        job = self._convert(index, source, jobdir)
+                except Exception as err:  # pylint: disable=broad-except
+                    shutil.rmtree(jobdir, ignore_errors=True)
+                    done.put(BatchItem(index, source, None, err))
+                    continue
+                if not self._put(jobs, job, stop, clock):
+                    shutil.rmtree(jobdir, ignore_errors=True)
+                    return
+        finally:
+            # One end marker per solver thread.
+            for _ in range(self.solvers):
+                self._put(jobs, None, stop, clock)
+
+    def _convert(self, index, source, jobdir):
+        '''
+        Writes or stages the problem of one job in jobdir and returns the job
+        as (index, source, jobdir, matfile, restore).
+        '''
+        matfile = os.path.join(jobdir, "problem.mat")
+        restore = None
+        if isinstance(source, basestring):
+            ws.stage(source, matfile)
+        else:
+            problem_data = source.get_problem_data('CVXOPT')
+            restore = sw.write_cvxpy_to_mat(
+                problem_data, matfile, reorder=self.reorder,
+                options=self.options)
+        return (index, source, jobdir, matfile, restore)
+
+    def _solve_all(self, jobs, done, stop, clock):
+        try:
+            while not stop.is_set():
+                with clock.blocked():
+                    try:
+                        job = jobs.get(timeout=0.1)
+                    except Queue.Empty:
+                        continue
+                if job is None:
+                    return
+                with clock.busy():
+                    done.put(self._solve(*job))
+        finally:
+            done.put(None)
+
+    def _solve(self, index, source, jobdir, matfile, restore):
+        '''
+        Solves one converted job, removes its folder and returns its
+        BatchItem.
+        '''
+        try:
+            output_target = os.path.join(
+                self.output_folder or jobdir, "job{0}.txt".format(index))
+            if os.path.exists(output_target):
+                os.remove(output_target)
+            kwargs = dict(self.kwargs)
+            if restore is None:
+                kwargs['options'] = self.options
+            elif kwargs.get('warm_start') is not None:
+                kwargs['warm_start'] = res.reorder_warm_start(
+                    kwargs['warm_start'], restore)
+            result = slv.sdpt3_solve_mat(
+                matfile, self.mode, output_target=output_target,
+                workdir=jobdir, **kwargs)
+            if not self.output_folder:
+                result.load_log()
+            return BatchItem(index, source, res.restore_duals(result, restore),
+                             None)
+
+        except Exception as err:  # pylint: disable=broad-except
+            return BatchItem(index, source, None, err)
+
+        finally:
+            shutil.rmtree(jobdir, ignore_errors=True)
+
+
+class _StageClock(object):
+    '''
+    Adds up the time the threads of a pipeline stage spend busy and blocked.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.busy_time = 0.
+        self.blocked_time = 0.
+        self.jobs = 0
+
+    @contextlib.contextmanager
+    def busy(self):
+        start = time.time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.busy_time += time.time() - start
+                self.jobs += 1
+
+    @contextlib.contextmanager
+    def blocked(self):
+        start = time.time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.blocked_time += time.time() - start
+
+    def summary(self, wall_time, threads):
+        '''
+        Returns the stage's stats over a run of wall_time seconds.
+        '''
+        return {
+            'jobs': self.jobs,
+            'busy_time': self.busy_time,
+            'blocked_time': self.blocked_time,
+            'utilization': (self.busy_time / (wall_time * threads)
+                            if wall_time > 0 else 0.),
+        }
@@ -0,0 +1,217 @@
+#
+# sdpt3glue/cache.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+A disk cache of solve results keyed by the content of the problem, so that
+a problem solved before, wherever it came from, is answered without running
+a solver.
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import io
+import json
+import os
+import os.path
+import tempfile
+
+import numpy as np
+import scipy.io
+
+import sedumi_writer as sw
+import result as res
+
+
+_LOCK_FILE = ".lock"
+_SUFFIX = ".npz"
+_META = "__result__"
+
+
+class ResultCache(object):
+    '''
+    Result dicts stored in folder, one .npz file per problem, under a key
+    made from the problem's data (A, b, c and K, however they are stored),
+    its sqlp options and the solver used (SDPT3 or cvxopt).
+
+    Entries are written to a temporary file and renamed into place, and
+    eviction holds an exclusive lock on the folder, so several processes
+    can share a cache.  When the entries take more than max_bytes, or number
+    more than max_entries, the least recently used ones are removed.
+
+    The solve log is kept as text; interrupted solves are not stored.  Warm
+    starts are not part of the key, since they change the path to the
+    solution but not the solution.
+    '''
+
+    def __init__(self, folder, max_bytes=2 ** 30, max_entries=None):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        if not os.path.exists(folder):
+            try:
+                os.makedirs(folder)
+            except OSError:
+                if not os.path.isdir(folder):
+                    raise
+
+    def key(self, matfile_path, solver, options=None):
+        '''
+        Returns the key of the Sedumi format problem in matfile_path solved
+        by solver ('sdpt3' or 'cvxopt') with the sqlp options saved in the
+        file, updated by options.
+        '''
+        A, b, c, K = sw.read_sedumi_mat(matfile_path)
+        merged = _saved_options(matfile_path)
+        merged.update(options or {})
+        digest = hashlib.sha1(sw.content_hash(A, K, b, c))
+        digest.update(json.dumps([solver, sorted(merged.items())]))
+        return digest.hexdigest()
+
+    def get(self, key):
+        '''
+        Returns the result dict stored under key, or None if there is none.
+        '''
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fp:
+                payload = fp.read()
+        except (IOError, OSError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            # Evicted by another process since it was read, which is fine.
+            pass
+        self.hits += 1
+        return _load_result(payload)
+
+    def put(self, key, result):
+        '''
+        Stores the result dict result under key, unless the solve was
+        interrupted, then evicts entries as needed.
+        '''
+        if res.was_interrupted(result):
+            return
+        payload = _dump_result(result)
+        handle, partial = tempfile.mkstemp(suffix=".part", dir=self.folder)
+        with os.fdopen(handle, "wb") as fp:
+            fp.write(payload)
+        os.rename(partial, self._path(key))
+        self.evict()
+
+    def evict(self):
+        '''
+        Removes the least recently used entries until the cache is within
+        max_bytes and max_entries.
+        '''
+        with self._locked():
+            entries = []
+            for name in os.listdir(self.folder):
+                if not name.endswith(_SUFFIX):
+                    continue
+                try:
+                    info = os.stat(os.path.join(self.folder, name))
+                except OSError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, name))
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            while entries and (total > self.max_bytes or (
+                    self.max_entries is not None and
+                    len(entries) > self.max_entries)):
+                _, size, name = entries.pop(0)
+                try:
+                    os.remove(os.path.join(self.folder, name))
+                except OSError:
+                    pass
+                total -= size
+
+    def clear(self):
+        ''' Removes every entry. '''
+        with self._locked():
+            for name in os.listdir(self.folder):
+                if name.endswith(_SUFFIX):
+                    os.remove(os.path.join(self.folder, name))
+
+    def _path(self, key):
+        return os.path.join(self.folder, key + _SUFFIX)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with open(os.path.join(self.folder, _LOCK_FILE), "a") as fp:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+
+def _saved_options(matfile_path):
+    '''
+    Returns the sqlp options saved in the .mat file as its OPTIONS struct,
+    as a dict.
+    '''
+    data = scipy.io.loadmat(matfile_path, variable_names=('OPTIONS',))
+    if 'OPTIONS' not in data:
+        return {}
+    struct = data['OPTIONS'][0, 0]
+    return dict((name, float(np.asarray(struct[name]).ravel()[0]))
+                for name in struct.dtype.names)
+
+
+def _dump_result(result):
+    '''
+    Returns the result dict as .npz bytes: arrays and lists of arrays as
+    arrays, and the other entries (e.g. sqlp's info) as JSON.
+    '''
+    arrays = {}
+    meta = {'lists': {}, 'values': {}}
+    for name, value in result.items():
+        if isinstance(value, np.ndarray):
+            arrays[name] = value
+        elif isinstance(value, list):
+            meta['lists'][name] = len(value)
+            for i, item in enumerate(value):
+                arrays["{0}_{1}".format(name, i)] = np.asarray(item)
+        elif value is None or isinstance(value, (bool, int, long, float,
+                                                 basestring)):
+            meta['values'][name] = value
+        elif isinstance(value, np.generic):
+            meta['values'][name] = value.item()
+        elif isinstance(value, dict):
+            meta['values'][name] = value
+        else:
+            meta['values'][name] = str(value)
+    arrays[_META] = np.array(json.dumps(
+        meta, default=lambda value: np.asarray(value).tolist()))
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    return buf.getvalue()
+
+
+def _load_result(payload):
+    ''' The reverse of _dump_result. '''
+    with np.load(io.BytesIO(payload)) as data:
+        meta = json.loads(str(data[_META]))
+        result = dict(meta['values'])
+        for name, size in meta['lists'].items():
+            items = [data["{0}_{1}".format(name, i)] for i in range(size)]
+            result[name] = [float(item) if item.ndim == 0 else item
+                            for item in items]
+        listed = set("{0}_{1}".format(name, i)
+                     for name, size in meta['lists'].items()
+                     for i in range(size))
+        for name in data.files:
+            if name != _META and name not in listed:
+                result[name] = data[name]
+    return res.SolveResult(result)
@@ -0,0 +1,314 @@
+#
+# sdpt3glue/cli.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+The sdpt3glue-batch command: solves every Sedumi .mat file in a folder, or
+listed in a manifest, into an output folder holding
+
+  - journal.jsonl, an append-only record of each job starting, finishing
+    or failing, by which a run started again skips the jobs already done,
+  - summaries.jsonl, one line of results per job done,
+  - solutions/<job>.npz, the X and Z blocks (and y, if known) of each job
+    done,
+  - logs/<job>.txt, the solve log of each job.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import os.path
+import sys
+import threading
+import time
+import traceback
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+import result as res
+import solve as slv
+import workspace as ws
+
+
+JOURNAL = "journal.jsonl"
+SUMMARIES = "summaries.jsonl"
+SOLUTIONS = "solutions"
+LOGS = "logs"
+
+STARTED = 'started'
+DONE = 'done'
+FAILED = 'failed'
+
+SUMMARY_KEYS = ('status_num', 'status_verb', 'iterations', 'primal_z',
+                'dual_z', 'rel_gap', 'rel_primal_feas', 'rel_dual_feas',
+                'solve_time', 'peak_rss', 'stopped_early', 'timed_out',
+                'cancelled')
+""" The result dict entries written to summaries.jsonl. """
+
+
+class JobInterrupted(Exception):
+    '''
+    A job's solve was ended before SDPT3 finished, e.g. by its timeout, so
+    the job is journaled as failed.
+    '''
+
+
+class Journal(object):
+    '''
+    An append-only file of JSON lines, one per event of a job.  Each line is
+    flushed to disk before record returns, so after a crash the journal
+    holds every event up to it, and at worst a last line cut short, which
+    is ignored.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def states(self):
+        '''
+        Returns a dict of the last event (STARTED, DONE or FAILED) of each
+        job in the journal.
+        '''
+        states = {}
+        if not os.path.exists(self.path):
+            return states
+        with open(self.path) as fp:
+            for line in fp:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                states[entry['job']] = entry['event']
+        return states
+
+    def record(self, job, event, **fields):
+        ''' Appends the event of job, with fields, to the journal. '''
+        entry = dict(fields, job=job, event=event, time=time.time())
+        line = json.dumps(entry, sort_keys=True) + "\n"
+        with self._lock:
+            with open(self.path, "a") as fp:
+                fp.write(line)
+                fp.flush()
+                os.fsync(fp.fileno())
+
+
+def find_jobs(source):
+    '''
+    Returns the .mat files to solve, as absolute paths: those in the folder
+    source, or those listed one per line in the manifest file source.  In a
+    manifest, blank lines and lines starting with # are skipped, and
+    relative paths are taken from the manifest's folder.
+    '''
+    if os.path.isdir(source):
+        return sorted(os.path.abspath(os.path.join(source, name))
+                      for name in os.listdir(source)
+                      if name.endswith(".mat"))
+    base = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source) as fp:
+        for line in fp:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                paths.append(os.path.abspath(os.path.join(base, line)))
+    return paths
+
+
+def job_names(paths):
+    '''
+    Returns a dict giving each path the name its output files are saved
+    under: its file name without the .mat extension.
+
+    Raises:
+        ValueError if two paths would share a name.
+    '''
+    names = {}
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name in names:
+            raise ValueError("{0} and {1} would both be saved as {2}.".format(
+                names[name], path, name))
+        names[name] = path
+    return dict((path, name) for name, path in names.items())
+
+
+def run_batch(source, output_folder, mode=slv.OCTAVE, workers=None,
+              transport=ws.RAM, **kwargs):
+    '''
+    Solves the jobs of source (see find_jobs) with up to workers running at
+    once, by default the number of CPUs, keeping their outputs in
+    output_folder.  Jobs the journal there already has as done are skipped,
+    and those which failed or never finished are run again.
+
+    Args:
+        kwargs: passed on to sdpt3_solve_mat, e.g. cmd or timeout.
+
+    Returns:
+        A dict of the number of jobs 'done', 'failed' and 'skipped'.
+    '''
+    assert mode in slv.MODES, \
+        "Please choose mode from {0}.".format(", ".join(slv.MODES))
+    paths = find_jobs(source)
+    names = job_names(paths)
+    for folder in (output_folder, os.path.join(output_folder, SOLUTIONS),
+                   os.path.join(output_folder, LOGS)):
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+    journal = Journal(os.path.join(output_folder, JOURNAL))
+    states = journal.states()
+    jobs = [path for path in paths if states.get(path) != DONE]
+    _drop_unfinished_summaries(os.path.join(output_folder, SUMMARIES), states)
+    counts = {DONE: 0, FAILED: 0, 'skipped': len(paths) - len(jobs)}
+    summaries_lock = threading.Lock()
+
+    def run(path):
+        name = names[path]
+        journal.record(path, STARTED)
+        try:
+            result = _solve(path, mode, transport, os.path.join(
+                output_folder, LOGS, name + ".txt"), kwargs)
+            if res.was_interrupted(result):
+                raise JobInterrupted(result['status_verb'])
+            _save_solution(result, os.path.join(
+                output_folder, SOLUTIONS, name + ".npz"))
+        except Exception as err:  # pylint: disable=broad-except
+            journal.record(path, FAILED, error="{0}: {1}".format(
+                type(err).__name__, err))
+            return path, err
+        summary = dict((key, result.get(key)) for key in SUMMARY_KEYS)
+        summary['job'] = path
+        with summaries_lock:
+            with open(os.path.join(output_folder, SUMMARIES), "a") as fp:
+                fp.write(json.dumps(summary, sort_keys=True) + "\n")
+                fp.flush()
+                os.fsync(fp.fileno())
+        journal.record(path, DONE)
+        return path, None
+
+    pool = ThreadPool(workers or multiprocessing.cpu_count())
+    try:
+        for path, error in pool.imap_unordered(run, jobs):
+            if error is None:
+                counts[DONE] += 1
+                print "done: {0}".format(path)
+            else:
+                counts[FAILED] += 1
+                print "failed: {0}: {1}".format(path, error)
+    finally:
+        pool.close()
+        pool.join()
+    return counts
+
+
+def _drop_unfinished_summaries(path, states):
+    '''
+    Rewrites the summaries file path without the lines of jobs the journal
+    states don't have as done, which a crash can leave behind just before
+    the job's DONE entry, and without lines cut short or repeated.  Those
+    jobs are run again and summarized afresh.
+    '''
+    if not os.path.exists(path):
+        return
+    kept = []
+    seen = set()
+    with open(path) as fp:
+        for line in fp:
+            try:
+                job = json.loads(line)['job']
+            except (ValueError, KeyError, TypeError):
+                continue
+            if states.get(job) == DONE and job not in seen:
+                seen.add(job)
+                kept.append(line if line.endswith("\n") else line + "\n")
+    partial = path + ".part"
+    with open(partial, "w") as fp:
+        fp.writelines(kept)
+        fp.flush()
+        os.fsync(fp.fileno())
+    os.rename(partial, path)
+
+
+def _solve(path, mode, transport, output_target, kwargs):
+    '''
+    Solves the .mat file path from a copy in a workspace of its own, so the
+    original is left alone and jobs don't share a folder.
+    '''
+    with ws.workspace(transport) as folder:
+        matfile = os.path.join(folder, "problem.mat")
+        ws.stage(path, matfile)
+        if os.path.exists(output_target):
+            os.remove(output_target)
+        return slv.sdpt3_solve_mat(matfile, mode, output_target=output_target,
+                                   workdir=folder, **kwargs)
+
+
+def _save_solution(result, target):
+    '''
+    Saves the X and Z blocks of result, as X0, X1, ... and Z0, Z1, ..., and y
+    if it is known, to the .npz file target.  It is written under another
+    name and renamed, so target never holds part of a solution.
+    '''
+    arrays = {}
+    for key, name in (('Xvars', "X"), ('Zvars', "Z")):
+        arrays.update(("{0}{1}".format(name, i), np.asarray(block))
+                      for i, block in enumerate(result.get(key) or []))
+    if result.get('y') is not None:
+        arrays['y'] = np.asarray(result['y'])
+    partial = target + ".part"
+    with open(partial, "wb") as fp:
+        np.savez(fp, **arrays)
+    os.rename(partial, target)
+
+
+def main(argv=None):
+    '''
+    Runs the sdpt3glue-batch command with the arguments argv, by default
+    those of the process, and returns its exit status: 0 if every job is
+    done, 1 otherwise.
+    '''
+    parser = argparse.ArgumentParser(
+        prog="sdpt3glue-batch",
+        description="Solves a folder or manifest of Sedumi .mat files with "
+        "SDPT3.  Run it again with the same output folder to resume.")
+    parser.add_argument("source", help="a folder of .mat files, or a "
+                        "manifest listing one .mat file per line")
+    parser.add_argument("output", help="the folder for the journal, "
+                        "summaries, solutions and logs")
+    parser.add_argument("--mode", default=slv.OCTAVE, choices=slv.MODES)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="the number of solves run at once (default: "
+                        "the number of CPUs)")
+    parser.add_argument("--cmd", help="the Octave command, for mode octave")
+    parser.add_argument("--timeout", type=float,
+                        help="the most seconds a solve may take")
+    parser.add_argument("--host", action="append", dest="hosts",
+                        help="a solver server host[:port], for mode remote; "
+                        "may be given more than once")
+    parser.add_argument("--transport", default=ws.RAM,
+                        choices=ws.TRANSPORTS)
+    args = parser.parse_args(argv)
+
+    kwargs = dict((key, value) for key, value in (
+        ('cmd', args.cmd), ('timeout', args.timeout), ('hosts', args.hosts))
+                  if value is not None)
+    try:
+        counts = run_batch(args.source, args.output, mode=args.mode,
+                           workers=args.workers, transport=args.transport,
+                           **kwargs)
+    except (EnvironmentError, ValueError):
+        traceback.print_exc()
+        return 1
+    print "{0[done]} done, {0[failed]} failed, {0[skipped]} skipped".format(
+        counts)
+    return 1 if counts[FAILED] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
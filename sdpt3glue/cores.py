@@ -0,0 +1,135 @@
+#
+# sdpt3glue/cores.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Sharing the machine's cores between solves which run at the same time, so
+that the BLAS threads of each solver don't fight over the same cores.
+"""
+
+import contextlib
+import math
+import multiprocessing
+import threading
+
+import scipy.io
+
+
+def parse_cpu_list(text):
+    '''
+    Returns the CPUs of a list such as "0-3,6" (the format of taskset -c and
+    of /proc/self/status) as a sorted list of ints.
+    '''
+    cpus = set()
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return sorted(cpus)
+
+
+def available_cpus():
+    '''
+    Returns the CPUs this process may run on: its affinity list when /proc
+    gives it, or else all of the machine's CPUs.
+    '''
+    try:
+        with open("/proc/self/status") as fp:
+            for line in fp:
+                if line.startswith("Cpus_allowed_list:"):
+                    return parse_cpu_list(line.partition(":")[2])
+    except IOError:
+        pass
+    return range(multiprocessing.cpu_count())
+
+
+def problem_size(matfile_path):
+    '''
+    Returns the number of constraints of the Sedumi format problem in
+    matfile_path, i.e. the order of SDPT3's Schur complement matrix, whose
+    factorization dominates the cost of each iteration.  Only the file's
+    header is read.
+    '''
+    shapes = dict((name, shape)
+                  for name, shape, _ in scipy.io.whosmat(matfile_path))
+    if 'b' in shapes:
+        return max(shapes['b'])
+    return min(shapes.get('A', (1,)))
+
+
+class CoreScheduler(object):
+    '''
+    Hands out disjoint sets of CPUs to solves running at the same time.
+
+    A solve of a problem with m constraints asks for m / rows_per_core cores
+    (at least one, at most max_cores), since small problems gain nothing
+    from more BLAS threads.  It gets as many of those as are free, waiting
+    only when no core is free at all, so that cores aren't left idle while a
+    large solve waits for its full share.
+    '''
+
+    def __init__(self, cpus=None, rows_per_core=1000, max_cores=None):
+        '''
+        Args:
+            cpus: the CPUs to share out, by default available_cpus().
+            rows_per_core: the number of constraints per core asked for.
+            max_cores: the most cores a single solve gets.
+        '''
+        self.cpus = sorted(cpus if cpus is not None else available_cpus())
+        if not self.cpus:
+            raise ValueError("A core scheduler needs at least one CPU.")
+        self.rows_per_core = rows_per_core
+        self.max_cores = max_cores or len(self.cpus)
+        self._cond = threading.Condition()
+        self._free = list(self.cpus)
+
+    @property
+    def free(self):
+        ''' The number of CPUs not currently handed out. '''
+        with self._cond:
+            return len(self._free)
+
+    def wanted(self, size):
+        '''
+        Returns the number of cores asked for by a problem with size
+        constraints.
+        '''
+        cores = int(math.ceil(float(size) / self.rows_per_core))
+        return max(1, min(cores, self.max_cores, len(self.cpus)))
+
+    def acquire(self, size):
+        '''
+        Waits until a CPU is free, then takes up to wanted(size) of the free
+        CPUs and returns them as a list.  They should be given back with
+        release.
+        '''
+        wanted = self.wanted(size)
+        with self._cond:
+            while not self._free:
+                self._cond.wait()
+            taken, self._free = self._free[:wanted], self._free[wanted:]
+            return taken
+
+    def release(self, cpus):
+        ''' Gives back CPUs taken with acquire. '''
+        with self._cond:
+            self._free = sorted(self._free + list(cpus))
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def reserve(self, size):
+        '''
+        A with block context giving the CPUs acquired for a problem with
+        size constraints, which are released at the end of the block.
+        '''
+        cpus = self.acquire(size)
+        try:
+            yield cpus
+        finally:
+            self.release(cpus)
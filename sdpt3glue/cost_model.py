@@ -0,0 +1,261 @@
+#
+# sdpt3glue/cost_model.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Predicting the solve time, iteration count and peak memory of a solve from
+the structure of its problem, fitted on solves seen before.  The predictions
+can order the jobs of a batch and turn away jobs which would run out of
+memory.
+"""
+
+import json
+
+import numpy as np
+import scipy.sparse
+from scipy.optimize import nnls
+
+import sedumi_writer as sw
+import result as res
+
+
+FEATURE_NAMES = ('m', 'n', 'nnz', 'blocks', 'sum_s2', 'sum_s3',
+                 'schur_density')
+""" The structural features of a problem, as computed by problem_features. """
+
+_TIME_TERMS = ('one', 'schur_flops', 'form_flops', 'sum_s3')
+"""the terms of the time per iteration, each with a nonnegative
+coefficient."""
+
+_MEMORY_TERMS = ('one', 'schur_entries', 'nnz', 'sum_s2')
+"""the terms of the peak memory, each with a nonnegative coefficient."""
+
+_DEFAULT_TIME = (0.05, 1e-9, 1e-9, 1e-9)
+""" Coefficients of _TIME_TERMS used until there are solves to fit on. """
+
+_DEFAULT_MEMORY = (3e8, 16., 200., 64.)
+""" Coefficients of _MEMORY_TERMS used until there are solves to fit on. """
+
+_DEFAULT_ITERATIONS = 30.
+
+
+class InsufficientMemory(Exception):
+    '''
+    This error is raised for a job whose predicted peak memory is larger
+    than the memory available to it.
+    '''
+
+    def __init__(self, predicted, available):
+        super(InsufficientMemory, self).__init__(
+            "The solve is predicted to need {0:.0f} MB, but only {1:.0f} MB "
+            "are available.".format(predicted / 2. ** 20,
+                                    available / 2. ** 20))
+        self.predicted = predicted
+        self.available = available
+
+
+def problem_features(A, b, c, K):
+    '''
+    Returns a dict of the structural features of the Sedumi format problem
+    (A, b, c, K) named in FEATURE_NAMES: the number of constraints m and of
+    variables n, the number of nonzeros of A, the number of cone blocks, the
+    sums of the squares and cubes of the semidefinite block sizes, and an
+    estimate of the density of the Schur complement matrix.
+    '''
+    A = scipy.sparse.csc_matrix(A)
+    m = int(np.asarray(b).size)
+    n = int(np.asarray(c).size)
+    if A.shape != (m, n) and A.shape == (n, m):
+        A = A.T.tocsc()
+    s = np.array([float(dim) for dim in K.get('s', []) if dim > 0])
+    q = [dim for dim in K.get('q', []) if dim > 0]
+    blocks = len(s) + len(q) + (K.get('l', 0) > 0) + (K.get('f', 0) > 0)
+    return {
+        'm': m,
+        'n': n,
+        'nnz': int(A.nnz),
+        'blocks': int(blocks),
+        'sum_s2': float(np.sum(s ** 2)),
+        'sum_s3': float(np.sum(s ** 3)),
+        'schur_density': schur_density(A, K),
+    }
+
+
+def matfile_features(matfile_path):
+    '''
+    Returns problem_features of the Sedumi format problem in matfile_path.
+    '''
+    return problem_features(*sw.read_sedumi_mat(matfile_path))
+
+
+def schur_density(A, K):
+    '''
+    Estimates the share of nonzero entries of the Schur complement matrix
+    of the problem, without forming its pattern (which
+    sedumi_writer.schur_complement_pattern does): each free or nonnegative
+    variable, and each cone, couples every pair of the constraints touching
+    it.  Overlaps between them are counted more than once, so this is an
+    upper bound, capped at 1.
+    '''
+    A = scipy.sparse.csc_matrix(A)
+    m = A.shape[0]
+    if not m or not A.nnz:
+        return 0.
+    n_scalar = int(K.get('f', 0)) + int(K.get('l', 0))
+    entries = float(np.sum(np.diff(A[:, :n_scalar].indptr) ** 2))
+    start = n_scalar
+    sizes = [int(q) for q in K.get('q', [])] + \
+        [int(s) ** 2 for s in K.get('s', [])]
+    for size in sizes:
+        rows = np.unique(A[:, start:start + size].indices).size
+        entries += float(rows) ** 2
+        start += size
+    return min(1., entries / float(m) ** 2)
+
+
+def _terms(features, names):
+    ''' Returns the values of the model terms names for features. '''
+    m = float(features['m'])
+    schur_entries = m ** 2 * features['schur_density']
+    values = {
+        'one': 1.,
+        'schur_flops': m * schur_entries / 3.,
+        'schur_entries': schur_entries,
+        'form_flops': m * features['nnz'],
+        'nnz': float(features['nnz']),
+        'sum_s2': features['sum_s2'],
+        'sum_s3': features['sum_s3'],
+    }
+    return np.array([values[name] for name in names])
+
+
+class CostModel(object):
+    '''
+    Predicts solve time, iterations and peak memory from problem_features.
+
+    Solves are added with record, and fit refits the model on them: the time
+    per iteration and the peak memory are each a nonnegative combination of
+    a few terms (the Schur complement's factorization and formation work
+    and the semidefinite blocks' eigenvalue work for time; the Schur
+    complement's entries, nnz(A) and the semidefinite blocks' entries for
+    memory), and the iteration count is the mean of those seen.  Until it is
+    fitted, the model uses rough defaults.
+    '''
+
+    def __init__(self, records=None):
+        self.records = list(records or [])
+        self.time_coef = np.array(_DEFAULT_TIME)
+        self.memory_coef = np.array(_DEFAULT_MEMORY)
+        self.iterations = _DEFAULT_ITERATIONS
+        if self.records:
+            self.fit()
+
+    def record(self, features, result):
+        '''
+        Adds the solve of a problem with features, whose result dict is
+        result, to the records.  Solves which were interrupted or gave no
+        time are skipped.
+        '''
+        if result.get('solve_time') is None or not result.get('iterations'):
+            return
+        if res.was_interrupted(result):
+            return
+        self.records.append({
+            'features': dict(features),
+            'solve_time': float(result['solve_time']),
+            'iterations': int(result['iterations']),
+            'peak_rss': result.get('peak_rss'),
+        })
+
+    def fit(self):
+        '''
+        Refits the model on the records.  Each part keeps its defaults until
+        there are records to fit it on.
+        '''
+        timed = [record for record in self.records if record['iterations']]
+        if timed:
+            X = np.array([_terms(record['features'], _TIME_TERMS)
+                          for record in timed])
+            y = np.array([record['solve_time'] / record['iterations']
+                          for record in timed])
+            self.time_coef = _fit_nonnegative(X, y)
+            self.iterations = float(np.mean(
+                [record['iterations'] for record in timed]))
+
+        measured = [record for record in self.records if record['peak_rss']]
+        if measured:
+            X = np.array([_terms(record['features'], _MEMORY_TERMS)
+                          for record in measured])
+            y = np.array([float(record['peak_rss']) for record in measured])
+            self.memory_coef = _fit_nonnegative(X, y)
+
+    def predict(self, features):
+        '''
+        Returns a dict of the predicted 'solve_time' (in seconds),
+        'iterations' and 'peak_rss' (in bytes) of a problem with features.
+        '''
+        per_iteration = float(np.dot(self.time_coef,
+                                     _terms(features, _TIME_TERMS)))
+        return {
+            'solve_time': per_iteration * self.iterations,
+            'iterations': self.iterations,
+            'peak_rss': float(np.dot(self.memory_coef,
+                                     _terms(features, _MEMORY_TERMS))),
+        }
+
+    def check_memory(self, features, available=None):
+        '''
+        Raises InsufficientMemory if a problem with features is predicted to
+        need more than available bytes, by default the memory the system
+        says is available.
+        '''
+        if available is None:
+            available = available_memory()
+        if available is None:
+            return
+        predicted = self.predict(features)['peak_rss']
+        if predicted > available:
+            raise InsufficientMemory(predicted, available)
+
+    def save(self, target):
+        ''' Saves the records to the JSON file target. '''
+        with open(target, "w") as fp:
+            json.dump(self.records, fp)
+
+    @classmethod
+    def load(cls, source):
+        ''' Returns a model fitted on the records in the JSON file source. '''
+        with open(source) as fp:
+            return cls(json.load(fp))
+
+
+def _fit_nonnegative(X, y):
+    '''
+    Returns the nonnegative least squares coefficients of y on the columns
+    of X, with each column scaled first so that terms of very different
+    sizes are fitted alike.
+    '''
+    scale = np.abs(X).max(axis=0)
+    scale[scale == 0] = 1.
+    coef, _ = nnls(X / scale, y)
+    return coef / scale
+
+
+def available_memory():
+    '''
+    Returns the memory in bytes the system reports as available to new
+    processes, or None if /proc/meminfo can't be read.
+    '''
+    try:
+        with open("/proc/meminfo") as fp:
+            for line in fp:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (IOError, ValueError, IndexError):
+        pass
+    return None
@@ -0,0 +1,318 @@
+#
+# sdpt3glue/dispatch.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+One entry point for solves which may run on a fixed number of local
+Matlab/Octave slots or on NEOS, chosen job by job from the problem's size,
+how busy the local slots are and how long NEOS has been taking.
+"""
+
+import itertools
+import os.path
+import Queue
+import shutil
+import threading
+import time
+
+import numpy as np
+import scipy.io
+
+import sedumi_writer as sw
+import solve as slv
+import result as res
+import workspace as ws
+from background import BackgroundSolver
+from background import SolveHandle
+
+
+LOCAL = 'local'
+NEOS = slv.NEOS
+ROUTES = (LOCAL, NEOS)
+
+_URGENT, _NORMAL, _STOP = 0, 1, 2
+
+
+def problem_work(matfile_path):
+    '''
+    Returns a rough count of the floating point work of one SDPT3 iteration
+    on the Sedumi format problem in matfile_path: forming the Schur
+    complement (about m nnz(A)), factoring it (m^3 / 3) and the eigenvalue
+    work on each semidefinite block (n^3).
+    '''
+    data = scipy.io.loadmat(matfile_path, variable_names=('A', 'b', 'K'))
+    m = data['b'].shape[0]
+    A = data['A']
+    nnz = A.nnz if hasattr(A, 'nnz') else np.count_nonzero(A)
+    blocks = np.zeros(0)
+    K_struct = data['K'][0, 0]
+    if 's' in K_struct.dtype.names:
+        blocks = np.asarray(K_struct['s'], dtype='d').ravel()
+    return m ** 3 / 3. + float(m) * nnz + float(np.sum(blocks ** 3))
+
+
+class HybridDispatcher(object):
+    '''
+    Routes each submitted solve either to one of local_slots local solver
+    threads or to NEOS, and returns a SolveHandle for it.  The route taken
+    is kept in the result's 'route' entry.
+
+    A job is routed by its work (see problem_work):
+      - to LOCAL if NEOS is off or already has neos_max_jobs jobs in
+        flight,
+      - to NEOS if its work is at least large_work,
+      - to LOCAL if it is latency sensitive with work below small_work,
+      - otherwise wherever it is expected to finish first: locally after
+        the estimated time of the work queued ahead of it, or on NEOS after
+        its observed turnaround.
+
+    Local time is estimated as local_overhead seconds plus a rate per unit
+    of work, and NEOS time as a flat turnaround.  Both start from the given
+    values and follow the solves seen since, smoothed by an exponentially
+    weighted moving average with weight smoothing on the newest one.
+
+    Latency sensitive jobs go ahead of the other jobs waiting for a local
+    slot.
+    '''
+
+    def __init__(self, local_slots=2, local_mode=slv.OCTAVE, neos=True,
+                 neos_max_jobs=10, small_work=1e8, large_work=1e12,
+                 local_overhead=5., local_rate=1e-9, neos_turnaround=120.,
+                 smoothing=0.3, neos_interval=20, transport=ws.RAM,
+                 **local_kwargs):
+        '''
+        Args:
+            local_slots: the number of local solves run at once.
+            local_mode: the mode of local solves, MATLAB or OCTAVE.
+            neos: whether NEOS may be used at all.
+            neos_max_jobs: the most NEOS jobs in flight at once.
+            small_work, large_work: the work below which latency sensitive
+            jobs stay local, and from which jobs go to NEOS.
+            local_overhead, local_rate, neos_turnaround: the starting
+            estimates of the local time per job, local time per unit of
+            work, and NEOS time per job, in seconds.
+            smoothing: the weight of each new observation in the estimates.
+            neos_interval: how often NEOS jobs are polled, in seconds.
+            transport: where each job's workspace folder is made.
+            local_kwargs: passed on to sdpt3_solve_mat for local solves, e.g.
+            cmd or pool.
+        '''
+        assert local_mode in (slv.MATLAB, slv.OCTAVE), \
+            "Please choose local_mode equal to either 'matlab' or 'octave'."
+        self.local_slots = local_slots
+        self.local_mode = local_mode
+        self.neos = neos
+        self.neos_max_jobs = neos_max_jobs
+        self.small_work = small_work
+        self.large_work = large_work
+        self.local_overhead = local_overhead
+        self.local_rate = local_rate
+        self.neos_turnaround = neos_turnaround
+        self.smoothing = smoothing
+        self.transport = transport
+        self.local_kwargs = local_kwargs
+
+        self._lock = threading.Lock()
+        self._local_backlog = 0.
+        self._local_jobs = 0
+        self._neos_jobs = 0
+        self._routed = dict((route, 0) for route in ROUTES)
+        self._order = itertools.count()
+        self._queue = Queue.PriorityQueue()
+        self._workers = [threading.Thread(target=self._work)
+                         for _ in range(local_slots)]
+        for worker in self._workers:
+            worker.daemon = True
+            worker.start()
+        self._neos_solver = BackgroundSolver(
+            max_workers=2, neos_interval=neos_interval)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def submit(self, problem_or_matfile, output_target=None,
+               latency_sensitive=False, reorder=False, **kwargs):
+        '''
+        Routes and starts the solve of a cvxpy problem, which is converted
+        before this returns, or of a Sedumi format .mat file, which is left
+        as it is.
+
+        Args:
+            output_target: if given, the solve log is saved there.
+            latency_sensitive: if True, small jobs are kept local and go
+            ahead of other jobs waiting for a local slot.
+            reorder: for cvxpy problems, as in sdpt3_solve_problem.
+            kwargs: passed on to sdpt3_solve_mat.
+
+        Returns:
+            A SolveHandle for the result.
+        '''
+        if output_target:
+            slv.check_output_target(self.local_mode, output_target)
+        folder = ws.make_workspace(self.transport)
+        matfile = os.path.join(folder, "problem.mat")
+        try:
+            restore = None
+            if isinstance(problem_or_matfile, basestring):
+                ws.stage(problem_or_matfile, matfile)
+            else:
+                options = slv.check_options(kwargs.pop('options', None))
+                problem_data = problem_or_matfile.get_problem_data('CVXOPT')
+                restore = sw.write_cvxpy_to_mat(
+                    problem_data, matfile, reorder=reorder, options=options)
+                if kwargs.get('warm_start') is not None:
+                    kwargs['warm_start'] = res.reorder_warm_start(
+                        kwargs['warm_start'], restore)
+            work = problem_work(matfile)
+        except:
+            shutil.rmtree(folder, ignore_errors=True)
+            raise
+
+        route = self.route(work, latency_sensitive)
+        job = (matfile, folder, output_target, restore, work, kwargs)
+        if route == LOCAL:
+            handle = self._submit_local(job, latency_sensitive)
+        else:
+            handle = self._submit_neos(job)
+        handle.add_done_callback(
+            lambda _: shutil.rmtree(folder, ignore_errors=True))
+        return handle
+
+    def route(self, work, latency_sensitive=False):
+        '''
+        Returns the route, LOCAL or NEOS, a job with the given work would
+        take now.
+        '''
+        with self._lock:
+            if not self.neos or self._neos_jobs >= self.neos_max_jobs:
+                return LOCAL
+            if work >= self.large_work:
+                return NEOS
+            if latency_sensitive and work < self.small_work:
+                return LOCAL
+            return LOCAL if self._local_estimate(work) <= \
+                self.neos_turnaround else NEOS
+
+    def stats(self):
+        '''
+        Returns a dict of the number of jobs sent each way, the local and
+        NEOS jobs not yet finished, and the current time estimates.
+        '''
+        with self._lock:
+            return {
+                'routed': dict(self._routed),
+                'local_jobs': self._local_jobs,
+                'neos_jobs': self._neos_jobs,
+                'local_backlog': self._local_backlog,
+                'local_overhead': self.local_overhead,
+                'local_rate': self.local_rate,
+                'neos_turnaround': self.neos_turnaround,
+            }
+
+    def close(self):
+        '''
+        Waits for the local jobs to finish and stops following NEOS jobs (see
+        BackgroundSolver.close).
+        '''
+        for _ in self._workers:
+            self._queue.put((_STOP, next(self._order), None))
+        for worker in self._workers:
+            worker.join()
+        self._neos_solver.close()
+
+    def _local_estimate(self, work):
+        '''
+        The expected seconds until a new local job with the given work would
+        finish: the backlog shared out between the slots if they are all
+        busy, plus its own time.
+        '''
+        wait = 0.
+        if self._local_jobs >= self.local_slots:
+            wait = self._local_backlog / self.local_slots
+        return wait + self.local_overhead + self.local_rate * work
+
+    def _observe(self, name, value):
+        ''' Moves the estimate name towards the observed value. '''
+        with self._lock:
+            current = getattr(self, name)
+            setattr(self, name, current + self.smoothing * (value - current))
+
+    def _submit_local(self, job, latency_sensitive):
+        handle = SolveHandle()
+        work = job[4]
+        with self._lock:
+            self._routed[LOCAL] += 1
+            self._local_jobs += 1
+            self._local_backlog += self.local_overhead + self.local_rate * work
+        priority = _URGENT if latency_sensitive else _NORMAL
+        self._queue.put((priority, next(self._order), (handle, job)))
+        return handle
+
+    def _work(self):
+        while True:
+            _, _, item = self._queue.get()
+            if item is None:
+                return
+            handle, job = item
+            self._run_local(handle, *job)
+
+    def _run_local(self, handle, matfile, folder, output_target, restore,
+                   work, kwargs):
+        with self._lock:
+            estimate = self.local_overhead + self.local_rate * work
+        start = time.time()
+        try:
+            solve_kwargs = dict(self.local_kwargs, **kwargs)
+            result = slv.sdpt3_solve_mat(
+                matfile, self.local_mode,
+                output_target=output_target or os.path.join(folder, "log.txt"),
+                cancel=handle._cancel, **solve_kwargs)
+            if not output_target:
+                # The log is in folder, which is removed once this is done.
+                result.load_log()
+            result = res.restore_duals(result, restore)
+            result['route'] = LOCAL
+            elapsed = time.time() - start
+            if work > 0 and elapsed > self.local_overhead:
+                self._observe('local_rate',
+                              (elapsed - self.local_overhead) / work)
+            error = None
+        except Exception as err:  # pylint: disable=broad-except
+            result, error = None, err
+        finally:
+            with self._lock:
+                self._local_jobs -= 1
+                self._local_backlog = max(0., self._local_backlog - estimate)
+        handle._finish(result=result, error=error)
+
+    def _submit_neos(self, job):
+        matfile, _, output_target, restore, _, kwargs = job
+        with self._lock:
+            self._routed[NEOS] += 1
+            self._neos_jobs += 1
+        start = time.time()
+        inner = self._neos_solver.submit_mat(
+            matfile, slv.NEOS, output_target=output_target, **kwargs)
+        handle = SolveHandle()
+
+        def finish(_):
+            with self._lock:
+                self._neos_jobs -= 1
+            error = inner.exception()
+            result = None
+            if error is None:
+                self._observe('neos_turnaround', time.time() - start)
+                result = res.restore_duals(inner.result(), restore)
+                result['route'] = NEOS
+            handle._finish(result=result, error=error)
+
+        inner.add_done_callback(finish)
+        return handle
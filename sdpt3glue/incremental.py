@@ -0,0 +1,197 @@
+#
+# sdpt3glue/incremental.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+An append-only Sedumi format problem for cutting-plane loops, where a few
+constraints are added to the same problem on every round.
+"""
+
+import copy
+import os
+import tempfile
+import uuid
+
+import numpy as np
+import scipy.io
+import scipy.sparse
+
+import logcapture
+import sedumi_writer as sw
+import result as res
+import solve_locally as ls
+import worker
+
+
+def _grow(arr, size):
+    '''
+    Returns arr if it can hold size entries, otherwise a copy with at least
+    double the capacity.
+    '''
+    if size <= arr.size:
+        return arr
+    grown = np.empty(max(size, 2 * arr.size), dtype=arr.dtype)
+    grown[:arr.size] = arr
+    return grown
+
+
+class IncrementalProblem(object):
+    '''
+    A problem in Sedumi format (A, b, c, K) to which constraint rows can be
+    appended.  A is kept as growing (row, col, value) arrays, so appending a
+    few rows costs time in proportion to those rows rather than to all of A.
+
+    When solved on a SolverProcess, only the rows appended since the last
+    solve are sent, and the process starts from the previous solution.
+    '''
+
+    def __init__(self, A, b, c, K):
+        A = scipy.sparse.coo_matrix(A, dtype='d')
+        self.c = scipy.sparse.coo_matrix(np.reshape(c, (1, -1)), dtype='d')
+        self.K = copy.deepcopy(K)
+        self.key = uuid.uuid4().hex
+        self.num_vars = A.shape[1]
+        assert self.c.shape[1] == self.num_vars, \
+            "c has {0} entries but A has {1} columns.".format(
+                self.c.shape[1], self.num_vars)
+
+        self._rows = A.row.astype(np.int64)
+        self._cols = A.col.astype(np.int64)
+        self._vals = A.data.copy()
+        self._nnz = A.nnz
+        self._b = np.asarray(b, dtype='d').ravel().copy()
+        self.num_rows = A.shape[0]
+        assert self._b.size == self.num_rows, \
+            "b has {0} entries but A has {1} rows.".format(
+                self._b.size, self.num_rows)
+
+        self._A = None
+        self._holder = None
+        self._sent_rows = 0
+        self._sent_nnz = 0
+
+    @property
+    def A(self):
+        ''' The constraint matrix as a scipy.sparse.csr_matrix. '''
+        if self._A is None:
+            n = self._nnz
+            self._A = scipy.sparse.coo_matrix(
+                (self._vals[:n], (self._rows[:n], self._cols[:n])),
+                shape=(self.num_rows, self.num_vars)).tocsr()
+        return self._A
+
+    @property
+    def holder(self):
+        ''' The SolverProcess the problem was last solved on, if any. '''
+        return self._holder
+
+    @property
+    def b(self):
+        ''' The right hand side as a column vector. '''
+        return self._b[:self.num_rows].reshape(-1, 1)
+
+    def append_rows(self, A_rows, b_rows):
+        '''
+        Appends the constraints A_rows x = b_rows to the problem.
+
+        Returns:
+            The number of constraint rows after appending.
+        '''
+        A_rows = scipy.sparse.coo_matrix(A_rows, dtype='d')
+        b_rows = np.asarray(b_rows, dtype='d').ravel()
+        if A_rows.shape[1] != self.num_vars:
+            raise ValueError(
+                "The new rows have {0} columns but the problem has {1} "
+                "variables.".format(A_rows.shape[1], self.num_vars))
+        if b_rows.size != A_rows.shape[0]:
+            raise ValueError(
+                "{0} rows were given but b_rows has {1} entries.".format(
+                    A_rows.shape[0], b_rows.size))
+
+        end = self._nnz + A_rows.nnz
+        self._rows = _grow(self._rows, end)
+        self._cols = _grow(self._cols, end)
+        self._vals = _grow(self._vals, end)
+        self._rows[self._nnz:end] = A_rows.row + self.num_rows
+        self._cols[self._nnz:end] = A_rows.col
+        self._vals[self._nnz:end] = A_rows.data
+        self._nnz = end
+
+        rows = self.num_rows + b_rows.size
+        self._b = _grow(self._b, rows)
+        self._b[self.num_rows:rows] = b_rows
+        self.num_rows = rows
+
+        self._A = None
+        return self.num_rows
+
+    def delta(self):
+        '''
+        Returns dA, db, m0 where dA and db hold the rows appended since the
+        problem was last sent to a solver process, and m0 is the number of
+        rows that came before them.
+        '''
+        m0 = self._sent_rows
+        start, end = self._sent_nnz, self._nnz
+        dA = scipy.sparse.coo_matrix(
+            (self._vals[start:end],
+             (self._rows[start:end] - m0, self._cols[start:end])),
+            shape=(self.num_rows - m0, self.num_vars))
+        db = self._b[m0:self.num_rows].reshape(-1, 1)
+        return dA, db, m0
+
+    def write_to_mat(self, target):
+        '''
+        Saves the whole problem as a Sedumi format .mat file at target.
+        '''
+        sw.write_sedumi_to_mat(self.A, self.b, self.c.toarray(),
+                               copy.deepcopy(self.K), target)
+
+    def write_delta_to_mat(self, target):
+        '''
+        Saves the rows returned by delta() as a .mat file at target, in the
+        form SDPT3append.m expects.
+        '''
+        dA, db, m0 = self.delta()
+        scipy.io.savemat(target, {'dA': dA, 'db': db, 'm0': 1. * m0})
+
+    def solve(self, process, output_target=None):
+        '''
+        Solves the problem on the SolverProcess process and returns the result
+        dict.  If process already holds an earlier version of this problem,
+        only the new rows are sent and the solve starts from the previous
+        solution.  Otherwise the whole problem is sent.
+        '''
+        handle, matfile = tempfile.mkstemp(suffix=".mat", dir=process.workdir)
+        os.close(handle)
+        result_file = ls.make_result_file(matfile)
+        paths = (process.job_path(matfile), process.job_path(result_file))
+        try:
+            msg = None
+            if self._holder is process and process.alive:
+                self.write_delta_to_mat(matfile)
+                try:
+                    msg = process.call("SDPT3append", self.key, *paths)
+                except worker.WorkerJobError as err:
+                    if err.identifier not in ("SDPT3glue:notheld",
+                                              "SDPT3glue:mismatch"):
+                        raise
+            if msg is None:
+                self.write_to_mat(matfile)
+                msg = process.call("SDPT3append", self.key, *paths)
+            ls.load_result_file(msg, result_file)
+        finally:
+            os.remove(matfile)
+            os.remove(result_file)
+
+        self._holder = process
+        self._sent_rows = self.num_rows
+        self._sent_nnz = self._nnz
+
+        logcapture.save_log(msg, output_target)
+        return res.make_result_dict(msg)
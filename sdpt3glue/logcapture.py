@@ -0,0 +1,198 @@
+#
+# sdpt3glue/logcapture.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Capture of solver logs whose memory use stays bounded.  The X, y and Z blocks
+printed at the end of a solve can be far larger than the rest of the log, so
+past a size threshold the log is moved to a temporary file and only the lines
+outside of those blocks are kept in memory.
+"""
+
+import os
+import re
+import shutil
+import tempfile
+
+
+BLOCK_HEADER = re.compile(r'(X|Z)\{\d*\} =\s*$|(y) =\s*$')
+"""
+Matches the line starting each X, y or Z block printed by SDPT3report.m, with
+the name of the variable as its first or second group.
+"""
+
+BLOCK_END = '>>'
+""" The line ending each block printed by SDPT3report.m. """
+
+
+class SolverLog(object):
+    '''
+    The log of a solve, built up line by line with append.  Until the log
+    passes spill_threshold bytes it is kept in memory; after that it is
+    written to a temporary file in spill_dir (by default the system's
+    temporary folder), which is removed when the log is closed or garbage
+    collected.
+
+    The summary, i.e. every line outside of the "X{i} =", "y =" and "Z{i} ="
+    ... ">>" blocks, is always kept in memory.  str(log) and read() give the whole log.
+    '''
+
+    spill_threshold = 16 * 2 ** 20
+    """ The default size in bytes past which logs are moved to a file. """
+
+    peak_rss = None
+    """ The peak resident memory in bytes of the solver, once it is known. """
+
+    blocks = None
+    """ The X blocks, if they arrived already parsed rather than in the log. """
+
+    solution = None
+    """ The solution saved by the solver, if any (see result.read_result_mat). """
+
+    def __init__(self, spill_threshold=None, spill_dir=None):
+        if spill_threshold is not None:
+            self.spill_threshold = spill_threshold
+        self._spill_dir = spill_dir
+        self._summary = []
+        self._lines = []
+        self._size = 0
+        self._in_block = False
+        self._path = None
+        self._fp = None
+
+    def __del__(self):
+        self.close()
+
+    def __len__(self):
+        return self._size
+
+    def __str__(self):
+        return self.read()
+
+    def __repr__(self):
+        return "<SolverLog of {0} bytes{1}>".format(
+            self._size, " in " + self._path if self._path else "")
+
+    def __contains__(self, text):
+        if text in self.summary:
+            return True
+        if self._path is None:
+            return text in "".join(self._lines)
+        self._flush()
+        # Pieces are read with enough of the previous one kept to catch text
+        # which straddles them.
+        keep = len(text) - 1
+        tail = ""
+        with open(self._path) as fp:
+            for chunk in iter(lambda: fp.read(2 ** 20), ""):
+                tail += chunk
+                if text in tail:
+                    return True
+                tail = tail[len(tail) - keep:] if keep else ""
+        return False
+
+    @property
+    def spilled(self):
+        ''' True once the log has been moved to a file. '''
+        return self._path is not None
+
+    @property
+    def path(self):
+        ''' The path of the file holding the log, or None while in memory. '''
+        return self._path
+
+    @property
+    def summary(self):
+        ''' The lines of the log outside of the X, y and Z blocks. '''
+        return "".join(self._summary)
+
+    def append(self, line):
+        '''
+        Adds line, which should end with a line break, to the log.
+        '''
+        stripped = line.strip()
+        if self._in_block:
+            self._in_block = stripped != BLOCK_END
+        elif BLOCK_HEADER.match(stripped):
+            self._in_block = True
+        else:
+            self._summary.append(line)
+
+        self._size += len(line)
+        if self._fp is not None:
+            self._fp.write(line)
+        else:
+            self._lines.append(line)
+            if self._size > self.spill_threshold:
+                self._spill()
+
+    def lines(self):
+        '''
+        Iterates over the lines of the whole log, reading them from its file
+        if it has been moved to one.
+        '''
+        if self._path is None:
+            for line in self._lines:
+                yield line
+            return
+        self._flush()
+        with open(self._path) as fp:
+            for line in fp:
+                yield line
+
+    def read(self):
+        ''' Returns the whole log as a string. '''
+        return "".join(self.lines())
+
+    def write_to(self, fp):
+        '''
+        Writes the whole log to the open file fp, a piece at a time.
+        '''
+        if self._path is None:
+            fp.writelines(self._lines)
+            return
+        self._flush()
+        with open(self._path) as source:
+            shutil.copyfileobj(source, fp)
+
+    def close(self):
+        '''
+        Removes the log's file, if it has one.  The log can't be read after
+        that, but its summary is kept.
+        '''
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+        if self._path is not None and os.path.exists(self._path):
+            os.remove(self._path)
+
+    def _flush(self):
+        if self._fp is not None:
+            self._fp.flush()
+
+    def _spill(self):
+        handle, self._path = tempfile.mkstemp(
+            prefix="sdpt3log", suffix=".txt", dir=self._spill_dir)
+        self._fp = os.fdopen(handle, "w")
+        self._fp.writelines(self._lines)
+        self._lines = None
+
+
+def save_log(msg, output_target):
+    '''
+    Saves the log msg, a string or a SolverLog, to the file output_target
+    (if given).
+    '''
+    if not output_target:
+        return
+    with open(output_target, "w") as fp:
+        if isinstance(msg, SolverLog):
+            msg.write_to(fp)
+        else:
+            fp.write(msg)
+
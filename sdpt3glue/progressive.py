@@ -0,0 +1,150 @@
+#
+# sdpt3glue/progressive.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Progressive-accuracy solves: a quick, loose screening solve first, and a
+full-accuracy refinement later, only for the problems worth it.
+"""
+
+import os.path
+import shutil
+import time
+
+import sedumi_writer as sw
+import solve as slv
+import result as res
+import workspace as ws
+
+
+SCREENING = 'screening'
+REFINEMENT = 'refinement'
+
+SCREENING_OPTIONS = {'gaptol': 1e-3, 'inftol': 1e-3}
+""" The default sqlp options of screening solves. """
+
+REFINEMENT_OPTIONS = {'gaptol': 1e-8, 'inftol': 1e-8}
+""" The default sqlp options of refinement solves, SDPT3's own defaults. """
+
+_STAGE_KEYS = ('iterations', 'status_num', 'primal_z', 'dual_z', 'rel_gap',
+               'solve_time')
+
+
+class ProgressiveSolve(object):
+    '''
+    A problem solved in two stages.  screen() solves it with loose
+    tolerances and returns the result straight away.  refine() solves it
+    again with tight tolerances, starting from the screening solution.
+
+    Every result has a 'stage' entry naming the stage it came from, and a
+    'stages' list with a record of each stage run so far: its options,
+    wall clock time, whether it was warm started, and the main numbers of
+    its result.
+
+    The problem's .mat file is kept in a workspace folder (see
+    workspace.make_workspace) until close() is called.
+    '''
+
+    def __init__(self, problem_or_matfile, mode, screening_options=None,
+                 refinement_options=None, transport=ws.DISK, reorder=False,
+                 **kwargs):
+        '''
+        Args:
+            problem_or_matfile: a cvxpy problem or the path of a Sedumi
+            format .mat file, which is left as it is.
+            mode: one of MATLAB, OCTAVE, NEOS, CVXOPT, AUTO or REMOTE.
+            screening_options, refinement_options: the sqlp options of the
+            two stages, by default SCREENING_OPTIONS and REFINEMENT_OPTIONS.
+            transport: where the workspace folder is made.
+            reorder: for cvxpy problems, as in sdpt3_solve_problem.
+            kwargs: passed on to sdpt3_solve_mat in both stages.
+        '''
+        assert mode in slv.MODES, \
+            "Please choose mode from {0}.".format(", ".join(slv.MODES))
+        self.mode = mode
+        self.screening_options = slv.check_options(
+            SCREENING_OPTIONS if screening_options is None
+            else screening_options)
+        self.refinement_options = slv.check_options(
+            REFINEMENT_OPTIONS if refinement_options is None
+            else refinement_options)
+        self.screening = None
+        self.refined = None
+        self._kwargs = kwargs
+        self._restore = None
+
+        self._folder = ws.make_workspace(transport)
+        self.matfile = os.path.join(self._folder, "problem.mat")
+        try:
+            if isinstance(problem_or_matfile, basestring):
+                ws.stage(problem_or_matfile, self.matfile)
+            else:
+                problem_data = problem_or_matfile.get_problem_data('CVXOPT')
+                self._restore = sw.write_cvxpy_to_mat(
+                    problem_data, self.matfile, reorder=reorder)
+        except:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def screen(self, output_target=None, **kwargs):
+        '''
+        Runs the screening solve and returns its result, which is also kept
+        in the screening attribute.
+        '''
+        self.screening = self._solve(
+            SCREENING, self.screening_options, None, [], output_target, kwargs)
+        return self.screening
+
+    def refine(self, output_target=None, **kwargs):
+        '''
+        Runs the refinement solve, warm started from the screening solution
+        if there is one, and returns its result, which is also kept in the
+        refined attribute.  Its 'stages' list includes the screening stage.
+        '''
+        warm_start = None
+        stages = []
+        if self.screening is not None:
+            stages = self.screening['stages']
+            if self.screening['Xvars']:
+                warm_start = res.reorder_warm_start(
+                    self.screening, self._restore)
+        self.refined = self._solve(
+            REFINEMENT, self.refinement_options, warm_start, stages,
+            output_target, kwargs)
+        return self.refined
+
+    def close(self):
+        ''' Removes the workspace folder and the problem's .mat file. '''
+        shutil.rmtree(self._folder, ignore_errors=True)
+
+    def _solve(self, stage, options, warm_start, stages, output_target,
+               kwargs):
+        solve_kwargs = dict(self._kwargs, **kwargs)
+        start = time.time()
+        result = slv.sdpt3_solve_mat(
+            self.matfile, self.mode, output_target=output_target,
+            discard_matfile=False, warm_start=warm_start, options=options,
+            **solve_kwargs)
+        result = res.restore_duals(result, self._restore)
+
+        record = dict((key, result.get(key)) for key in _STAGE_KEYS)
+        record.update({
+            'stage': stage,
+            'options': options,
+            'warm_started': warm_start is not None,
+            'wall_time': time.time() - start,
+        })
+        result['stage'] = stage
+        result['stages'] = list(stages) + [record]
+        return result
@@ -0,0 +1,590 @@
+#
+# sdpt3glue/remote.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Solves on other hosts: a small TCP server which runs solves with its host's
+Matlab or Octave, and a client, used by the REMOTE mode of sdpt3_solve_mat,
+which spreads solves over several such servers.
+
+Messages are frames of a one letter type, a 4 byte big-endian length and
+that many bytes.  A solve is a Q frame (a JSON header) followed by a D frame
+for each file it names.  The server answers with a P frame (a JSON
+iteration row) for each row of SDPT3's iteration table as it is printed,
+then an R frame (the log without its X, y and Z blocks, and the solver's
+info) followed by an X frame (the X and Z blocks and y as a .npz), or an E
+frame (a JSON error).  While the solve runs, the
+client may send a C frame to stop it.  A connection carries any number of
+solves one after another.
+"""
+
+import contextlib
+import io
+import json
+import os
+import os.path
+import select
+import shutil
+import socket
+import SocketServer
+import struct
+import threading
+import time
+
+import numpy as np
+import scipy.sparse
+
+import logcapture
+import sedumi_writer as sw
+import solve_locally as ls
+import result as res
+import workspace as ws
+
+
+DEFAULT_PORT = 8750
+
+_HEADER = struct.Struct("!cI")
+_POLL_INTERVAL = 0.1
+
+
+class RemoteError(Exception):
+    '''
+    This error is raised when a server breaks the protocol or reports an
+    error of its own.
+    '''
+    pass
+
+
+def send_frame(sock, kind, payload=""):
+    ''' Sends a frame of type kind with the bytes payload. '''
+    sock.sendall(_HEADER.pack(kind, len(payload)) + payload)
+
+
+def recv_frame(sock):
+    '''
+    Receives a frame and returns it as (kind, payload), or (None, None) if
+    the connection was closed before its first byte.
+    '''
+    header = _recv_exactly(sock, _HEADER.size, allow_eof=True)
+    if header is None:
+        return None, None
+    kind, length = _HEADER.unpack(header)
+    return kind, _recv_exactly(sock, length)
+
+
+def _recv_exactly(sock, size, allow_eof=False):
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(min(remaining, 2 ** 20))
+        if not chunk:
+            if allow_eof and remaining == size:
+                return None
+            raise RemoteError("The connection closed in the middle of a frame.")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return "".join(chunks)
+
+
+def pack_arrays(arrays):
+    ''' Returns the list of arrays (or numbers) as .npz bytes. '''
+    buf = io.BytesIO()
+    np.savez(buf, *[np.asarray(array) for array in arrays])
+    return buf.getvalue()
+
+
+def unpack_arrays(payload):
+    ''' The reverse of pack_arrays; 0-d arrays come back as floats. '''
+    with np.load(io.BytesIO(payload)) as data:
+        arrays = [data["arr_{0}".format(i)] for i in range(len(data.files))]
+    return [float(array) if array.ndim == 0 else array for array in arrays]
+
+
+def pack_sedumi(A, b, c, K):
+    '''
+    Returns the header fields and payload sending the Sedumi format problem
+    (A, b, c, K) as arrays instead of a .mat file.
+    '''
+    A = scipy.sparse.csc_matrix(A, dtype='d')
+    K = dict((name, np.asarray(dims, dtype='d').ravel().tolist())
+             for name, dims in K.items())
+    payload = pack_arrays([A.data, A.indices, A.indptr, A.shape,
+                           np.asarray(b, dtype='d'), np.asarray(c, dtype='d')])
+    return {'format': 'arrays', 'K': K}, payload
+
+
+def unpack_sedumi(header, payload):
+    ''' The reverse of pack_sedumi, returning (A, b, c, K). '''
+    data, indices, indptr, shape, b, c = unpack_arrays(payload)
+    A = scipy.sparse.csc_matrix((data, indices, indptr),
+                                shape=tuple(int(x) for x in shape))
+    K = {}
+    for name, dims in header['K'].items():
+        K[str(name)] = dims if name in ('q', 'r', 's') else sum(dims)
+    return A, np.atleast_2d(b), np.atleast_2d(c), K
+
+
+class SolverServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    '''
+    Runs solves sent by clients with this host's Matlab or Octave, at most
+    slots at once.  Each solve runs in a workspace folder of its own (see
+    workspace.make_workspace), which is removed afterwards.
+
+    The server is started with serve_forever and stopped with shutdown and
+    server_close, or used in a with block, which starts it on a thread of
+    its own.  With port 0 a free port is picked; server_address gives it.
+    '''
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, mode="octave",
+                 slots=1, transport=ws.RAM, **solve_kwargs):
+        '''
+        Args:
+            host, port: the address to listen on.
+            mode: MATLAB or OCTAVE.
+            slots: the most solves run at once.
+            transport: where the workspace folders are made.
+            solve_kwargs: passed on to solve_locally.octave_solve or
+            matlab_solve, e.g. cmd.
+        '''
+        assert mode in ("matlab", "octave"), \
+            "Please choose mode equal to either 'matlab' or 'octave'."
+        SocketServer.TCPServer.__init__(self, (host, port), _SolveHandler)
+        self.mode = mode
+        self.transport = transport
+        self.solve_kwargs = solve_kwargs
+        self.slots = threading.Semaphore(slots)
+        self._thread = None
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+    def server_close(self):
+        '''
+        Stops listening, and ends the connections kept open by clients.
+        '''
+        SocketServer.TCPServer.server_close(self)
+        with self._connections_lock:
+            connections = list(self._connections)
+        for sock in connections:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+    def solve(self, folder, header, files, progress_callback, cancel):
+        '''
+        Runs the solve described by header, whose files (a list of payloads)
+        are written to folder, and returns the log as a SolverLog.
+        '''
+        matfile = os.path.join(folder, "problem.mat")
+        if header.get('format') == 'arrays':
+            A, b, c, K = unpack_sedumi(header, files[0])
+            sw.write_sedumi_to_mat(A, b, c, K, matfile)
+        else:
+            with open(matfile, "wb") as fp:
+                fp.write(files[0])
+        settings_file = None
+        if len(files) > 1:
+            settings_file = os.path.join(folder, "settings.mat")
+            with open(settings_file, "wb") as fp:
+                fp.write(files[1])
+
+        backend = ls.matlab_solve if self.mode == "matlab" else ls.octave_solve
+        kwargs = dict(self.solve_kwargs, discard_matfile=False,
+                      settings_file=settings_file,
+                      progress_callback=progress_callback, cancel=cancel)
+        with self.slots:
+            return backend(matfile, **kwargs)
+
+
+class _SolveHandler(SocketServer.BaseRequestHandler):
+    '''
+    Serves the solves sent on one connection, one after another.
+    '''
+
+    def setup(self):
+        with self.server._connections_lock:
+            self.server._connections.add(self.request)
+
+    def finish(self):
+        with self.server._connections_lock:
+            self.server._connections.discard(self.request)
+
+    def handle(self):
+        while True:
+            try:
+                kind, payload = recv_frame(self.request)
+            except (socket.error, RemoteError):
+                return
+            if kind is None:
+                return
+            if kind != "Q":
+                # e.g. a stop request sent just as the last solve finished.
+                continue
+            header = json.loads(payload)
+            files = []
+            for _ in range(int(header.get('files', 1))):
+                kind, payload = recv_frame(self.request)
+                if kind != "D":
+                    raise RemoteError("Expected a file frame.")
+                files.append(payload)
+            self._solve(header, files)
+
+    def _solve(self, header, files):
+        cancel = threading.Event()
+        watching = threading.Event()
+        watching.set()
+        watcher = threading.Thread(target=self._watch, args=(cancel, watching))
+        watcher.daemon = True
+        watcher.start()
+
+        def send_progress(row):
+            send_frame(self.request, "P", json.dumps(row))
+
+        folder = ws.make_workspace(self.server.transport)
+        try:
+            try:
+                log = self.server.solve(folder, header, files, send_progress,
+                                        cancel)
+            finally:
+                watching.clear()
+                watcher.join()
+        except ls.SolveInterrupted as err:
+            error = {'kind': 'interrupted', 'progress': err.progress,
+                     'log': str(err.msg)}
+        except Exception as err:  # pylint: disable=broad-except
+            error = {'kind': type(err).__name__, 'message': str(err)}
+        else:
+            error = None
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+        if error is not None:
+            send_frame(self.request, "E", json.dumps(error))
+            return
+        solution = res.extract_solution(log)
+        y = solution['y']
+        send_frame(self.request, "R", json.dumps({
+            'summary': log.summary, 'peak_rss': log.peak_rss,
+            'blocks': [len(solution['Xvars']), len(solution['Zvars'])],
+            'has_y': y is not None, 'info': solution['info']},
+            default=lambda value: np.asarray(value).tolist()))
+        send_frame(self.request, "X", pack_arrays(
+            solution['Xvars'] + solution['Zvars'] + ([y] if y is not None
+                                                      else [])))
+
+    def _watch(self, cancel, watching):
+        '''
+        Sets cancel when the client sends a stop request during the solve.
+        '''
+        while watching.is_set():
+            readable, _, _ = select.select([self.request], [], [],
+                                           _POLL_INTERVAL)
+            if not readable:
+                continue
+            kind, _ = recv_frame(self.request)
+            if kind in ("C", None):
+                cancel.set()
+                return
+
+
+class RemoteClient(object):
+    '''
+    Sends solves to a list of SolverServer hosts, each given as (host, port)
+    or "host:port".  Each solve goes to the host with the fewest solves under
+    way, and up to max_connections connections to each host are kept open
+    for later solves.  A host which can't be reached is skipped for
+    retry_after seconds.
+    '''
+
+    def __init__(self, hosts, max_connections=4, connect_timeout=10.,
+                 retry_after=30.):
+        self.hosts = [_address(host) for host in hosts]
+        if not self.hosts:
+            raise ValueError("A remote client needs at least one host.")
+        self.max_connections = max_connections
+        self.connect_timeout = connect_timeout
+        self.retry_after = retry_after
+        self._cond = threading.Condition()
+        self._idle = dict((host, []) for host in self.hosts)
+        self._busy = dict((host, 0) for host in self.hosts)
+        self._down_until = dict((host, 0.) for host in self.hosts)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def solve(self, matfile=None, arrays=None, settings_file=None,
+              progress_callback=None, timeout=None, cancel=None):
+        '''
+        Solves the Sedumi format problem in the .mat file matfile, or given
+        as the tuple arrays (A, b, c, K), on one of the hosts, and returns
+        its log as a logcapture.SolverLog whose X blocks and solution arrive
+        already parsed, as its blocks and solution attributes.
+
+        settings_file, progress_callback, timeout and cancel are treated as
+        in solve_locally.octave_solve.
+
+        Raises:
+            SubprocessCallError when no host can be reached or the solver
+            failed on the host.
+            SolveStopped, SolveTimeout, SolveCancelled as octave_solve does.
+            RemoteError when a host breaks the protocol.
+        '''
+        if arrays is not None:
+            header, payload = pack_sedumi(*arrays)
+        else:
+            header = {'format': 'mat'}
+            with open(matfile, "rb") as fp:
+                payload = fp.read()
+        files = [payload]
+        if settings_file:
+            with open(settings_file, "rb") as fp:
+                files.append(fp.read())
+        header['files'] = len(files)
+
+        for attempt in range(2):
+            reused = False
+            try:
+                with self._connection() as (sock, reused):
+                    try:
+                        send_frame(sock, "Q", json.dumps(header))
+                        for data in files:
+                            send_frame(sock, "D", data)
+                    except socket.error:
+                        raise _StaleConnection()
+                    return self._receive(sock, progress_callback, timeout,
+                                         cancel)
+            except _StaleConnection:
+                # A kept connection which the server had closed: the solve
+                # never started, so it is sent again on a new connection.
+                if not reused or attempt:
+                    raise ls.SubprocessCallError(
+                        "The solver server closed the connection.")
+
+    def close(self):
+        ''' Closes the idle connections. '''
+        with self._cond:
+            idle = [sock for socks in self._idle.values() for sock in socks]
+            for socks in self._idle.values():
+                del socks[:]
+        for sock in idle:
+            sock.close()
+
+    def _receive(self, sock, progress_callback, timeout, cancel):
+        '''
+        Reads the answer to a solve, sending a stop request when
+        progress_callback, timeout or cancel asks for one.
+        '''
+        start = time.time()
+        progress = None
+        reason = None
+        first = True
+        while True:
+            if reason is None:
+                if timeout is not None and time.time() - start > timeout:
+                    reason = ls.SolveTimeout
+                elif cancel is not None and cancel.is_set():
+                    reason = ls.SolveCancelled
+                if reason is not None:
+                    send_frame(sock, "C")
+            readable, _, _ = select.select([sock], [], [], _POLL_INTERVAL)
+            if not readable:
+                continue
+            try:
+                kind, payload = recv_frame(sock)
+            except socket.error:
+                kind = None
+            if kind is None:
+                if first:
+                    raise _StaleConnection()
+                raise ls.SubprocessCallError(
+                    "The solver server closed the connection during a solve.")
+            first = False
+
+            if kind == "P":
+                progress = json.loads(payload)
+                if reason is None and progress_callback is not None and \
+                        progress_callback(progress):
+                    reason = ls.SolveStopped
+                    send_frame(sock, "C")
+            elif kind == "R":
+                header = json.loads(payload)
+                kind, payload = recv_frame(sock)
+                if kind != "X":
+                    raise RemoteError("Expected the X blocks after the log.")
+                return _make_solved_log(header, unpack_arrays(payload))
+            elif kind == "E":
+                error = json.loads(payload)
+                if error['kind'] != 'interrupted':
+                    if error['kind'] == 'SubprocessCallError':
+                        raise ls.SubprocessCallError(error['message'])
+                    raise RemoteError("{0}: {1}".format(
+                        error['kind'], error['message']))
+                log = _make_log(error['log'])
+                raise (reason or ls.SolveCancelled)(
+                    "The remote solve was stopped.", log, error['progress'])
+            else:
+                raise RemoteError("Unexpected frame type {0!r}.".format(kind))
+
+    @contextlib.contextmanager
+    def _connection(self):
+        '''
+        Checks out a connection to the least busy reachable host for a with
+        block, as (socket, reused).  It is kept for later solves if the
+        block ends normally, and closed otherwise.
+        '''
+        tried = set()
+        while True:
+            host, sock = self._checkout(tried)
+            reused = sock is not None
+            if sock is None:
+                try:
+                    sock = socket.create_connection(
+                        host, timeout=self.connect_timeout)
+                    sock.settimeout(None)
+                except socket.error:
+                    self._mark_down(host)
+                    tried.add(host)
+                    continue
+            break
+        try:
+            yield sock, reused
+        except:
+            sock.close()
+            self._checkin(host, None)
+            raise
+        else:
+            self._checkin(host, sock)
+
+    def _checkout(self, tried):
+        with self._cond:
+            while True:
+                now = time.time()
+                candidates = [host for host in self.hosts
+                              if host not in tried
+                              and self._down_until[host] <= now]
+                if not candidates:
+                    raise ls.SubprocessCallError(
+                        "None of the solver servers {0} could be "
+                        "reached.".format(", ".join(
+                            "{0}:{1}".format(*host) for host in self.hosts)))
+                free = [host for host in candidates
+                        if self._busy[host] < self.max_connections]
+                if free:
+                    host = min(free, key=lambda h: self._busy[h])
+                    self._busy[host] += 1
+                    idle = self._idle[host]
+                    return host, (idle.pop() if idle else None)
+                self._cond.wait(_POLL_INTERVAL)
+
+    def _checkin(self, host, sock):
+        with self._cond:
+            self._busy[host] -= 1
+            if sock is not None:
+                self._idle[host].append(sock)
+            self._cond.notify()
+
+    def _mark_down(self, host):
+        with self._cond:
+            self._busy[host] -= 1
+            self._down_until[host] = time.time() + self.retry_after
+            self._cond.notify()
+
+
+class _StaleConnection(Exception):
+    pass
+
+
+def _address(host):
+    ''' Returns host, given as (host, port) or "host[:port]", as a tuple. '''
+    if isinstance(host, basestring):
+        name, _, port = host.rpartition(":") if ":" in host else (host, "", "")
+        return (name, int(port or DEFAULT_PORT))
+    return (host[0], int(host[1]))
+
+
+def _make_solved_log(header, arrays):
+    '''
+    Returns the log of a finished solve from its R frame's header and its X
+    frame's arrays: the X blocks, the Z blocks and, if there is one, y.
+    '''
+    log = _make_log(header['summary'])
+    log.peak_rss = header.get('peak_rss')
+    x_count, z_count = header['blocks']
+    log.blocks = arrays[:x_count]
+    log.solution = {
+        'Xvars': log.blocks,
+        'Zvars': arrays[x_count:x_count + z_count],
+        'y': arrays[x_count + z_count] if header['has_y'] else None,
+        'info': header.get('info') or {},
+    }
+    return log
+
+
+def _make_log(text):
+    log = logcapture.SolverLog()
+    for line in text.splitlines(True):
+        log.append(line)
+    return log
+
+
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def remote_solve(matfile_target, discard_matfile=True, client=None,
+                 hosts=None, progress_callback=None, timeout=None,
+                 cancel=None, settings_file=None, **_):
+    '''
+    The .mat is sent to a SolverServer and solved there with SDPT3.
+
+    Args:
+        matfile_target: the path to the .mat file containing the Sedumi format problem data.
+        discard_matfile: if True, deletes the .mat file after the solve finishes.
+        client: the RemoteClient to send the solve with.
+        hosts: without a client, the list of hosts of a RemoteClient shared
+        by every solve given the same hosts.
+        progress_callback, timeout, cancel, settings_file: as for
+        solve_locally.octave_solve.  Solves are stopped on the host.
+
+    Returns:
+        The solve log, as a logcapture.SolverLog.
+    '''
+    if client is None:
+        if not hosts:
+            raise ValueError("Remote solves need a client or a list of hosts.")
+        key = tuple(_address(host) for host in hosts)
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get(key)
+            if client is None:
+                client = _CLIENTS[key] = RemoteClient(key)
+    try:
+        return client.solve(matfile_target, settings_file=settings_file,
+                            progress_callback=progress_callback,
+                            timeout=timeout, cancel=cancel)
+    finally:
+        # Cleanup
+        if discard_matfile:
+            print "now deleting {0}".format(matfile_target)
+            os.remove(matfile_target)
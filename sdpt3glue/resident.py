@@ -0,0 +1,150 @@
+#
+# sdpt3glue/resident.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Sedumi format problems whose constraint matrix stays resident in a
+long-lived solver process, for sweeps where only b and c change between
+solves.
+"""
+
+import copy
+import os
+import tempfile
+
+import numpy as np
+import scipy.io
+import scipy.sparse
+
+import logcapture
+import sedumi_writer as sw
+import solve as slv
+import result as res
+import solve_locally as ls
+import worker
+
+
+class ResidentProblem(object):
+    '''
+    A problem in Sedumi format (A, b, c, K) whose A and K, once sent to a
+    SolverProcess, are kept there in SDPT3's own format under a hash of
+    their contents.  Later solves on that process send only b and c, so the
+    data sent per solve grows with the number of rows and columns of A
+    rather than with its number of nonzeros.
+
+    Since the key is a content hash, problems built separately from the
+    same A and K share what a process holds.
+    '''
+
+    def __init__(self, A, b, c, K):
+        self.A = scipy.sparse.csc_matrix(A, dtype='d')
+        self.K = copy.deepcopy(K)
+        self.key = sw.content_hash(self.A, self.K)
+        self._holder = None
+        self.b = None
+        self.c = None
+        self.set_vectors(b, c)
+
+    @classmethod
+    def from_mat(cls, source):
+        ''' Builds the problem from the Sedumi format .mat file source. '''
+        return cls(*sw.read_sedumi_mat(source))
+
+    @property
+    def holder(self):
+        ''' The SolverProcess the problem was last solved on, if any. '''
+        return self._holder
+
+    def set_vectors(self, b=None, c=None):
+        '''
+        Replaces the right hand side b and/or the objective c.
+        '''
+        m, n = self.A.shape
+        if b is not None:
+            b = np.asarray(b, dtype='d').reshape(-1, 1)
+            if b.shape[0] != m:
+                raise ValueError(
+                    "b has {0} entries but A has {1} rows.".format(
+                        b.shape[0], m))
+            self.b = b
+        if c is not None:
+            c = np.asarray(c, dtype='d').reshape(1, -1)
+            if c.shape[1] != n:
+                raise ValueError(
+                    "c has {0} entries but A has {1} columns.".format(
+                        c.shape[1], n))
+            self.c = c
+
+    def write_to_mat(self, target):
+        '''
+        Saves the whole problem as a Sedumi format .mat file at target.
+        '''
+        sw.write_sedumi_to_mat(self.A, self.b, self.c, copy.deepcopy(self.K),
+                               target)
+
+    def solve(self, process, b=None, c=None, warm_start=None, options=None,
+              output_target=None):
+        '''
+        Solves the problem on the SolverProcess process and returns the result
+        dict.  b and c, if given, first replace the problem's own (see
+        set_vectors).  Only b and c are sent if process already holds A and
+        K; otherwise the whole problem is sent and kept there.
+
+        Args:
+            warm_start: a starting point, as for sdpt3_solve_mat.
+            options: a dict of sqlp options (see solve.check_options).
+            output_target: if given, the solve log is saved there.
+        '''
+        self.set_vectors(b, c)
+        options = slv.check_options(options)
+
+        handle, matfile = tempfile.mkstemp(suffix=".mat", dir=process.workdir)
+        os.close(handle)
+        result_file = ls.make_result_file(matfile)
+        paths = (process.job_path(matfile), process.job_path(result_file))
+        try:
+            msg = None
+            if self.key in process.resident and process.alive:
+                self._write_update(matfile, warm_start, options, full=False)
+                try:
+                    msg = process.call("SDPT3update", self.key, *paths)
+                except worker.WorkerJobError as err:
+                    if err.identifier != "SDPT3glue:notheld":
+                        raise
+            if msg is None:
+                self._write_update(matfile, warm_start, options, full=True)
+                msg = process.call("SDPT3update", self.key, *paths)
+                process.resident.add(self.key)
+            ls.load_result_file(msg, result_file)
+        finally:
+            os.remove(matfile)
+            os.remove(result_file)
+
+        self._holder = process
+        logcapture.save_log(msg, output_target)
+        return res.make_result_dict(msg)
+
+    def release(self, process):
+        '''
+        Frees what process holds for this problem's A and K.
+        '''
+        if self.key in process.resident:
+            process.call("SDPT3store", "clear", self.key)
+            process.resident.discard(self.key)
+
+    def _write_update(self, target, warm_start, options, full):
+        '''
+        Saves b and c, with the settings of the solve and, if full, A and K,
+        in the form SDPT3update.m expects.
+        '''
+        data = sw.make_solve_settings(warm_start, options)
+        data.update({'b': self.b, 'c': self.c})
+        if full:
+            data.update({'A': sw.sparsify_tall_mat(self.A),
+                         'K': sw.clean_K_dims(copy.deepcopy(self.K))})
+        scipy.io.savemat(target, data)
@@ -11,8 +11,13 @@
 
 """
 
+import collections
 import re
-from numpy import zeros
+import numpy as np
+import scipy.io
+import scipy.sparse
+
+import logcapture
 
 
 _SDPT3_POS_STATUS_MAP_VERB = (
@@ -51,23 +56,384 @@ _KEY_LIST = {
 """the key is what we look for in the SDPT3 message output, the value is
 the name of key we'll save the information to in the output dict."""
 
+_ITERATION_KEYS = (
+    'pstep', 'dstep', 'pinfeas', 'dinfeas', 'gap', 'primal_obj', 'dual_obj')
+"""the numbers in a row of SDPT3's iteration table, after the iteration
+number and in the order they are printed."""
+
+INTERRUPTION_FLAGS = ('stopped_early', 'timed_out', 'cancelled')
+"""the result dict keys telling whether, and why, a solve was ended before
+SDPT3 finished."""
+
+_SECTION_HEADER = re.compile(r'(X|Z)\{\d*\} =|^[ \t]*(y) =[ \t]*$', re.M)
+_SECTION_STOP = re.compile(r'[<>*XZy]')
+"""the start of a printed block of X, y or Z in a solve log, and the
+characters which may end one (see split_log)."""
+
+_COLUMN_HEADER = re.compile(r'Columns? \d+(?: (?:through|and) \d+)?:?')
+
+_SOLUTION_KEYS = ('Xvars', 'y', 'Zvars', 'info')
+"""the result keys of the solution, read from the log together."""
+
+RESULT_KEYS = tuple(sorted(_KEY_LIST.values())) + (
+    'status_verb',) + INTERRUPTION_FLAGS + ('peak_rss', 'msg') + \
+    _SOLUTION_KEYS
+"""the keys every SolveResult has."""
+
+_Packed = collections.namedtuple('_Packed', 'n upper')
+"""a symmetric n x n block stored as its upper triangle, row by row."""
+
+
+class SolveResult(collections.MutableMapping):
+    '''
+    The result of a solve, looked up as a dict: result['Xvars'],
+    result.get('y'), result.keys() and so on.  It has every key of
+    RESULT_KEYS, and any others set on it.
+
+    It is made to keep thousands of results in memory cheaply:
+
+      - its values are held in slots, not in a dict per result,
+      - Xvars, y, Zvars and info are only read from the log when one of them
+        is first looked up (see extract_solution),
+      - symmetric X and Z blocks are stored as their upper triangles until
+        Xvars or Zvars is first looked up,
+      - the log may be left in the file it was saved to, log_path, and is
+        then read back from there when msg, or the solution, is looked up.
+        If that file is only temporary, load_log reads it back before it
+        is removed.
+    '''
+
+    __slots__ = tuple('_' + key for key in RESULT_KEYS) + (
+        '_extra', '_unread', 'log_path')
+
+    def __init__(self, values=None, log_path=None):
+        for key in RESULT_KEYS:
+            setattr(self, '_' + key, None)
+        self._extra = None
+        self._unread = False
+        self.log_path = log_path
+        if values:
+            self.update(values)
+
+    def __getitem__(self, key):
+        if key in _SOLUTION_KEYS and self._unread:
+            self._read_solution()
+        if key in _RESULT_KEY_SET:
+            value = getattr(self, '_' + key)
+            if key == 'msg' and value is None and self.log_path:
+                with open(self.log_path) as fp:
+                    return fp.read()
+            if key in ('Xvars', 'Zvars') and value is not None and any(
+                    isinstance(block, _Packed) for block in value):
+                # Unpacked once, so that changes to the blocks are kept.
+                value = [_unpack_block(block) for block in value]
+                setattr(self, '_' + key, value)
+            return value
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in _SOLUTION_KEYS and self._unread:
+            self._read_solution()
+        if key in ('Xvars', 'Zvars') and value is not None:
+            value = [_pack_block(block) for block in value]
+        if key in _RESULT_KEY_SET:
+            setattr(self, '_' + key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in _RESULT_KEY_SET:
+            raise TypeError("{0} can't be removed from a SolveResult.".format(
+                key))
+        if self._extra is None:
+            raise KeyError(key)
+        del self._extra[key]
+
+    def __contains__(self, key):
+        return key in _RESULT_KEY_SET or (
+            self._extra is not None and key in self._extra)
+
+    def __iter__(self):
+        for key in RESULT_KEYS:
+            yield key
+        for key in list(self._extra or ()):
+            yield key
+
+    def __len__(self):
+        return len(RESULT_KEYS) + len(self._extra or ())
+
+    def __eq__(self, other):
+        if not isinstance(other, collections.Mapping):
+            return NotImplemented
+        return set(self.keys()) == set(other.keys()) and all(
+            _values_equal(self[key], other[key]) for key in self)
+
+    def __repr__(self):
+        return "<SolveResult status_num={0!r} iterations={1!r}>".format(
+            self._status_num, self._iterations)
+
+    def __getstate__(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def copy(self):
+        '''
+        Returns a shallow copy, which shares the blocks and arrays but not
+        the lists holding them.
+        '''
+        state = self.__getstate__()
+        for name in ('_Xvars', '_Zvars'):
+            if state[name] is not None:
+                state[name] = list(state[name])
+        if state['_extra'] is not None:
+            state['_extra'] = dict(state['_extra'])
+        copy = SolveResult.__new__(SolveResult)
+        copy.__setstate__(state)
+        return copy
+
+    def load_log(self):
+        '''
+        Reads the log back from log_path into the result, which then no
+        longer needs the file.  This is for logs saved to a temporary file,
+        before it is removed.
+        '''
+        if self.log_path and self._msg is None:
+            with open(self.log_path) as fp:
+                self._msg = fp.read()
+        self.log_path = None
+
+    def _read_solution(self):
+        ''' Reads the solution from the log (see extract_solution). '''
+        self._unread = False
+        self.update(extract_solution(self['msg']))
+
+
+_RESULT_KEY_SET = frozenset(RESULT_KEYS)
+
+
+def _values_equal(first, second):
+    '''
+    Whether two result values are equal, comparing arrays, and lists and
+    dicts of them, by their contents.
+    '''
+    if isinstance(first, np.ndarray) or isinstance(second, np.ndarray):
+        return np.array_equal(first, second)
+    if isinstance(first, (list, tuple)) and isinstance(second, (list, tuple)):
+        return len(first) == len(second) and all(
+            _values_equal(a, b) for a, b in zip(first, second))
+    if isinstance(first, dict) and isinstance(second, dict):
+        return set(first) == set(second) and all(
+            _values_equal(first[key], second[key]) for key in first)
+    return first == second
+
+
+def _pack_block(block):
+    '''
+    Returns block as SolveResult stores it: packed if it is a symmetric
+    matrix, and as it is otherwise.
+    '''
+    if isinstance(block, np.ndarray) and block.ndim == 2 and \
+            block.shape[0] == block.shape[1] > 1 and \
+            np.array_equal(block, block.T):
+        return _Packed(block.shape[0], block[np.triu_indices(block.shape[0])])
+    return block
+
+
+def _unpack_block(block):
+    ''' The reverse of _pack_block. '''
+    if not isinstance(block, _Packed):
+        return block
+    full = np.empty((block.n, block.n), dtype=block.upper.dtype)
+    rows, cols = np.triu_indices(block.n)
+    full[rows, cols] = block.upper
+    full[cols, rows] = block.upper
+    return full
+
 
-def make_result_dict(msg):
+def make_result_dict(msg, log_path=None):
     '''
-    Extracts some solve information from the log message and constructs a dict.
+    Extracts some solve information from the log message and constructs a
+    SolveResult, including the solution (see extract_solution), which is
+    only read when it is first looked up.
     This function will error if the message is empty or does not include the phrase
     "SDPT3: Infeasible path-following algorithms", which is an indicator that the
     solver at least started okay.  If the log passes that basic test, we just retrieve
-    what information we can.  If the dict doesn't at least contain a status_num and
+    what information we can.  If the result doesn't at least contain a status_num and
     status_verb, you should check the log manually and see what went wrong.
+
+    msg may be a string or a logcapture.SolverLog.  A SolverLog is read one
+    line at a time and kept in the result as it is, so a log which was moved
+    to a file stays there until it is read.  If log_path, a file msg was
+    saved to, is given, msg isn't kept, and is read back from the file when
+    it is needed.
     '''
     assert can_use_msg(
-        msg), "Stopping, the message is not properly formed: " + msg
-    result_dict = extract_prop_dict(msg)
-    result_dict['Xvars'] = extract_X(msg)
-    result_dict['status_verb'] = get_verb_status(result_dict['status_num'])
+        msg), "Stopping, the message is not properly formed: " + str(msg)
+    result = SolveResult(log_path=log_path)
+    if isinstance(msg, logcapture.SolverLog):
+        result.update(_prop_dict(msg.summary))
+        if msg.solution is not None or msg.blocks is not None:
+            # Already read while solving, or not printed in the log at all.
+            result.update(extract_solution(msg))
+        else:
+            result._unread = True
+    else:
+        result.update(_prop_dict(split_log(msg)[0]))
+        result._unread = True
+    result['status_verb'] = get_verb_status(result['status_num'])
+    for flag in INTERRUPTION_FLAGS:
+        result[flag] = False
+    result['peak_rss'] = getattr(msg, 'peak_rss', None)
+    if not log_path:
+        result['msg'] = msg
+    return result
+
+
+def make_interrupted_result(msg, progress, status_verb, **flags):
+    '''
+    Constructs a SolveResult for a solve which was ended before SDPT3
+    finished, with the same keys as make_result_dict.  What is known comes
+    from progress, the last row of the iteration table (as returned by
+    parse_iteration_line), if there was one.  No X is available.  flags are
+    set in the dict, e.g. timed_out=True.
+    '''
+    result_dict = dict((key, None) for key in _KEY_LIST.values())
+    if progress is not None:
+        result_dict.update({
+            'iterations': progress['iteration'],
+            'primal_z': progress['primal_obj'],
+            'dual_z': progress['dual_obj'],
+            'abs_gap': progress['gap'],
+            'rel_gap': progress['rel_gap'],
+            'rel_primal_feas': progress['pinfeas'],
+            'rel_dual_feas': progress['dinfeas'],
+            'solve_time': progress['cputime'],
+        })
+    result_dict.update({'Xvars': [], 'y': None, 'Zvars': []})
+    result_dict['status_verb'] = status_verb
+    result_dict['peak_rss'] = None
+    for flag in INTERRUPTION_FLAGS:
+        result_dict[flag] = False
+    result_dict.update(flags)
     result_dict['msg'] = msg
-    return result_dict
+    return SolveResult(result_dict)
+
+
+def was_interrupted(result):
+    '''
+    Whether the solve of result (a result dict) was ended before SDPT3
+    finished, i.e. whether any of INTERRUPTION_FLAGS is set in it.
+    '''
+    return any(result.get(flag) for flag in INTERRUPTION_FLAGS)
+
+
+def parse_iteration_line(line):
+    '''
+    Parses a row of the iteration table SDPT3 prints while solving, such as
+
+    .. code-block:: none
+
+        3|0.979|1.000|3.1e-02|2.1e-15|1.5e+01|-4.178e+01 -5.667e+01| 0:0:01| chol  1  1
+
+    Returns:
+        A dict with the iteration number, the numbers listed in
+        _ITERATION_KEYS, the relative gap gap / (1 + |primal_obj| +
+        |dual_obj|) as SDPT3 defines it, and the cputime in seconds.  None is
+        returned if line isn't an iteration row.
+    '''
+    fields = line.split('|')
+    if len(fields) < 8 or not fields[0].strip().isdigit():
+        return None
+
+    try:
+        numbers = [float(x) for x in fields[1:6] + fields[6].split()]
+        hms = [float(x) for x in fields[7].split(':')]
+    except ValueError:
+        return None
+    if len(numbers) != len(_ITERATION_KEYS):
+        return None
+
+    row = dict(zip(_ITERATION_KEYS, numbers))
+    row['iteration'] = int(fields[0])
+    row['rel_gap'] = row['gap'] / (
+        1 + abs(row['primal_obj']) + abs(row['dual_obj']))
+    row['cputime'] = sum(x * 60 ** k for k, x in enumerate(reversed(hms)))
+    return row
+
+
+def restore_duals(result, restore):
+    '''
+    Maps the dual results in result back to the constraints of the problem
+    before it was reordered and simplified, using the dict returned by
+    sedumi_writer.write_cvxpy_to_mat.  Results without duals are left alone.
+    '''
+    if not restore or result.get('y') is None:
+        return result
+
+    y = np.asarray(result['y'], dtype='d').ravel()
+    row_perm = restore.get('row_perm')
+    if row_perm is not None:
+        restored = np.empty_like(y)
+        restored[row_perm] = y
+        y = restored
+    if restore.get('recovery') is not None:
+        y = recover_duals(y, restore['recovery'])
+    result['y'] = y
+    return result
+
+
+def recover_duals(y, recovery):
+    '''
+    Returns the duals of the rows of a problem before
+    sedumi_writer.simplify_sedumi_model simplified it, given the duals y of
+    the simplified problem and the recovery dict the simplification filled
+    in.
+
+    The dual of a constraint used to eliminate a variable is the one which
+    makes that variable's dual slack zero, which keeps the duals feasible
+    and complementary.  They are found in the reverse order of the
+    eliminations, each from the duals of the rows still present after it.
+    Rows dropped as trivial (0 = 0) get a zero dual.
+    '''
+    full = np.zeros(recovery['rows'])
+    full[recovery['rows_kept']] = np.asarray(y, dtype='d').ravel()
+    for row, rows, values, cost in reversed(recovery['eliminations']):
+        pivot = 0.
+        rest = cost
+        for other, value in zip(rows, values):
+            if other == row:
+                pivot = value
+            else:
+                rest -= value * full[other]
+        full[row] = rest / pivot
+    return full
+
+
+def reorder_warm_start(warm_start, restore):
+    '''
+    The reverse of restore_duals for a starting point: returns warm_start (a
+    result dict or a tuple (X, y, Z)) as a tuple with y put in the
+    constraint order of a problem written with the restore dict restore.
+    '''
+    if isinstance(warm_start, collections.Mapping):
+        warm_start = tuple(
+            warm_start.get(key) for key in ('Xvars', 'y', 'Zvars'))
+    X, y, Z = warm_start
+    if restore and y is not None:
+        y = np.asarray(y, dtype='d').ravel()
+        recovery = restore.get('recovery')
+        if recovery is not None and y.size == recovery['rows']:
+            y = y[recovery['rows_kept']]
+        if restore.get('row_perm') is not None:
+            y = y[restore['row_perm']]
+    return X, y, Z
 
 
 def make_result_summary(result):
@@ -103,7 +469,13 @@ def extract_prop_dict(msg):
     '''
     Given the output message from running SDPT3solve.m, this function
     constructs and returns a dictionary of basic solve result information.
+    Only the summary is read; the printed blocks are skipped unparsed.
     '''
+    return _prop_dict(split_log(msg)[0])
+
+
+def _prop_dict(summary):
+    ''' extract_prop_dict, for the summary of a log. '''
     result_dict = {}
     for key in _KEY_LIST.values():
         result_dict[key] = None
@@ -112,7 +484,7 @@ def extract_prop_dict(msg):
         r'\w[ \w:=.()]*[ \<\>]*=[ <>]*[ \d\.\-+e]*[\d\.\-+e]')
     phrase_pattern = re.compile(r'[\w\d\.\-+()][ \w\d\.\-+()]*')
 
-    line_list = line_pattern.findall(msg)
+    line_list = line_pattern.findall(summary)
     for line in line_list:
         line_parts = phrase_pattern.findall(line)
         key = line_parts[0].rstrip().replace("dual  ", "dual")
@@ -126,96 +498,248 @@ def extract_prop_dict(msg):
 def extract_X(msg):
     '''
     Given the output message from running SDPT3solve.m, reconstruct the X
-    matrix from the printed output and return it.
-    '''
-    # First pull out the definitions.  Each starts with 'X{numbers} ='
-    # and we'll keep grabbing text until we hit any of the characters >, <, *,
-    # or X
-    var_pattern = re.compile(r'X\{[\d]*\} =[^><\*X]*')
-    var_list = var_pattern.findall(msg)
-
-    # Xlist will hold the solution variables or matrices
-    Xlist = [None] * len(var_list)
-
-    for i, Xmsg in enumerate(var_list):
-        # Drop the "X{something} =" and strip extra whitespace
-        Xstart = Xmsg.find('=') + 1
-        Xmsg = Xmsg[Xstart:].strip()
-
-        # From Xmsg we can judge if the current variable is a matrix displaying in chunks
-        # due to display width constraints, a matrix displaying all in one chunk,
-        # or a scalar.
-        if 'Column' in Xmsg:
-            # If X[i] is a chunked matrix, each chunk has a header containing 'Column'
-            # Split the data into chunks
-            chunk_pattern = re.compile('Column[^C]*')
-            chunk_list = chunk_pattern.findall(Xmsg)
-
-            # Use regular expressions to split the data into header parts and
-            # data parts
-            header = re.compile(r'Columns* [\d]+[ through [\d]+]?')
-            header_list = header.findall(Xmsg)
-            chunk_list = header.split(Xmsg)[1:]  # drop the first, which is ''
-            assert len(header_list) == len(chunk_list)
-
-            # Find out how many columns the matrix has by grabbing the last column number
-            # from the last header
-            int_pattern = re.compile(r'\d[\d]*')
-            int_list = int_pattern.findall(header_list[-1])
-            cols = int(int_list[-1])
-            # We'll count rows and initialize the matrix during the processing of
-            # the first chunk.
-
-            # Take a matching header and chunk and place the chunk's data in
-            # the columns of Xlist[i] which are indicated by the header.
-            for header, chunk in zip(header_list, chunk_list):
-                # Grab the column numbers from the header, note the first one. It's
-                # the start column we'll use to place the chunk's data in the
-                # matrix.
-                int_list = [int(x) for x in int_pattern.findall(header)]
-                col_start = int_list[0] - 1
-
-                # Split the chunk into rows
-                chunk = chunk.strip()
-                chunk = re.sub(' *\n *', '\n', chunk)
-                chunk_lines = chunk.split('\n')
-
-                # Initialize the matrix now if it hasn't been done yet.
-                if Xlist[i] is None:
-                    rows = len(chunk_lines)
-                    Xlist[i] = zeros((rows, cols))
-
-                # Plug the row's data into the matrix
-                for row, line in enumerate(chunk_lines):
-                    for k, item in enumerate(re.split(r'\s+', line)):
-                        Xlist[i][row, col_start + k] = float(item)
-            print "Imported X[{0}] as a matrix with shape {1}.".format(i, Xlist[i].shape)
-
-        elif ' ' in Xmsg or '\n' in Xmsg:
-            # Otherwise if it has spaces or line breaks it's a non-chunked
-            # matrix
-            Xmsg = Xmsg.strip()
-            Xmsg = re.sub(' +', ' ', Xmsg)
-            Xmsg = re.sub(' *\n *', '\n', Xmsg)
-            Xmsg_lines = Xmsg.split('\n')
-
-            # Initialize the matrix.
-            rows = len(Xmsg_lines)
-            cols = len(Xmsg_lines[0].split())
-            Xlist[i] = zeros((rows, cols))
-
-            # Plug the row's data into the matrix
-            for row, line in enumerate(Xmsg_lines):
-                for k, item in enumerate(re.split(r'\s+', line.strip())):
-                    Xlist[i][row, k] = float(item)
-            print "Imported X[{0}] as a matrix with shape {1}.".format(i, Xlist[i].shape)
+    matrix from the printed output and return it (see extract_blocks).
+    '''
+    return extract_blocks(msg, ('X',))['X']
+
+
+def split_log(msg):
+    '''
+    Splits the text of a solve log, in one scan, into its summary and the
+    printed X, y and Z blocks.  A block starts at its "X{i} =", "y =" or
+    "Z{i} =" header and runs until the next of the characters >, < or *, or
+    the next header.
+
+    Returns:
+        A tuple (summary, sections): the text outside the blocks, and a list
+        of (name, body) pairs, one per block in the order printed, of the
+        variable's name and the unparsed text of the block.
+    '''
+    pieces = []
+    sections = []
+    pos = 0
+    while True:
+        header = _SECTION_HEADER.search(msg, pos)
+        if header is None:
+            break
+        stop = _section_end(msg, header.end())
+        pieces.append(msg[pos:header.start()])
+        sections.append((header.group(1) or header.group(2),
+                         msg[header.end():stop]))
+        pos = stop
+    pieces.append(msg[pos:])
+    return "".join(pieces), sections
+
+
+def _section_end(msg, pos):
+    '''
+    Returns where the block whose text starts at pos in msg ends.  Only the
+    characters which may end it are looked at; those of X, y and Z are then
+    checked for a header.
+    '''
+    while True:
+        stop = _SECTION_STOP.search(msg, pos)
+        if stop is None:
+            return len(msg)
+        if stop.group() in '<>*':
+            return stop.start()
+        header = _SECTION_HEADER.match(msg, stop.start()) or \
+            _SECTION_HEADER.match(msg, msg.rfind('\n', 0, stop.start()) + 1)
+        if header:
+            return header.start()
+        pos = stop.end()
+
+
+def extract_blocks(msg, names=('X', 'y', 'Z')):
+    '''
+    Reconstructs the blocks of the variables names (of X, y and Z) from the
+    output message from running SDPT3solve.m.  The blocks of other
+    variables are skipped unread.
+
+    Returns:
+        A dict of the list of blocks of each of names, with 1x1 blocks as
+        floats.
+    '''
+    return _blocks_of_sections(split_log(msg)[1], names)
+
+
+def parse_block(body):
+    '''
+    Returns the block printed as body, the text after its "X{i} =" header,
+    as a float if it is a scalar and as a 2-D array otherwise.  The numbers
+    of a matrix are converted together, and one printed in chunks of columns
+    (under "Columns 1 through 8" and such headers) is put back together.
+
+    Raises:
+        ValueError if body isn't a block of numbers.
+    '''
+    body = body.strip()
+    if 'Column' in body:
+        chunks = _COLUMN_HEADER.split(body)[1:]
+        return np.hstack([_parse_rows(chunk) for chunk in chunks])
+    block = _parse_rows(body)
+    if block.size == 1:
+        return float(block[0, 0])
+    return block
+
+
+def _parse_rows(text):
+    '''
+    Returns the rows of numbers in text, as many in each row as in the
+    first, as a 2-D array.
+    '''
+    text = text.strip()
+    cols = len(text.split('\n', 1)[0].split())
+    values = np.fromstring(text, sep=' ')
+    if not cols or values.size % cols or values.size != len(text.split()):
+        raise ValueError("Could not read a block of numbers from: " +
+                         text[:80])
+    return values.reshape(-1, cols)
+
+
+def _blocks_of_sections(sections, names):
+    '''
+    Parses the sections (as split_log returns them) of the variables names
+    into a dict of lists of blocks.
+    '''
+    blocks = dict((name, []) for name in names)
+    for name, body in sections:
+        if name not in blocks:
+            continue
+        blocks[name].append(parse_block(body))
+    return blocks
 
+
+def read_result_mat(path):
+    '''
+    Reads the .mat file SDPT3solve.m saves its results in and returns a dict
+    of obj, Xvars and Zvars (lists of blocks, with 1x1 blocks as floats, as
+    extract_X gives them), y (a flat array) and info (a dict of the fields
+    of sqlp's info struct).  The values are read at full precision, with no
+    text parsing.
+    '''
+    data = scipy.io.loadmat(path, squeeze_me=False, chars_as_strings=True)
+    info = {}
+    if 'info' in data and data['info'].size:
+        struct = data['info'][0, 0]
+        for name in struct.dtype.names:
+            value = _mat_value(struct[name])
+            if isinstance(value, np.ndarray) and value.size == 1 and \
+                    value.dtype.kind in 'biuf':
+                value = value.item()
+            info[name] = value
+    return {
+        'obj': np.asarray(data['obj'], dtype='d').ravel(),
+        'Xvars': _mat_cell_blocks(data['X']),
+        'y': np.asarray(data['y'], dtype='d').ravel(),
+        'Zvars': _mat_cell_blocks(data['Z']),
+        'info': info,
+    }
+
+
+def _mat_cell_blocks(cell):
+    '''
+    Returns the blocks of a cell array loaded by scipy.io.loadmat as a list,
+    with 1x1 blocks as floats and the rest as dense arrays.
+    '''
+    blocks = []
+    for block in cell.ravel(order='F'):
+        block = _mat_value(block)
+        if block.size == 1:
+            blocks.append(float(block.ravel()[0]))
         else:
-            # Otherwise it's a scalar
-            Xlist[i] = float(Xmsg)
-            print "Imported X[{0}] as a scalar.".format(i)
+            blocks.append(np.asarray(block, dtype='d'))
+    return blocks
+
+
+def _mat_value(value):
+    ''' Returns a loaded .mat value as a dense array, or a string. '''
+    if scipy.sparse.issparse(value):
+        return value.toarray()
+    value = np.asarray(value)
+    if value.dtype.kind == 'U' or value.dtype.kind == 'S':
+        return "".join(value.ravel())
+    return value
+
+
+def extract_solution(msg):
+    '''
+    Returns a dict of the solution of a solve from its log msg, a string or
+    a logcapture.SolverLog: 'Xvars' and 'Zvars', lists of the blocks of X
+    and Z, 'y', a flat array, and 'info', a dict of the fields of sqlp's
+    info struct.  Each is taken from the result file the solver saved (see
+    read_result_mat) if there was one, or else from the printed log, where
+    y, Z and info may be missing: y is then None, Zvars empty and info
+    empty.
+    '''
+    if not isinstance(msg, logcapture.SolverLog):
+        return _solution_of_sections(split_log(msg)[1])
+    solution = {'Xvars': None, 'y': None, 'Zvars': [], 'info': {}}
+    if msg.solution is not None:
+        solution.update((key, msg.solution[key])
+                        for key in ('Xvars', 'y', 'Zvars', 'info'))
+        return solution
+
+    names = ('y', 'Z') if msg.blocks is not None else ('X', 'y', 'Z')
+    blocks = extract_blocks_from_lines(msg.lines(), names)
+    if msg.blocks is not None:
+        blocks['X'] = list(msg.blocks)
+    return _solution_of_blocks(blocks)
+
 
-    return Xlist
+def _solution_of_sections(sections):
+    ''' extract_solution, for the sections of a log split by split_log. '''
+    return _solution_of_blocks(_blocks_of_sections(sections, ('X', 'y', 'Z')))
+
+
+def _solution_of_blocks(blocks):
+    '''
+    Returns the solution dict of extract_solution from a dict of the lists
+    of blocks of X, y and Z read from a printed log.
+    '''
+    solution = {'Xvars': blocks['X'], 'y': None, 'Zvars': blocks['Z'],
+                'info': {}}
+    if blocks['y']:
+        solution['y'] = np.asarray(blocks['y'][0], dtype='d').ravel()
+    return solution
+
+
+def extract_X_from_lines(lines):
+    '''
+    Reconstructs X from the lines of the output of SDPT3solve.m, as extract_X
+    does (see extract_blocks_from_lines).
+    '''
+    return extract_blocks_from_lines(lines, ('X',))['X']
+
+
+def extract_blocks_from_lines(lines, names=('X', 'y', 'Z')):
+    '''
+    Reconstructs the blocks of the variables names (of X, y and Z) from the
+    lines of the output of SDPT3solve.m, reading each row as it comes so
+    that the printed blocks are never held in memory whole.  Only the format
+    num2str prints is understood: one line per row, and no column headers.
+
+    Returns:
+        A dict of the list of blocks of each of names, with 1x1 blocks as
+        floats.
+    '''
+    blocks = dict((name, []) for name in names)
+    rows = None
+    for line in lines:
+        if rows is None:
+            match = logcapture.BLOCK_HEADER.match(line.strip())
+            if match:
+                name = match.group(1) or match.group(2)
+                rows = [] if name in blocks else None
+        elif line.strip() == logcapture.BLOCK_END:
+            if len(rows) == 1 and rows[0].size == 1:
+                blocks[name].append(float(rows[0][0]))
+            else:
+                blocks[name].append(np.vstack(rows))
+            rows = None
+        elif line.strip():
+            rows.append(np.fromstring(line, sep=' '))
+    return blocks
 
 
 def handle_msg_item(x):
@@ -12,38 +12,59 @@ Functions which express problems in Sedumi format and export them as .mat files
 for Matlab
 """
 
+import collections
+import hashlib
 import os
 
 import numpy as np
 import scipy.io
+from scipy.sparse.csgraph import reverse_cuthill_mckee
 
 from cvxopt import matrix as cvxmat
 
 
-def write_cvxpy_to_mat(problem_data, target, simplify=True):
+def write_cvxpy_to_mat(problem_data, target, simplify=True, reorder=False,
+                       options=None):
     '''
     Args:
         problem_data: As produced by applying get_problem_data['CVXOPT'] to a
         cvxpy problem.
+        reorder: If True, the constraints are put in a fill-reducing order
+        before the problem is saved (see reorder_constraints).
+        options: a dict of sqlp options saved with the problem (see
+        write_sedumi_to_mat).
 
-    Returns: (None)
+    Returns:
+        A dict with the information needed to map the solver's dual results
+        back to the constraints as they were before simplification and
+        reordering, for use with result.restore_duals.  Its 'row_perm' entry
+        is None when nothing was reordered, and its 'recovery' entry (see
+        simplify_sedumi_model) None when nothing was simplified.
 
     Effect:
         Saves a .mat file containing the A, b, c, K that define the problem
         in Sedumi format to target (see http://plato.asu.edu/ftp/usrguide.pdf)
     '''
 
+    recovery = {}
     A, b, c, K, offset = make_sedumi_format_problem(
-        problem_data, simplify=simplify)
+        problem_data, simplify=simplify, recovery=recovery)
     assert offset == 0
-    write_sedumi_to_mat(A, b, c, K, target)
+    restore = {'row_perm': None, 'recovery': recovery or None}
+    if reorder:
+        A, b, restore['row_perm'] = reorder_constraints(A, b, K)
+    write_sedumi_to_mat(A, b, c, K, target, options=options)
+    return restore
 
 
-def write_sedumi_to_mat(A, b, c, K, target):
+def write_sedumi_to_mat(A, b, c, K, target, options=None):
     '''
     Args:
         A, b, c, K for Sedumi format
         target: the path where we will save the .mat
+        options: if given, a dict of sqlp options (as returned by
+        solve.check_options) saved as the struct OPTIONS, which SDPT3solve.m
+        passes to sqlp.
 
     Effect:
         Saves a .mat file containing A, b, c, K to target
@@ -58,7 +79,133 @@ def write_sedumi_to_mat(A, b, c, K, target):
     if not os.path.exists(folder):
         os.makedirs(folder)
 
-    scipy.io.savemat(target, {'A': A, 'b': b, 'c': c, 'K': K})
+    data = {'A': A, 'b': b, 'c': c, 'K': K}
+    if options:
+        data['OPTIONS'] = options
+    scipy.io.savemat(target, data)
+
+
+def write_solve_settings(target, warm_start=None, options=None):
+    '''
+    Saves the settings of a solve (see make_solve_settings) as a .mat file at
+    target, in the form SDPT3solve.m expects for its second argument.
+    '''
+    scipy.io.savemat(target, make_solve_settings(warm_start, options))
+
+
+def make_solve_settings(warm_start=None, options=None):
+    '''
+    Args:
+        warm_start: a starting point, either a result dict of an earlier
+        solve, whose 'Xvars', 'y' and 'Zvars' are used if present, or a tuple
+        (X, y, Z) where X and Z are lists of blocks in the order of the
+        result's Xvars.  Any of X, y and Z may be None, in which case SDPT3's
+        default is used for that part (see SDPT3warmstart.m).
+        options: a dict of sqlp options, as returned by solve.check_options.
+
+    Returns:
+        A dict of the variables X0, y0, Z0 and OPTIONS to save to a .mat
+        file, leaving out those not given.
+    '''
+    data = {}
+    if warm_start is not None:
+        if isinstance(warm_start, collections.Mapping):
+            X, y, Z = (warm_start.get(key) for key in ('Xvars', 'y', 'Zvars'))
+        else:
+            X, y, Z = warm_start
+        if X is not None and len(X):
+            data['X0'] = _cell(X)
+        if y is not None:
+            data['y0'] = _dense(y).reshape(-1, 1)
+        if Z is not None and len(Z):
+            data['Z0'] = _cell(Z)
+    if options:
+        data['OPTIONS'] = options
+    return data
+
+
+def write_options_to_mat(options, source, target):
+    '''
+    Saves a copy of the Sedumi format .mat file source at target, with the
+    dict of sqlp options added as its OPTIONS struct.
+    '''
+    data = scipy.io.loadmat(source)
+    for key in [key for key in data if key.startswith('__')]:
+        del data[key]
+    data['OPTIONS'] = options
+    scipy.io.savemat(target, data)
+
+
+def _cell(blocks):
+    '''
+    Returns the list blocks as an array which scipy.io saves as a cell
+    array, with scalars and vectors as column vectors.
+    '''
+    cell = np.empty((1, len(blocks)), dtype=object)
+    for i, block in enumerate(blocks):
+        block = _dense(block)
+        cell[0, i] = block if block.ndim == 2 else block.reshape(-1, 1)
+    return cell
+
+
+def read_sedumi_mat(source):
+    '''
+    Loads the Sedumi format problem saved in the .mat file source.
+
+    Returns:
+        A: a scipy.sparse.csc_matrix.
+        b: a dense column vector.
+        c: a dense row vector.
+        K: a dict with the cone dimensions, where 'f' and 'l' are numbers
+        and 'q' and 's' are lists, each defaulting to empty.
+    '''
+    data = scipy.io.loadmat(source)
+    A = scipy.sparse.csc_matrix(data['A'], dtype='d')
+    b = _dense(data['b']).reshape(-1, 1)
+    c = _dense(data['c']).reshape(1, -1)
+
+    K = {'f': 0., 'l': 0., 'q': [], 's': []}
+    K_struct = data['K'][0, 0]
+    for name in K_struct.dtype.names:
+        dims = np.asarray(K_struct[name], dtype='d').ravel()
+        if name in ('q', 'r', 's'):
+            K[name] = list(dims)
+        elif dims.size:
+            K[name] = dims[0]
+    return A, b, c, K
+
+
+def content_hash(A, K, *vectors):
+    '''
+    Returns a hex digest which identifies the Sedumi format constraint matrix
+    A together with the cone dimensions K, and any further vectors (e.g. b
+    and c) given.  Equal problems get equal digests however A is stored.
+    '''
+    # A copy, since the steps below would otherwise change the caller's A.
+    A = scipy.sparse.csc_matrix(A, dtype='d', copy=True)
+    A.sum_duplicates()
+    A.eliminate_zeros()
+    A.sort_indices()
+    digest = hashlib.sha1()
+    digest.update(repr(A.shape))
+    for arr in (A.indptr, A.indices, A.data):
+        digest.update(np.ascontiguousarray(arr, dtype='d').tostring())
+    for name in sorted(K):
+        dims = np.asarray(K[name], dtype='d').ravel()
+        digest.update("{0}:{1}".format(name, dims.tolist()))
+    for vector in vectors:
+        digest.update("|")
+        digest.update(np.ascontiguousarray(_dense(vector).ravel()).tostring())
+    return digest.hexdigest()
+
+
+def _dense(M):
+    '''
+    Returns M as a dense float array, whether or not it's sparse.
+    '''
+    if scipy.sparse.issparse(M):
+        M = M.toarray()
+    return np.asarray(M, dtype='d')
 
 
 def clean_K_dims(K):
@@ -94,11 +241,12 @@ def problem_data_prep(problem_data):
     return problem_data
 
 
-def make_sedumi_format_problem(problem_data, simplify=True):
+def make_sedumi_format_problem(problem_data, simplify=True, recovery=None):
     '''
     Input:
         problem_data: As produced by applying get_problem_data['CVXOPT'] to a
         cvxpy problem.
+        recovery: passed on to simplify_sedumi_model.
     Returns:
         A, b, c, K: Data defining an equivalent problem in Sedumi format.
     '''
@@ -154,7 +302,8 @@ def make_sedumi_format_problem(problem_data, simplify=True):
                                                     b,
                                                     c,
                                                     K,
-                                                    allow_nonzero_b=False)
+                                                    allow_nonzero_b=False,
+                                                    recovery=recovery)
         assert obj_cst == 0, "This shouldn't be possible with allow_nonzero_b=False."
     else:
         A, b, c, K = symmetrize_sedumi_model(A, b, c, K)
@@ -181,7 +330,7 @@ def symmetrize_sedumi_model(A, b, c, K):
     return A, b, c, K
 
 
-def simplify_sedumi_model(A, b, c, K, allow_nonzero_b=False):
+def simplify_sedumi_model(A, b, c, K, allow_nonzero_b=False, recovery=None):
     '''
     Tries to eliminate variables using a few simple strategies:
 
@@ -195,6 +344,13 @@ def simplify_sedumi_model(A, b, c, K, allow_nonzero_b=False):
     Args:
         A, b, c, K: for a problem in Sedumi format
         allow_nonzero_b: If False, only eliminate if bk = 0 is zero
+        recovery: If a dict is given, it is filled in with what
+        result.recover_duals needs to map duals of the simplified problem
+        back to the rows of the given one: 'rows', their number, 'rows_kept',
+        the given rows the simplified problem's rows come from, and
+        'eliminations', for each constraint used to eliminate a variable, in
+        order, its row and the nonzero rows, values and cost of the
+        variable's column just before it was eliminated.
 
     Returns:
         A, b, c, K: for the simplified problem.
@@ -224,6 +380,7 @@ def simplify_sedumi_model(A, b, c, K, allow_nonzero_b=False):
 #   SIMPLIFICATION PART ONE: Remove dependence on some cols and mark them for removal.
 #==============================================================================
     offset = 0
+    eliminations = []
     # Given var_i which is a free variable, figure out if there is a row k of
     # G_star such that Gs_star[ctr_k, var_i] == -1 AND hs[ctr_k] == 0 AND the
     # only other non-zero element in the row is Gs_star[ctr_k, nx + ni +
@@ -241,6 +398,9 @@ def simplify_sedumi_model(A, b, c, K, allow_nonzero_b=False):
                      b[ctr_k, 0] / A[ctr_k, i] >= 0)
 
         if free_ok or nonneg_ok:
+            rows = np.flatnonzero(A[:, i])
+            eliminations.append(
+                (ctr_k, rows.tolist(), A[rows, i].tolist(), float(c[0, i])))
             aki = A[ctr_k, i]
             bk = b[ctr_k, 0]
             factor = 1. * bk / aki
@@ -317,6 +477,9 @@ def simplify_sedumi_model(A, b, c, K, allow_nonzero_b=False):
     A = A[np.ix_(rows_to_keep, cols_to_keep)]
     b = b[np.ix_(rows_to_keep, [0])]
     c = c[np.ix_([0], cols_to_keep)]
+    if recovery is not None:
+        recovery.update({'rows': n_ctr, 'rows_kept': rows_to_keep,
+                         'eliminations': eliminations})
 
     # problem dimensions
     assert len(cols_to_keep) + n_deleted_f + n_deleted_l
@@ -379,3 +542,60 @@ def sparsify_tall_mat(M, block_height=1000):
         spmat_collector += [scipy.sparse.coo_matrix(curr_block.astype('d'))]
         i += 1
     return scipy.sparse.construct.vstack(spmat_collector)
+
+
+def schur_complement_pattern(A, K):
+    '''
+    Returns the sparsity pattern of the m x m Schur complement matrix that
+    SDPT3 factors in each iteration, as a symmetric scipy.sparse.csr_matrix.
+
+    Entry (i, j) can be nonzero when constraints i and j share a free or
+    nonnegative variable, or both touch the same SOC or PSD block, since the
+    scaling matrices couple every entry within a block.
+    '''
+    A = scipy.sparse.csc_matrix(A)
+    n_free = int(K.get('f', 0))
+    n_nonneg = int(K.get('l', 0))
+    cone_sizes = [int(q) for q in K.get('q', [])] + \
+        [int(s) ** 2 for s in K.get('s', [])]
+
+    # Give each column the index of the unit it belongs to: each free or
+    # nonnegative variable is a unit of its own, each cone is a single unit.
+    n_scalar = n_free + n_nonneg
+    unit = np.arange(A.shape[1])
+    col_start = n_scalar
+    for k, size in enumerate(cone_sizes):
+        unit[col_start:col_start + size] = n_scalar + k
+        col_start += size
+    n_units = n_scalar + len(cone_sizes)
+
+    A = A.tocoo()
+    incidence = scipy.sparse.coo_matrix(
+        (np.ones(A.nnz), (A.row, unit[A.col])),
+        shape=(A.shape[0], n_units)).tocsr()
+    pattern = (incidence * incidence.T).tocsr()
+    pattern.data[:] = 1.
+    return pattern
+
+
+def reorder_constraints(A, b, K):
+    '''
+    Permutes the constraints with a reverse Cuthill-McKee ordering of the
+    Schur complement pattern, which reduces the fill of its sparse Cholesky
+    factorization.  Only the constraint order affects that matrix, so the
+    variables are left in place and X needs no undoing.
+
+    Returns:
+        A, b: for the reordered problem.
+        row_perm: an array such that row k of the new problem is row
+        row_perm[k] of the old one.
+    '''
+    pattern = schur_complement_pattern(A, K)
+    row_perm = np.asarray(
+        reverse_cuthill_mckee(pattern, symmetric_mode=True), dtype=int)
+    if scipy.sparse.issparse(A):
+        A = scipy.sparse.csr_matrix(A)[row_perm, :]
+    else:
+        A = A[row_perm, :]
+    b = b[row_perm, :]
+    return A, b, row_perm
@@ -11,16 +11,52 @@
 
 """
 
+import os
 import os.path
+import tempfile
 
+import cores
+import logcapture
 import sedumi_writer as sw
+import solve_cvxopt as sc
 import solve_locally as ls
 import result as res
+import workspace as ws
 
 
 MATLAB = 'matlab'
 OCTAVE = 'octave'
 NEOS = 'neos'
+CVXOPT = 'cvxopt'
+AUTO = 'auto'
+REMOTE = 'remote'
+MODES = (MATLAB, OCTAVE, NEOS, CVXOPT, AUTO, REMOTE)
+
+
+def _count(x):
+    return x >= 1 and x == int(x)
+
+
+SQLP_OPTIONS = {
+    'vers': (lambda x: x in (0, 1, 2), "0, 1 (HKM) or 2 (NT)"),
+    'gam': (lambda x: 0 <= x <= 1, "between 0 and 1"),
+    'predcorr': (lambda x: x in (0, 1), "0 or 1"),
+    'expon': (lambda x: x >= 1, "at least 1"),
+    'gaptol': (lambda x: x > 0, "positive"),
+    'inftol': (lambda x: x > 0, "positive"),
+    'steptol': (lambda x: x > 0, "positive"),
+    'maxit': (_count, "a positive whole number"),
+    'printlevel': (lambda x: x in (1, 2, 3), "1, 2 or 3"),
+    'stoplevel': (lambda x: x in (0, 1, 2), "0, 1 or 2"),
+    'scale_data': (lambda x: x in (0, 1), "0 or 1"),
+    'spdensity': (lambda x: 0 < x <= 1, "between 0 and 1"),
+    'rmdepconstr': (lambda x: x in (0, 1), "0 or 1"),
+    'smallblkdim': (_count, "a positive whole number"),
+    'cachesize': (_count, "a positive whole number"),
+}
+"""The sqlp options which can be passed on, each with a check of its value
+and a description of the values allowed.  printlevel 0 isn't allowed since
+the result is read from what SDPT3 prints."""
 
 
 def check_output_target(mode, output_target):
@@ -29,8 +65,8 @@ def check_output_target(mode, output_target):
         - output_target can't be None if mode is matlab or octave
         - at least for now, output_target can't be a file that already exists
     '''
-    assert mode in ['matlab', 'octave', 'neos'], \
-        "Please choose mode equal to either 'matlab', 'octave', or 'neos'."
+    assert mode in MODES, \
+        "Please choose mode from {0}.".format(", ".join(MODES))
     assert mode not in ['matlab', 'octave'] or output_target, \
         "If mode is 'matlab' or 'octave', an output_target must be provided."
     if output_target:
@@ -39,14 +75,73 @@ def check_output_target(mode, output_target):
              "it:\n{0}".format(output_target))
 
 
+def check_options(options):
+    '''
+    Checks that options is a dict of sqlp options listed in SQLP_OPTIONS with
+    allowed values, e.g. {'gaptol': 1e-4, 'maxit': 30}.
+
+    Returns:
+        A dict of the options with their values as floats, ready to be saved
+        to a .mat file.  It is empty if options is None or empty.
+
+    Raises:
+        ValueError when an option is unknown or has a value not allowed.
+    '''
+    checked = {}
+    for name, value in (options or {}).items():
+        if name not in SQLP_OPTIONS:
+            raise ValueError(
+                "Unknown SDPT3 option {0!r}, please choose from {1}.".format(
+                    name, ", ".join(sorted(SQLP_OPTIONS))))
+        check, allowed = SQLP_OPTIONS[name]
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            number = None
+        if number is None or not check(number):
+            raise ValueError(
+                "The SDPT3 option {0} must be {1}, not {2!r}.".format(
+                    name, allowed, value))
+        checked[name] = number
+    return checked
+
+
 def sdpt3_solve_problem(
-        problem, mode, matfile_target,
-        output_target=None, discard_matfile=True, **kwargs):
+        problem, mode, matfile_target=None,
+        output_target=None, discard_matfile=True, reorder=False,
+        transport=None, warm_start=None, options=None, **kwargs):
     '''
     A wrapper function that takes a cvxpy problem, makes the .mat file, solves
     it by NEOS or a local Matlab/SDPT3 installation, then constructs the result,
     prints it, and returns it.
+
+    If reorder is True, the constraints are written in a fill-reducing order
+    (see sedumi_writer.reorder_constraints) and the duals in the result are
+    put back in the original order.
+
+    If matfile_target is None, the .mat file (and the Octave runner script)
+    are written to a new workspace folder which is removed after the solve.
+    transport chooses where that folder is made: workspace.RAM (the default)
+    for a memory-backed folder such as /dev/shm, or workspace.DISK for the
+    system's temporary folder.
+
+    warm_start gives SDPT3 a starting point, usually the result of solving
+    a similar problem (see sdpt3_solve_mat).
+
+    options is a dict of sqlp options (see check_options), e.g. a loose
+    gaptol and a low maxit for rough screening solves.  They are saved in
+    the .mat file as the OPTIONS struct, which SDPT3solve.m passes to sqlp.
     '''
+    options = check_options(options)
+    if matfile_target is None:
+        with ws.workspace(transport or ws.RAM) as folder:
+            return sdpt3_solve_problem(
+                problem, mode, os.path.join(folder, "problem.mat"),
+                output_target=output_target, reorder=reorder,
+                warm_start=warm_start, options=options, **kwargs)
+    if transport is not None:
+        raise ValueError("transport can only be given without a matfile_target.")
+
     assert not os.path.exists(matfile_target), \
         ("Something already exists at matfile_target, we won't overwrite "
          "it:\n{0}".format(matfile_target))
@@ -54,42 +149,191 @@ def sdpt3_solve_problem(
 
     # Write the problem to a .mat file in Sedumi format
     problem_data = problem.get_problem_data('CVXOPT')
-    sw.write_cvxpy_to_mat(problem_data, matfile_target)
+    restore = sw.write_cvxpy_to_mat(
+        problem_data, matfile_target, reorder=reorder, options=options)
+
+    if warm_start is not None:
+        warm_start = res.reorder_warm_start(warm_start, restore)
 
-    return sdpt3_solve_mat(matfile_target,
-                           mode,
-                           output_target=output_target,
-                           discard_matfile=discard_matfile,
-                           **kwargs)
+    result = sdpt3_solve_mat(matfile_target,
+                             mode,
+                             output_target=output_target,
+                             discard_matfile=discard_matfile,
+                             warm_start=warm_start,
+                             **kwargs)
+    return res.restore_duals(result, restore)
 
 
 def sdpt3_solve_mat(
-        matfile_path, mode, output_target=None, discard_matfile=True, **kwargs):
+        matfile_path, mode, output_target=None, discard_matfile=True,
+        transport=None, warm_start=None, options=None, scheduler=None,
+        cache=None, **kwargs):
     '''
     A wrapper function that takes the path of a .mat file, solves the Sedumi
     problem it contains with NEOS or a local Matlab/SDPT3 installation, then
     constructs the result, prints it, and returns it.
+
+    The CVXOPT mode solves the problem in this process with cvxopt instead
+    (see solve_cvxopt.cvxopt_solve), which saves starting an interpreter for
+    small problems.  The AUTO mode uses cvxopt for problems small enough
+    (see solve_cvxopt.suits_cvxopt) and the mode given as a fallback keyword
+    argument, by default OCTAVE, for the rest.
+
+    The REMOTE mode sends the problem to a remote.SolverServer on another
+    host, given as a client or hosts keyword argument (see
+    remote.remote_solve).  Progress callbacks, timeouts, cancellation,
+    options and warm starts work as for local solves.
+
+    For local solves, a progress_callback keyword argument is called with
+    each row of SDPT3's iteration table as it is printed (see
+    result.parse_iteration_line).  If it returns True the solve is stopped,
+    and the result is built from the last row, with stopped_early set.
+    Likewise, a timeout keyword argument (in seconds) or a cancel keyword
+    argument (a threading.Event) stops a local solve, whose result then has
+    timed_out or cancelled set.  The solver's whole process group is stopped
+    and its temporary files are removed.
+
+    If transport is given (see sdpt3_solve_problem), the .mat file is first
+    linked or copied into a new workspace folder, and the solve runs from
+    there.
+
+    warm_start gives SDPT3 a starting point for a local solve: either the
+    result dict of an earlier solve or a tuple (X, y, Z), as described in
+    sedumi_writer.write_solve_settings.  Parts of it which don't fit the
+    problem are replaced by SDPT3's default starting point.  NEOS runs its
+    own copy of the solve script, so warm starts are ignored there.
+
+    options is a dict of sqlp options (see check_options), which take
+    precedence over any saved in the .mat file.  For local solves, they are
+    saved with the warm start in a settings .mat file next to the problem's.
+    For NEOS, a copy of the problem's .mat file is sent with them added.
+
+    threads and cpus keyword arguments limit the BLAS threads of a local
+    solver and pin it to a list of CPUs (see solve_locally.octave_solve).
+    Instead, a cores.CoreScheduler can be given as scheduler, which is
+    shared by solves running at the same time: each solve then waits for
+    CPUs from it, taking more of them the larger its problem, and runs with
+    one thread per CPU.
+
+    cache is a cache.ResultCache.  If it holds the result of the same
+    problem solved with the same options by the same solver (SDPT3, in any
+    mode but CVXOPT, or cvxopt), that result is returned without running a
+    solver.  Otherwise the result of the solve is stored in it.
     '''
     matfile_path = os.path.abspath(matfile_path)
     check_output_target(mode, output_target)
+    options = check_options(options)
+
+    fallback = kwargs.pop('fallback', OCTAVE)
+    if mode == AUTO:
+        mode = CVXOPT if sc.suits_cvxopt(matfile_path) else fallback
+        check_output_target(mode, output_target)
+
+    if cache is not None:
+        key = cache.key(matfile_path, 'cvxopt' if mode == CVXOPT else 'sdpt3',
+                        options)
+        result = cache.get(key)
+        if result is not None:
+            logcapture.save_log(result['msg'], output_target)
+            if discard_matfile:
+                os.remove(matfile_path)
+            return result
+        result = sdpt3_solve_mat(matfile_path, mode, output_target,
+                                 discard_matfile, transport=transport,
+                                 warm_start=warm_start, options=options,
+                                 scheduler=scheduler, **kwargs)
+        cache.put(key, result)
+        return result
+
+    if mode == CVXOPT:
+        if warm_start is not None:
+            print "cvxopt needs a strictly feasible start, so the warm start is ignored."
+        result = sc.cvxopt_solve(matfile_path, discard_matfile=discard_matfile,
+                                 options=options)
+        logcapture.save_log(result['msg'], output_target)
+        return result
+
+    if scheduler is not None and mode in (MATLAB, OCTAVE) and \
+            kwargs.get('pool') is None:
+        with scheduler.reserve(cores.problem_size(matfile_path)) as cpus:
+            kwargs.update({'threads': len(cpus), 'cpus': cpus})
+            return sdpt3_solve_mat(matfile_path, mode, output_target,
+                                   discard_matfile, transport=transport,
+                                   warm_start=warm_start, options=options,
+                                   **kwargs)
+
+    if transport is not None:
+        try:
+            with ws.workspace(transport) as folder:
+                staged = os.path.join(folder, os.path.basename(matfile_path))
+                ws.stage(matfile_path, staged)
+                return sdpt3_solve_mat(staged, mode, output_target,
+                                       warm_start=warm_start, options=options,
+                                       **kwargs)
+        finally:
+            if discard_matfile:
+                os.remove(matfile_path)
+
+    if mode == NEOS and options:
+        try:
+            with ws.workspace(ws.DISK) as folder:
+                copy = os.path.join(folder, os.path.basename(matfile_path))
+                sw.write_options_to_mat(options, matfile_path, copy)
+                return sdpt3_solve_mat(copy, mode, output_target,
+                                       warm_start=warm_start, **kwargs)
+        finally:
+            if discard_matfile:
+                os.remove(matfile_path)
+
+    if mode != NEOS and (warm_start is not None or options):
+        handle, settings_file = tempfile.mkstemp(
+            suffix="_settings.mat", dir=os.path.dirname(matfile_path))
+        os.close(handle)
+        try:
+            sw.write_solve_settings(settings_file, warm_start, options)
+            return sdpt3_solve_mat(matfile_path, mode, output_target,
+                                   discard_matfile,
+                                   settings_file=settings_file, **kwargs)
+        finally:
+            os.remove(settings_file)
+    elif warm_start is not None:
+        print "NEOS runs its own solve script, so the warm start is ignored."
 
     # Depending on the mode, solve the problem using a local Matlab+SDPT3
     # installation or on the NEOS server
-    if mode == MATLAB:
-        msg = ls.matlab_solve(matfile_path,
-                              discard_matfile=discard_matfile)
-    elif mode == OCTAVE:
-        msg = ls.octave_solve(matfile_path,
-                              discard_matfile=discard_matfile,
-                              **kwargs)
-    elif mode == NEOS:
-        import solve_neos as ns
-        msg = ns.neos_solve(matfile_path,
-                            discard_matfile=discard_matfile, **kwargs)
+    try:
+        if mode == MATLAB:
+            msg = ls.matlab_solve(matfile_path,
+                                  discard_matfile=discard_matfile,
+                                  **kwargs)
+        elif mode == OCTAVE:
+            msg = ls.octave_solve(matfile_path,
+                                  discard_matfile=discard_matfile,
+                                  **kwargs)
+        elif mode == REMOTE:
+            import remote as rm
+            msg = rm.remote_solve(matfile_path,
+                                  discard_matfile=discard_matfile, **kwargs)
+        elif mode == NEOS:
+            import solve_neos as ns
+            msg = ns.neos_solve(matfile_path,
+                                discard_matfile=discard_matfile, **kwargs)
 
-    if output_target:
-        with open(output_target, "w") as fp:
-            fp.write(msg)
+    except ls.SolveInterrupted as err:
+        logcapture.save_log(err.msg, output_target)
+        return res.make_interrupted_result(
+            err.msg, err.progress, err.status_verb, **{err.flag: True})
 
-    result = res.make_result_dict(msg)
+    return finish_solve(msg, output_target)
+
+
+def finish_solve(msg, output_target=None):
+    '''
+    Saves the solve log msg to output_target (if given) and returns the
+    result dict constructed from it.  A saved log isn't kept in memory by
+    the result, which reads it back from output_target when it is needed.
+    '''
+    logcapture.save_log(msg, output_target)
+    result = res.make_result_dict(
+        msg, log_path=output_target and os.path.abspath(output_target))
     return result
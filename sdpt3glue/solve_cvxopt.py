@@ -0,0 +1,293 @@
+#
+# sdpt3glue/solve_cvxopt.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+'''
+Methods that solve Sedumi format problems in this Python process with
+cvxopt's cone solver, for problems so small that starting Matlab or Octave
+would take longer than the solve.
+'''
+
+import os
+import time
+
+import numpy as np
+import scipy.io
+import scipy.sparse
+from cvxopt import matrix as cvxmat
+from cvxopt import spmatrix
+from cvxopt import solvers
+
+import result as res
+import sedumi_writer as sw
+
+
+MAX_ROWS = 200
+""" The most constraints a problem may have for the AUTO mode to use cvxopt. """
+
+MAX_COLUMNS = 2000
+""" The most variables a problem may have for the AUTO mode to use cvxopt. """
+
+_OPTION_MAP = {
+    'gaptol': ('abstol', 'reltol'),
+    'inftol': ('feastol',),
+    'maxit': ('maxiters',),
+}
+"""the sqlp options with a cvxopt counterpart, and the cvxopt options each
+one sets.  Other sqlp options don't apply to cvxopt and are ignored."""
+
+_STATUS_NUMS = {
+    'optimal': 0,
+    'primal infeasible': 1,
+    'dual infeasible': 2,
+}
+"""SDPT3's termination code for each cvxopt status.  An 'unknown' status
+becomes -6 (maximum number of iterations reached) or -2 (lack of
+progress)."""
+
+
+def suits_cvxopt(matfile_path, max_rows=MAX_ROWS, max_columns=MAX_COLUMNS):
+    '''
+    Returns True if the Sedumi format problem in matfile_path is small
+    enough to be solved with cvxopt, and only uses the cones cvxopt knows.
+    Only the sizes of the file's variables are read.
+    '''
+    shapes = dict((name, shape)
+                  for name, shape, _ in scipy.io.whosmat(matfile_path))
+    rows = max(shapes.get('b', (0,)))
+    columns = max(shapes.get('c', (0,)))
+    if rows > max_rows or columns > max_columns:
+        return False
+    _, _, _, K = sw.read_sedumi_mat(matfile_path)
+    return not any(K.get('r', []))
+
+
+def cvxopt_solve(matfile_target, discard_matfile=True, options=None, **_):
+    '''
+    The problem in the .mat file is solved with cvxopt's conelp.
+
+    Args:
+        matfile_target: the path to the .mat file containing the Sedumi format problem data.
+        discard_matfile: if True, deletes the .mat file after the solve finishes.
+        options: a dict of sqlp options (see solve.check_options).  gaptol,
+        inftol and maxit are passed on as cvxopt's tolerances and iteration
+        limit; the rest have no cvxopt counterpart.
+
+    Returns:
+        A dictionary with solve result information, with the keys of
+        result.make_result_dict, and y and Zvars as well.  Its msg is a short
+        text log of the solve.
+
+    Raises:
+        ValueError when the problem has a cone cvxopt doesn't support.
+    '''
+    try:
+        A, b, c, K = sw.read_sedumi_mat(matfile_target)
+    finally:
+        # Cleanup
+        if discard_matfile:
+            print "now deleting {0}".format(matfile_target)
+            os.remove(matfile_target)
+
+    return solve_sedumi(A, b, c, K, options)
+
+
+def solve_sedumi(A, b, c, K, options=None):
+    '''
+    Solves the Sedumi format problem (A, b, c, K) with cvxopt, returning the
+    result dict described in cvxopt_solve.
+    '''
+    b = np.asarray(b, dtype='d').ravel()
+    c = np.asarray(c, dtype='d').ravel()
+    A = scipy.sparse.csc_matrix(A, dtype='d')
+    if A.shape[1] != c.size and A.shape[0] == c.size:
+        A = A.T.tocsc()
+    cones = _cone_dims(K)
+    E = _symmetric_expansion(cones)
+    n_free = cones['f']
+
+    # SDPT3's primal, min c'x s.t. Ax = b and x in K, is conelp's primal with
+    # x = E u for the unique entries u of x, and G u + s = 0 putting the
+    # cone part of x in s.  Each semidefinite block of x is kept symmetric
+    # by E, since conelp only reads the lower triangle of s.
+    A_u = (A * E).tocoo()
+    c_u = E.T * c
+    G = (-E[n_free:, :]).tocoo()
+    dims = {'l': cones['l'], 'q': cones['q'], 's': cones['s']}
+
+    solver_options = {'show_progress': False}
+    for name, value in (options or {}).items():
+        for cvxopt_name in _OPTION_MAP.get(name, ()):
+            solver_options[cvxopt_name] = (
+                int(value) if cvxopt_name == 'maxiters' else value)
+
+    start = time.time()
+    solution = solvers.conelp(
+        _column(c_u), _spmatrix(G), _column(np.zeros(G.shape[0])), dims,
+        _spmatrix(A_u), _column(b), options=solver_options)
+    solve_time = time.time() - start
+
+    return _make_result(solution, A, b, c, E, cones, solver_options,
+                        solve_time)
+
+
+def _cone_dims(K):
+    '''
+    Returns the cone dimensions of K as ints, with 'q' and 's' as lists of
+    the cones of nonzero size.
+    '''
+    def sizes(name):
+        return [int(dim) for dim in np.atleast_1d(K.get(name, [])) if dim > 0]
+
+    if sizes('r'):
+        raise ValueError(
+            "cvxopt has no rotated second order cones (K.r), please use "
+            "SDPT3 for this problem.")
+    unknown = [name for name in K if name not in ('f', 'l', 'q', 'r', 's')
+               and np.any(np.asarray(K[name]))]
+    if unknown:
+        raise ValueError(
+            "cvxopt doesn't support the cones {0}.".format(", ".join(unknown)))
+    return {
+        'f': sum(sizes('f')),
+        'l': sum(sizes('l')),
+        'q': sizes('q'),
+        's': sizes('s'),
+    }
+
+
+def _symmetric_expansion(cones):
+    '''
+    Returns the sparse matrix E mapping the unique entries of a Sedumi
+    format x (the lower triangles of its semidefinite blocks, column by
+    column) to the whole of x.
+    '''
+    rows, cols = [], []
+    vector_part = cones['f'] + cones['l'] + sum(cones['q'])
+    rows.extend(range(vector_part))
+    cols.extend(range(vector_part))
+    row_start = col_start = vector_part
+    for n in cones['s']:
+        for j in range(n):
+            for i in range(j, n):
+                rows.append(row_start + i + j * n)
+                cols.append(col_start)
+                if i != j:
+                    rows.append(row_start + j + i * n)
+                    cols.append(col_start)
+                col_start += 1
+        row_start += n * n
+    return scipy.sparse.csc_matrix(
+        (np.ones(len(rows)), (rows, cols)), shape=(row_start, col_start))
+
+
+def _column(x):
+    '''
+    Converts the vector x to a cvxopt column matrix.  This goes through a
+    list, since cvxopt refuses arrays whose byte order is marked (as those
+    read by scipy.io.loadmat are).
+    '''
+    return cvxmat(x.tolist(), (x.size, 1), 'd')
+
+
+def _spmatrix(M):
+    ''' Converts the scipy.sparse.coo_matrix M to a cvxopt spmatrix. '''
+    return spmatrix(M.data.tolist(), M.row.tolist(), M.col.tolist(),
+                    size=M.shape, tc='d')
+
+
+def _blocks(x, cones):
+    '''
+    Splits the Sedumi format vector x into blocks laid out like SDPT3's X:
+    the free part, the linear part and all second order cones as columns
+    (each left out if empty), then each semidefinite block as a symmetric
+    matrix.
+    '''
+    blocks = []
+    start = 0
+    for size in (cones['f'], cones['l'], sum(cones['q'])):
+        if size:
+            blocks.append(x[start:start + size].reshape(-1, 1))
+        start += size
+    for n in cones['s']:
+        block = x[start:start + n * n].reshape(n, n, order='F')
+        blocks.append((block + block.T) / 2)
+        start += n * n
+    return blocks
+
+
+def _make_result(solution, A, b, c, E, cones, solver_options, solve_time):
+    '''
+    Builds the result dict of a cvxopt solve, in SDPT3's terms.
+    '''
+    status = solution['status']
+    iterations = solution['iterations']
+    if status in _STATUS_NUMS:
+        status_num = _STATUS_NUMS[status]
+    elif iterations >= solver_options.get('maxiters', 100):
+        status_num = -6
+    else:
+        status_num = -2
+
+    result_dict = {
+        'iterations': iterations,
+        'primal_z': solution['primal objective'],
+        'dual_z': solution['dual objective'],
+        'abs_gap': solution['gap'],
+        'rel_gap': solution['relative gap'],
+        'actual_rel_gap': None,
+        'rel_primal_feas': solution['primal infeasibility'],
+        'rel_dual_feas': solution['dual infeasibility'],
+        'solve_time': solve_time,
+        'solve_time_per_iter': solve_time / max(iterations, 1),
+        'status_num': status_num,
+        'Xvars': [],
+        'y': None,
+        'Zvars': [],
+    }
+    primal_z, dual_z = result_dict['primal_z'], result_dict['dual_z']
+    if primal_z is not None and dual_z is not None:
+        result_dict['actual_rel_gap'] = (primal_z - dual_z) / (
+            1 + abs(primal_z) + abs(dual_z))
+
+    # For infeasible problems, cvxopt gives a certificate of infeasibility
+    # instead of a solution, which isn't reported.
+    if status_num not in (1, 2) and solution['x'] is not None:
+        x = E * np.array(solution['x']).ravel()
+        y_cvxopt = np.array(solution['y']).ravel()
+        result_dict['Xvars'] = _blocks(x, cones)
+        result_dict['y'] = -y_cvxopt
+        result_dict['Zvars'] = _blocks(c + A.T * y_cvxopt, cones)
+
+    result_dict['status_verb'] = res.get_verb_status(status_num)
+    for flag in res.INTERRUPTION_FLAGS:
+        result_dict[flag] = False
+    # The solve shares this process, so its memory can't be told apart.
+    result_dict['peak_rss'] = None
+    result_dict['msg'] = _make_log(solution, result_dict)
+    return res.SolveResult(result_dict)
+
+
+def _make_log(solution, result_dict):
+    '''
+    Returns a short text log of a cvxopt solve, in place of SDPT3's.
+    '''
+    lines = [
+        "cvxopt conelp solve",
+        "cvxopt status: {0}".format(solution['status']),
+        "number of iterations = {0[iterations]}",
+        "primal objective value = {0[primal_z]}",
+        "dual objective value = {0[dual_z]}",
+        "gap = {0[abs_gap]}",
+        "relative gap = {0[rel_gap]}",
+        "rel. primal infeas = {0[rel_primal_feas]}",
+        "rel. dual infeas = {0[rel_dual_feas]}",
+        "Total time (secs) = {0[solve_time]}",
+        "termination code = {0[status_num]}",
+    ]
+    return "\n".join(lines).format(result_dict) + "\n"
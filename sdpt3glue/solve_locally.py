@@ -14,10 +14,35 @@ machine.
 
 import os
 import os.path
-
+import pipes
 import shutil
+import signal
 import subprocess
+import sys
 import tempfile
+import threading
+import time
+from distutils.spawn import find_executable
+
+import logcapture
+import result as res
+
+
+RUNNER_LIBRARY = (
+    "SDPT3report.m",
+    "SDPT3warmstart.m",
+    "SDPT3solve.m",
+)
+""" The .m files a runner script needs, in the order they are written. """
+
+BLAS_THREAD_VARIABLES = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "GOTO_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+)
+""" The environment variables which cap the threads of common BLAS builds. """
 
 
 class SubprocessCallError(Exception):
@@ -27,34 +52,116 @@ class SubprocessCallError(Exception):
     pass
 
 
-def matlab_solve(matfile_target, discard_matfile=True, **_):
+class SolveInterrupted(Exception):
+    '''
+    This error is raised when a solve is ended before SDPT3 finished.  The
+    log printed up to that point is kept in the msg attribute, and the last
+    iteration row parsed from it (or None) in the progress attribute.  Each
+    subclass names the result dict flag it sets and the status_verb it gives.
+    '''
+    flag = None
+    status_verb = "interrupted"
+
+    def __init__(self, message, msg, progress):
+        super(SolveInterrupted, self).__init__(message)
+        self.msg = msg
+        self.progress = progress
+
+
+class SolveStopped(SolveInterrupted):
+    '''
+    This error is raised when a progress callback asked for the solve to stop.
+    '''
+    flag = 'stopped_early'
+    status_verb = "stopped early by the progress callback"
+
+
+class SolveTimeout(SolveInterrupted):
+    '''
+    This error is raised when a solve ran longer than its timeout.
+    '''
+    flag = 'timed_out'
+    status_verb = "timed out"
+
+
+class SolveCancelled(SolveInterrupted):
+    '''
+    This error is raised when a solve was cancelled through its cancel event.
+    '''
+    flag = 'cancelled'
+    status_verb = "cancelled"
+
+
+def matlab_solve(matfile_target, discard_matfile=True, pool=None,
+                 workdir=None, progress_callback=None, timeout=None,
+                 cancel=None, settings_file=None, threads=None, cpus=None,
+                 **_):
     '''
     The .mat is loaded into matlab and the problem is solved with SDPT3.
 
     Args:
         matfile_target: the path to the .mat file containing the Sedumi format problem data.
         discard_matfile: if True, deletes the .mat file after the solve finishes.
+        pool: a worker.SolverPool of Matlab workers to solve on, instead of
+        starting a new Matlab.
+        workdir: the folder to run Matlab in, if not the current one.
+        progress_callback: called with a dict for each row of SDPT3's
+        iteration table as it is printed (see result.parse_iteration_line).
+        If it returns True, Matlab is stopped and SolveStopped is raised.
+        timeout: the number of seconds after which Matlab is stopped and
+        SolveTimeout is raised.  With a pool, the time spent waiting for a
+        free worker doesn't count.
+        cancel: a threading.Event which stops Matlab and raises SolveCancelled
+        when it is set.
+        settings_file: the path to a .mat file with options and/or a
+        starting point for SDPT3 (see sedumi_writer.write_solve_settings).
+        threads: the number of computational threads Matlab may use, set
+        with maxNumCompThreads and the BLAS_THREAD_VARIABLES.
+        cpus: a list of the CPUs Matlab is pinned to (see pin_command).
+        threads and cpus are ignored with a pool, whose workers are started
+        with their own.
 
     Returns:
         A dictionary with solve result information.
 
     Raises:
         SubprocessCallError when some error happens while executing matlab.
+        SolveStopped when progress_callback stopped the solve.
+        SolveTimeout when the solve took longer than timeout.
+        SolveCancelled when cancel was set during the solve.
     '''
-    # Generating the .mat file
-    run_command = "matlab -r \"SDPT3solve('{0}')\" -nodisplay -nojvm".format(
-        matfile_target)
-    msg = _run_command_get_output(run_command)
+    result_file = make_result_file(matfile_target)
+    try:
+        paths = _solve_paths(matfile_target, settings_file, result_file)
+        if pool is not None:
+            msg = pool.call("SDPT3solve",
+                            *[p and pool.job_path(p) for p in paths],
+                            progress_callback=progress_callback,
+                            timeout=timeout, cancel=cancel)
+        else:
+            run_command = "matlab -r \"{0}SDPT3solve({1})\" -nodisplay -nojvm".format(
+                matlab_thread_limit(threads),
+                _matlab_strings(p and os.path.abspath(p) for p in paths))
+            msg = _run_command_get_output(
+                pin_command(run_command, cpus), cwd=workdir,
+                progress_callback=progress_callback, timeout=timeout,
+                cancel=cancel, env=thread_environment(threads))
+        load_result_file(msg, result_file)
 
-    # Cleanup
-    if discard_matfile:
-        print "now deleting {0}".format(matfile_target)
-        os.remove(matfile_target)
+    finally:
+        # Cleanup
+        os.remove(result_file)
+        if discard_matfile:
+            print "now deleting {0}".format(matfile_target)
+            os.remove(matfile_target)
 
     return msg
 
 
-def octave_solve(matfile_target, discard_matfile=True, cmd="octave", **_):
+def octave_solve(matfile_target, discard_matfile=True, cmd="octave",
+                 pool=None, workdir=None, progress_callback=None, timeout=None,
+                 cancel=None, settings_file=None, threads=None, cpus=None,
+                 **_):
     '''
     The .mat is loaded into octave and the problem is solved with SDPT3.
 
@@ -62,46 +169,200 @@ def octave_solve(matfile_target, discard_matfile=True, cmd="octave", **_):
         matfile_target: the path to the .mat file containing the Sedumi format problem data.
         discard_matfile: if True, deletes the .mat file after the solve finishes.
         cmd: command name for octave, which will be used for alternative command.
+        pool: a worker.SolverPool of Octave workers to solve on, instead of
+        starting a new Octave.
+        workdir: the folder to run Octave in.  By default Octave runs in the
+        current folder and the runner script is written next to the .mat.
+        When workdir is given, the runner script is written there, paths are
+        given relative to it, and "{workdir}" in cmd is replaced by it, so
+        that each job can have a folder of its own (e.g. for Docker mounts).
+        progress_callback: called with a dict for each row of SDPT3's
+        iteration table as it is printed (see result.parse_iteration_line).
+        If it returns True, Octave is stopped and SolveStopped is raised.
+        timeout: the number of seconds after which Octave is stopped and
+        SolveTimeout is raised.  With a pool, the time spent waiting for a
+        free worker doesn't count.
+        cancel: a threading.Event which stops Octave and raises SolveCancelled
+        when it is set.
+        settings_file: the path to a .mat file with options and/or a
+        starting point for SDPT3 (see sedumi_writer.write_solve_settings).
+        threads: the number of BLAS threads Octave may use, set with the
+        BLAS_THREAD_VARIABLES.
+        cpus: a list of the CPUs Octave is pinned to (see pin_command).
+        threads and cpus are ignored with a pool, whose workers are started
+        with their own.
 
     Returns:
         A dictionary with solve result information.
 
     Raises:
         SubprocessCallError when some error happens while executing octave.
+        SolveStopped when progress_callback stopped the solve.
+        SolveTimeout when the solve took longer than timeout.
+        SolveCancelled when cancel was set during the solve.
     '''
-    # Generating the .mat file
-    with tempfile.NamedTemporaryFile(
-        suffix=".m", dir=os.path.dirname(matfile_target)) as runner:
+    result_file = make_result_file(matfile_target)
+    try:
+        paths = _solve_paths(matfile_target, settings_file, result_file)
+        if pool is not None:
+            msg = pool.call("SDPT3solve",
+                            *[p and pool.job_path(p) for p in paths],
+                            progress_callback=progress_callback,
+                            timeout=timeout, cancel=cancel)
+        else:
+            if workdir is not None:
+                workdir = os.path.abspath(workdir)
+                cmd = cmd.replace("{workdir}", workdir)
+            script_dir = workdir or os.path.dirname(matfile_target)
+            start = workdir or os.curdir
 
-        with open(os.path.join(os.path.dirname(__file__), "SDPT3solve.m")) as lib:
-            shutil.copyfileobj(lib, runner)
+            with tempfile.NamedTemporaryFile(suffix=".m", dir=script_dir) as runner:
 
-        runner.write("SDPT3solve('{0}');\n".format(
-            os.path.relpath(matfile_target)))
-        runner.flush()
+                write_runner_library(runner)
+                runner.write("SDPT3solve({0});\n".format(_matlab_strings(
+                    p and os.path.relpath(p, start) for p in paths)))
+                runner.flush()
 
-        run_command = "{cmd} {script}".format(
-            cmd=cmd, script=os.path.relpath(runner.name))
-        msg = _run_command_get_output(run_command)
+                run_command = "{cmd} {script}".format(
+                    cmd=cmd, script=os.path.relpath(runner.name, start))
+                msg = _run_command_get_output(
+                    pin_command(run_command, cpus), cwd=workdir,
+                    progress_callback=progress_callback,
+                    timeout=timeout, cancel=cancel,
+                    env=thread_environment(threads))
+        load_result_file(msg, result_file)
 
-    # Cleanup
-    if discard_matfile:
-        print "now deleting {0}".format(matfile_target)
-        os.remove(matfile_target)
+    finally:
+        # Cleanup
+        os.remove(result_file)
+        if discard_matfile:
+            print "now deleting {0}".format(matfile_target)
+            os.remove(matfile_target)
 
     return msg
 
 
-def _run_command_get_output(run_command):
+def write_runner_library(runner, library=RUNNER_LIBRARY):
+    '''
+    Writes the functions in library into the open script file runner, so that
+    Octave can run the script without SDPT3glue's .m files being on its path.
+    '''
+    # A leading statement stops Octave from taking the whole script for a
+    # single function file, and SDPT3's iteration rows should reach us as
+    # they are printed rather than when Octave's pager buffer fills up.
+    runner.write("1;\n")
+    runner.write("page_screen_output(false);\n")
+    runner.write("page_output_immediately(true);\n")
+    for name in library:
+        with open(os.path.join(os.path.dirname(__file__), name)) as lib:
+            shutil.copyfileobj(lib, runner)
+        runner.write("\n")
+
+
+def thread_environment(threads):
+    '''
+    Returns a copy of the environment with each of the BLAS_THREAD_VARIABLES
+    set to threads, for a solver process started with it, or None (i.e.
+    the environment as it is) if threads is None.
+    '''
+    if threads is None:
+        return None
+    if threads < 1 or threads != int(threads):
+        raise ValueError(
+            "threads must be a positive whole number, not {0!r}.".format(
+                threads))
+    env = dict(os.environ)
+    for name in BLAS_THREAD_VARIABLES:
+        env[name] = str(int(threads))
+    return env
+
+
+def matlab_thread_limit(threads):
+    '''
+    Returns the Matlab statement limiting its computational threads to
+    threads, to go at the start of a -r command, or "" if threads is None.
+    '''
+    if threads is None:
+        return ""
+    return "maxNumCompThreads({0}); ".format(int(threads))
+
+
+def pin_command(run_command, cpus):
+    '''
+    Returns run_command wrapped so that it, and everything it starts, only
+    runs on the CPUs in the list cpus.  This needs taskset; without it, or
+    without cpus, run_command is returned as it is.
+    '''
+    if not cpus:
+        return run_command
+    if find_executable("taskset") is None:
+        print "taskset wasn't found, so the solver isn't pinned to CPUs."
+        return run_command
+    return "taskset -c {0} sh -c {1}".format(
+        ",".join(str(cpu) for cpu in sorted(cpus)), pipes.quote(run_command))
+
+
+def _solve_paths(matfile_target, settings_file, result_file=None):
     '''
-    Runs the command run_command, saves the output to output_target, and
-    returns the output log.
+    Returns the list of the files SDPT3solve.m is given, with "" for a
+    missing settings_file if a result_file follows it.
+    '''
+    if result_file:
+        return [matfile_target, settings_file or "", result_file]
+    return [matfile_target] + ([settings_file] if settings_file else [])
+
+
+def make_result_file(matfile_target):
+    '''
+    Returns the path of a new, empty file next to matfile_target for
+    SDPT3solve.m (or SDPT3append.m, SDPT3update.m) to save its results in.
+    The caller removes it.
+    '''
+    handle, result_file = tempfile.mkstemp(
+        suffix="_result.mat", dir=os.path.dirname(os.path.abspath(
+            matfile_target)))
+    os.close(handle)
+    return result_file
+
+
+def load_result_file(msg, result_file):
+    '''
+    Loads the results the solve script saved to result_file into the
+    logcapture.SolverLog msg, as its blocks (the X blocks) and solution (see
+    result.read_result_mat).  If the solver didn't save them, e.g. because
+    it failed, msg is left as it is, so X is read from the log instead.
+    '''
+    if not os.path.getsize(result_file):
+        return
+    solution = res.read_result_mat(result_file)
+    msg.blocks = solution['Xvars']
+    msg.solution = solution
+
+
+def _matlab_strings(args):
+    '''
+    Returns the strings args as a comma separated list of Matlab string
+    literals.
+    '''
+    return ", ".join("'{0}'".format(arg.replace("'", "''")) for arg in args)
+
+
+def _run_command_get_output(run_command, cwd=None, progress_callback=None,
+                            timeout=None, cancel=None, env=None):
+    '''
+    Runs the command run_command in the folder cwd (by default the current
+    one), with the environment env if given, and returns the output log as a logcapture.SolverLog, which is read
+    line by line as it is printed.  Each iteration row of SDPT3's log is passed to
+    progress_callback, and if that returns True the command's whole process
+    group is stopped and SolveStopped is raised.  Likewise, the process
+    group is stopped and SolveTimeout or SolveCancelled raised once timeout
+    seconds have passed or the threading.Event cancel is set.
     '''
     # Performing the Matlab solve
     try:
         proc = subprocess.Popen(
-            run_command, shell=True, stdout=subprocess.PIPE)
-        return proc.communicate()[0]
+            run_command, shell=True, stdout=subprocess.PIPE, cwd=cwd,
+            env=env, preexec_fn=new_process_group)
 
     except:
         err_msg = ("Something went wrong with the command. The command "
@@ -109,3 +370,167 @@ def _run_command_get_output(run_command):
                    "and that the the folder containing SDPT3solve.m is in the "
                    "Matlab or Octave path variable.").format(run_command)
         raise SubprocessCallError(err_msg)
+
+    log = logcapture.SolverLog()
+    progress = None
+    watchdog = Watchdog(lambda: kill_process_group(proc), timeout, cancel)
+    try:
+        for line in iter(proc.stdout.readline, ""):
+            log.append(line)
+            progress, stop = watch_progress(line, progress, progress_callback)
+            if stop:
+                raise SolveStopped(
+                    "The progress callback stopped the solve.", log, progress)
+    except:
+        watchdog.stop()
+        kill_process_group(proc)
+        raise
+
+    log.peak_rss = wait_peak_rss(proc)
+    watchdog.stop()
+    watchdog.check(log, progress)
+    return log
+
+
+def wait_peak_rss(proc):
+    '''
+    Waits for the subprocess.Popen object proc and returns the peak resident
+    memory in bytes of it and of the descendants it waited for (e.g. the
+    interpreter run by its shell), or None where os.wait4 isn't available.
+    '''
+    if not hasattr(os, "wait4"):
+        proc.wait()
+        return None
+    try:
+        _, status, usage = os.wait4(proc.pid, 0)
+    except OSError:
+        # Already reaped, e.g. by a poll from the watchdog's kill.
+        proc.wait()
+        return None
+    if os.WIFSIGNALED(status):
+        proc.returncode = -os.WTERMSIG(status)
+    else:
+        proc.returncode = os.WEXITSTATUS(status)
+    # ru_maxrss is in kilobytes, except on OS X where it is in bytes.
+    return usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+class Watchdog(object):
+    '''
+    Calls kill from a thread of its own once timeout seconds have passed or
+    the threading.Event cancel is set, unless stop is called first.  Without
+    a timeout or cancel event, no thread is started.
+    '''
+
+    _POLL_INTERVAL = 0.1
+
+    def __init__(self, kill, timeout=None, cancel=None):
+        self.fired = None
+        self._kill = kill
+        self._deadline = None if timeout is None else time.time() + timeout
+        self._cancel = cancel
+        self._finished = threading.Event()
+        self._thread = None
+        if timeout is not None or cancel is not None:
+            self._thread = threading.Thread(target=self._watch)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        '''
+        Stops watching, waiting for kill to return if it has been called.
+        '''
+        self._finished.set()
+        if self._thread is not None and \
+                self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def check(self, msg, progress):
+        '''
+        Raises SolveTimeout or SolveCancelled, with the log msg and the last
+        iteration row progress, if kill was called.
+        '''
+        if self.fired is SolveTimeout:
+            raise SolveTimeout(
+                "The solve took longer than its timeout.", msg, progress)
+        if self.fired is SolveCancelled:
+            raise SolveCancelled("The solve was cancelled.", msg, progress)
+
+    def _watch(self):
+        while True:
+            if self._cancel is not None and self._cancel.is_set():
+                self.fired = SolveCancelled
+                break
+            wait = None if self._cancel is None else self._POLL_INTERVAL
+            if self._deadline is not None:
+                remaining = self._deadline - time.time()
+                if remaining <= 0:
+                    self.fired = SolveTimeout
+                    break
+                wait = remaining if wait is None else min(wait, remaining)
+            if self._finished.wait(wait):
+                return
+        self._kill()
+
+
+def watch_progress(line, progress, progress_callback):
+    '''
+    Checks whether line of a solve log is a row of SDPT3's iteration table
+    and, if so, passes it to progress_callback.
+
+    Returns:
+        progress: the parsed row, or the progress passed in if line isn't
+        an iteration row.
+        stop: True if progress_callback asked for the solve to stop.
+    '''
+    row = res.parse_iteration_line(line)
+    if row is None:
+        return progress, False
+    stop = progress_callback is not None and bool(progress_callback(row))
+    return row, stop
+
+
+def new_process_group():
+    '''
+    Used as the preexec_fn of solver processes, so that the shell, the
+    interpreter and anything they start can be stopped together.
+    '''
+    if hasattr(os, "setsid"):
+        os.setsid()
+
+
+def kill_process_group(proc, grace=5.):
+    '''
+    Stops the process group of the subprocess.Popen object proc, which was
+    started with new_process_group: politely at first, then forcefully if
+    any process of the group is still running after grace seconds.  The
+    group, not just proc, is watched, since a child of proc may ignore the
+    polite signal after proc itself has exited.
+    '''
+    if not hasattr(os, "killpg"):
+        if proc.poll() is None:
+            proc.terminate()
+        return
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        if not _group_alive(proc):
+            return
+        try:
+            os.killpg(proc.pid, sig)
+        except OSError:
+            return
+        deadline = time.time() + grace
+        while _group_alive(proc) and time.time() < deadline:
+            time.sleep(0.05)
+
+
+def _group_alive(proc):
+    '''
+    Whether any process of the process group led by proc is still running.
+    proc is reaped first if it has exited, so that it doesn't count.
+    '''
+    proc.poll()
+    try:
+        os.killpg(proc.pid, 0)
+    except OSError:
+        return False
+    return True
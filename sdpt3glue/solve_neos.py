@@ -16,6 +16,7 @@ for problems of this type.
 import os
 import sys
 import contextlib
+import threading
 from time import sleep
 import xmlrpclib
 from xmlrpclib import Fault
@@ -318,3 +319,83 @@ class NeosInterface(object):
                 _print_protocol_error(err)
 
             sleep(3)
+
+
+class NeosPoller(object):
+    '''
+    Follows any number of NEOS jobs from a single thread, instead of one
+    blocking track_and_return call per job.  Each round, the status of every
+    job being watched is checked once, and the results of finished jobs are
+    fetched and handed to their callbacks.  Errors talking to NEOS are
+    printed and the job is tried again in the next round.
+    '''
+
+    def __init__(self, interval=20, neos_host=None, neos_port=None):
+        self.interval = interval
+        self._neos = NeosInterface(neos_host, neos_port)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def watch(self, jobid, pwd, callback):
+        '''
+        Starts following a submitted job.  Once it's done, callback is called
+        from the polling thread with the result message as its argument.
+        '''
+        with self._lock:
+            self._jobs[(jobid, pwd)] = callback
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+
+    @property
+    def in_flight(self):
+        ''' The number of jobs being watched. '''
+        with self._lock:
+            return len(self._jobs)
+
+    def stop(self):
+        '''
+        Stops polling.  Jobs still being watched are left alone on NEOS.
+        '''
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                jobs = self._jobs.items()
+            for (jobid, pwd), callback in jobs:
+                msg = self._poll(jobid, pwd)
+                if msg is None:
+                    continue
+                with self._lock:
+                    del self._jobs[(jobid, pwd)]
+                try:
+                    callback(msg)
+                except Exception as err:  # pylint: disable=broad-except
+                    sys.stderr.write(
+                        "Callback for NEOS job {0} failed: {1}\n".format(
+                            jobid, err))
+            self._stop.wait(self.interval)
+
+    def _poll(self, jobid, pwd):
+        '''
+        Returns the result message of a finished job, or None if the job
+        isn't done or NEOS couldn't be reached.
+        '''
+        try:
+            if self._neos.server.getJobStatus(jobid, pwd) != "Done":
+                return None
+            return self._neos.server.getFinalResults(jobid, pwd).data
+
+        except Fault as err:
+            _print_fault(err)
+        except ProtocolError as err:
+            _print_protocol_error(err)
+        except IOError as err:
+            print "  Error reaching NEOS: {0}  (will try again)".format(err)
+        return None
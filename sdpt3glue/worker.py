@@ -0,0 +1,446 @@
+#
+# sdpt3glue/worker.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+'''
+Long-lived Matlab or Octave processes which load SDPT3 once and then run the
+jobs sent to them over a pipe.
+'''
+
+import contextlib
+import os
+import os.path
+import subprocess
+import tempfile
+import threading
+
+import logcapture
+import solve_locally as ls
+
+
+WORKER_LIBRARY = ls.RUNNER_LIBRARY + (
+    "SDPT3store.m",
+    "SDPT3append.m",
+    "SDPT3update.m",
+    "SDPT3worker.m",
+)
+""" The .m files a worker script needs, in the order they are written. """
+
+_MARKER = "@@SDPT3GLUE "
+
+
+class WorkerJobError(Exception):
+    '''
+    This error is raised when a job fails inside a solver process.  The
+    Matlab/Octave error identifier is kept in the identifier attribute.
+    '''
+
+    def __init__(self, identifier, message):
+        super(WorkerJobError, self).__init__(message)
+        self.identifier = identifier
+
+
+class SolverProcess(object):
+    '''
+    A Matlab or Octave interpreter which is started once and then runs the
+    jobs written to its standard input by SDPT3worker.m.  Whatever a job keeps
+    with SDPT3store.m stays available to later jobs on the same process; the
+    keys of the resident.ResidentProblem data it holds are kept in the
+    resident set.
+
+    For Octave, the worker script is written to workdir and handed to cmd by
+    its path relative to the current folder, the same way octave_solve does
+    it, so a Docker image with the current folder mounted works as cmd.  For
+    Matlab, the folder containing SDPT3worker.m must be on the MATLABPATH.
+
+    threads and cpus limit the interpreter's BLAS threads and pin it to a
+    list of CPUs for its whole life, as in solve_locally.octave_solve.
+    '''
+
+    def __init__(self, mode="octave", cmd=None, workdir=None, threads=None,
+                 cpus=None):
+        assert mode in ["matlab", "octave"], \
+            "Please choose mode equal to either 'matlab' or 'octave'."
+        self.mode = mode
+        self.workdir = os.path.abspath(workdir or os.getcwd())
+        self.jobs_run = 0
+        self.resident = set()
+        self.threads = threads
+        self.cpus = list(cpus) if cpus else None
+        self._script = None
+
+        if mode == "octave":
+            with tempfile.NamedTemporaryFile(
+                    suffix=".m", dir=self.workdir, delete=False) as runner:
+                ls.write_runner_library(runner, WORKER_LIBRARY)
+                runner.write("SDPT3worker();\n")
+            self._script = runner.name
+            run_command = "{cmd} {script}".format(
+                cmd=cmd or "octave", script=os.path.relpath(self._script))
+        else:
+            run_command = "{cmd} -r \"{limit}SDPT3worker; exit\" -nodisplay -nojvm".format(
+                cmd=cmd or "matlab", limit=ls.matlab_thread_limit(threads))
+
+        try:
+            self._proc = subprocess.Popen(
+                ls.pin_command(run_command, self.cpus), shell=True,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                env=ls.thread_environment(threads),
+                preexec_fn=ls.new_process_group)
+        except OSError:
+            self._remove_script()
+            raise ls.SubprocessCallError(
+                "Couldn't start the solver process with the command:\n"
+                "{0}".format(run_command))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @property
+    def alive(self):
+        ''' True while the interpreter is still running. '''
+        return self._proc.poll() is None
+
+    @property
+    def pid(self):
+        ''' The process id of the interpreter (or of the shell running it). '''
+        return self._proc.pid
+
+    def job_path(self, path):
+        '''
+        Returns path the way the interpreter should be told about it: relative
+        to the current folder for Octave, absolute for Matlab.
+        '''
+        if self.mode == "octave":
+            return os.path.relpath(path)
+        return os.path.abspath(path)
+
+    def call(self, function, *args, **kwargs):
+        '''
+        Runs function(args...) in the interpreter, where every argument is
+        passed as a string, and returns everything the job printed as a
+        logcapture.SolverLog.
+
+        The progress_callback, timeout and cancel keyword arguments are
+        treated as in solve_locally.octave_solve.  Since the only way to stop
+        a running job is to stop the interpreter, the process is no longer
+        alive after a job is stopped by any of them.
+
+        Raises:
+            WorkerJobError when the function raised an error.
+            SubprocessCallError when the interpreter is no longer running.
+            SolveStopped when progress_callback stopped the job.
+            SolveTimeout when the job took longer than timeout.
+            SolveCancelled when cancel was set during the job.
+        '''
+        progress_callback = kwargs.pop("progress_callback", None)
+        timeout = kwargs.pop("timeout", None)
+        cancel = kwargs.pop("cancel", None)
+        if kwargs:
+            raise TypeError(
+                "Unexpected keyword arguments: {0}".format(", ".join(kwargs)))
+
+        jobid = str(self.jobs_run)
+        fields = [jobid, function] + [str(arg) for arg in args]
+        for field in fields:
+            if "\t" in field or "\n" in field:
+                raise ValueError(
+                    "Job arguments can't contain tabs or line breaks: "
+                    "{0!r}".format(field))
+        self.jobs_run += 1
+
+        try:
+            self._proc.stdin.write("\t".join(fields) + "\n")
+            self._proc.stdin.flush()
+        except IOError:
+            raise ls.SubprocessCallError(
+                "The solver process (pid {0}) is no longer running.".format(
+                    self.pid))
+
+        watchdog = ls.Watchdog(self.kill, timeout, cancel)
+        try:
+            return self._read_frame(jobid, progress_callback, watchdog)
+        finally:
+            watchdog.stop()
+
+    def close(self):
+        '''
+        Asks the interpreter to stop, waits for it, and removes the worker
+        script.
+        '''
+        if self.alive:
+            try:
+                self._proc.stdin.write("\n")
+                self._proc.stdin.close()
+            except IOError:
+                pass
+            self._proc.wait()
+        self._remove_script()
+
+    def kill(self):
+        '''
+        Stops the interpreter and anything it started right away, without
+        waiting for the current job.
+        '''
+        ls.kill_process_group(self._proc)
+        self._remove_script()
+
+    def _read_frame(self, jobid, progress_callback=None, watchdog=None):
+        '''
+        Reads the output of job jobid, dropping anything printed outside of
+        its begin and end markers.  If the output ends because watchdog
+        stopped the interpreter, the error it gives is raised.
+        '''
+        log = logcapture.SolverLog()
+        error = None
+        in_frame = False
+        progress = None
+        while True:
+            line = self._proc.stdout.readline()
+            if not line:
+                if watchdog is not None:
+                    watchdog.stop()
+                    watchdog.check(log, progress)
+                raise ls.SubprocessCallError(
+                    "The solver process (pid {0}) stopped during job "
+                    "{1}.".format(self.pid, jobid))
+
+            if not line.startswith(_MARKER):
+                if in_frame:
+                    log.append(line)
+                    try:
+                        progress, stop = ls.watch_progress(
+                            line, progress, progress_callback)
+                    except:
+                        self.kill()
+                        raise
+                    if stop:
+                        self.kill()
+                        raise ls.SolveStopped(
+                            "The progress callback stopped the solve.",
+                            log, progress)
+                continue
+
+            tag, _, rest = line[len(_MARKER):].rstrip("\n").partition(" ")
+            if tag == "BEGIN" and rest == jobid:
+                in_frame = True
+            elif tag == "ERROR" and in_frame:
+                error = rest.partition("\t")[::2]
+            elif tag == "END" and rest == jobid:
+                break
+
+        if error is not None:
+            raise WorkerJobError(*error)
+        return log
+
+    def _remove_script(self):
+        if self._script and os.path.exists(self._script):
+            os.remove(self._script)
+        self._script = None
+
+
+class SolverPool(object):
+    '''
+    A fixed number of SolverProcess workers shared between threads.  Workers
+    are started when first needed and replaced after max_jobs jobs, or once
+    their resident memory (including child processes) passes max_memory
+    bytes.  The memory check reads /proc, so it only applies on Linux.
+
+    A pool can be given to sdpt3_solve_mat as pool=..., in which case the
+    solve runs on one of its workers instead of a new interpreter.
+
+    If cpus (a list of CPUs) is given, it is split into size disjoint parts
+    and each worker is pinned to a part of its own, with as many BLAS
+    threads, unless threads says otherwise.  Without cpus, threads (if
+    given) is the BLAS thread count of every worker.
+    '''
+
+    def __init__(self, size=2, mode="octave", cmd=None, workdir=None,
+                 max_jobs=100, max_memory=None, threads=None, cpus=None):
+        if cpus is not None and len(cpus) < size:
+            raise ValueError(
+                "A pool of {0} workers needs at least as many cpus.".format(
+                    size))
+        self.size = size
+        self.mode = mode
+        self.cmd = cmd
+        self.workdir = os.path.abspath(workdir or os.getcwd())
+        self.max_jobs = max_jobs
+        self.max_memory = max_memory
+        self.threads = threads
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._free = size
+        self._closed = False
+        self._cpu_sets = [None] * size
+        if cpus is not None:
+            cpus = sorted(cpus)
+            bounds = [len(cpus) * i // size for i in range(size + 1)]
+            self._cpu_sets = [cpus[start:stop]
+                              for start, stop in zip(bounds, bounds[1:])]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def job_path(self, path):
+        '''
+        Returns path the way the pool's workers should be told about it.
+        '''
+        if self.mode == "octave":
+            return os.path.relpath(path)
+        return os.path.abspath(path)
+
+    @contextlib.contextmanager
+    def worker(self, prefer=None):
+        '''
+        Checks out a worker for the duration of a with block, waiting for one
+        to become free if necessary.  If the SolverProcess prefer is idle in
+        this pool it is the one given, which lets a problem held by a worker
+        be solved again on that worker.
+        '''
+        proc = self._checkout(prefer)
+        try:
+            yield proc
+        except ls.SubprocessCallError:
+            proc.close()
+            self._checkin(proc, discard=True)
+            raise
+        except:
+            self._checkin(proc)
+            raise
+        else:
+            self._checkin(proc)
+
+    def call(self, function, *args, **kwargs):
+        '''
+        Runs function(args...) on a free worker and returns its output, as
+        SolverProcess.call does.
+        '''
+        with self.worker() as proc:
+            return proc.call(function, *args, **kwargs)
+
+    def solve_incremental(self, problem, output_target=None):
+        '''
+        Solves the IncrementalProblem problem on the worker which holds it if
+        that worker is idle, or on any free worker otherwise.
+        '''
+        with self.worker(prefer=problem.holder) as proc:
+            return problem.solve(proc, output_target=output_target)
+
+    def solve_resident(self, problem, **kwargs):
+        '''
+        Solves the resident.ResidentProblem problem on the worker which last
+        solved it if that worker is idle, or on any free worker otherwise.
+        kwargs are passed on to problem.solve.
+        '''
+        with self.worker(prefer=problem.holder) as proc:
+            return problem.solve(proc, **kwargs)
+
+    def close(self):
+        '''
+        Stops the idle workers.  Workers still checked out are stopped when
+        they are returned.
+        '''
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for proc in idle:
+            proc.close()
+
+    def _checkout(self, prefer):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("The solver pool has been closed.")
+            while not self._free:
+                self._cond.wait()
+            self._free -= 1
+            if prefer is not None and prefer in self._idle:
+                self._idle.remove(prefer)
+                return prefer
+            if self._idle:
+                return self._idle.pop()
+            cpus = self._cpu_sets.pop()
+
+        threads = self.threads
+        if threads is None and cpus:
+            threads = len(cpus)
+        try:
+            return SolverProcess(self.mode, cmd=self.cmd, workdir=self.workdir,
+                                 threads=threads, cpus=cpus)
+        except:
+            with self._cond:
+                self._cpu_sets.append(cpus)
+                self._free += 1
+                self._cond.notify()
+            raise
+
+    def _checkin(self, proc, discard=False):
+        if not discard and self._worn_out(proc):
+            proc.close()
+            discard = True
+
+        with self._cond:
+            if discard:
+                self._cpu_sets.append(proc.cpus)
+            elif self._closed:
+                proc.close()
+            else:
+                self._idle.append(proc)
+            self._free += 1
+            self._cond.notify()
+
+    def _worn_out(self, proc):
+        if not proc.alive or proc.jobs_run >= self.max_jobs:
+            return True
+        if self.max_memory:
+            rss = process_tree_rss(proc.pid)
+            return rss is not None and rss > self.max_memory
+        return False
+
+
+def process_tree_rss(pid):
+    '''
+    Returns the resident memory in bytes of process pid and all of its
+    descendants, or None if it can't be read from /proc.
+    '''
+    try:
+        entries = [int(name) for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return None
+
+    children = {}
+    rss = {}
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for entry in entries:
+        try:
+            with open("/proc/{0}/stat".format(entry)) as fp:
+                stat = fp.read()
+        except IOError:
+            continue
+        # The command name is in parentheses and may contain spaces, so the
+        # fields are counted from the closing parenthesis.
+        fields = stat[stat.rfind(")") + 2:].split()
+        children.setdefault(int(fields[1]), []).append(entry)
+        rss[entry] = int(fields[21]) * page_size
+
+    if pid not in rss:
+        return None
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        total += rss.get(current, 0)
+        stack.extend(children.get(current, []))
+    return total
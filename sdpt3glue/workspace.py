@@ -0,0 +1,75 @@
+#
+# sdpt3glue/workspace.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Throwaway folders for the files a solve passes to the solver: the problem
+.mat file and the Octave runner script.  With the RAM transport they live on
+a memory-backed file system, which saves a round trip to slow (e.g.
+network) disks.
+"""
+
+import contextlib
+import os
+import os.path
+import shutil
+import tempfile
+
+
+RAM = 'ram'
+DISK = 'disk'
+TRANSPORTS = (RAM, DISK)
+
+_RAM_FOLDERS = ("/dev/shm", "/run/shm")
+
+
+def transport_folder(transport):
+    '''
+    Returns the folder in which workspaces for transport are made: a tmpfs
+    folder such as /dev/shm for RAM, if one is writable, and the system's
+    temporary folder otherwise.
+    '''
+    assert transport in TRANSPORTS, \
+        "Please choose transport from {0}.".format(", ".join(TRANSPORTS))
+    if transport == RAM:
+        for folder in _RAM_FOLDERS:
+            if os.path.isdir(folder) and os.access(folder, os.W_OK | os.X_OK):
+                return folder
+    return tempfile.gettempdir()
+
+
+def make_workspace(transport=RAM, prefix="sdpt3glue_"):
+    '''
+    Makes a new, empty workspace folder for transport and returns its path.
+    The caller removes it, e.g. with shutil.rmtree.
+    '''
+    return tempfile.mkdtemp(prefix=prefix, dir=transport_folder(transport))
+
+
+@contextlib.contextmanager
+def workspace(transport=RAM):
+    '''
+    A with block context giving a new workspace folder, which is removed
+    with everything in it at the end of the block.
+    '''
+    folder = make_workspace(transport)
+    try:
+        yield folder
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def stage(source, target):
+    '''
+    Puts the file source at target, hard linking it when possible so that
+    large files aren't copied.
+    '''
+    try:
+        os.link(source, target)
+    except (OSError, AttributeError):
+        shutil.copyfile(source, target)
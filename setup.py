@@ -52,6 +52,11 @@ SDPT3 can be used in a number of ways:
         "setuptools_scm"
     ],
     install_requires=load_requires_from_file("requirements.txt"),
+    entry_points={
+        "console_scripts": [
+            "sdpt3glue-batch = sdpt3glue.cli:main",
+        ],
+    },
     classifiers=[
         "Development Status :: 4 - Beta",
         "License :: OSI Approved :: MIT License",
@@ -0,0 +1,20 @@
+#
+# tests/helpers.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Paths shared by the unit tests.
+"""
+
+import os
+
+
+LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data',
+                        'sdpt3_log.txt')
+""" A complete SDPT3 log, which fake solver commands print with cat.  The
+path is absolute, since those commands run in folders of their own. """
@@ -14,8 +14,24 @@ from __future__ import absolute_import
 import sys
 import unittest
 
+from . import unittest_background
+from . import unittest_batch
+from . import unittest_cache
+from . import unittest_cli
+from . import unittest_cores
+from . import unittest_cost_model
+from . import unittest_dispatch
+from . import unittest_incremental
+from . import unittest_logcapture
 from . import unittest_neos
+from . import unittest_progressive
+from . import unittest_resident
+from . import unittest_remote
+from . import unittest_result
 from . import unittest_sedumi_writer
+from . import unittest_solve_cvxopt
+from . import unittest_solve_locally
+from . import unittest_workspace
 
 def suite():
     """ Return a test suite.
@@ -23,8 +39,24 @@ def suite():
     loader = unittest.TestLoader()
     res = unittest.TestSuite()
 
+    res.addTest(loader.loadTestsFromModule(unittest_background))
+    res.addTest(loader.loadTestsFromModule(unittest_batch))
+    res.addTest(loader.loadTestsFromModule(unittest_cache))
+    res.addTest(loader.loadTestsFromModule(unittest_cli))
+    res.addTest(loader.loadTestsFromModule(unittest_cores))
+    res.addTest(loader.loadTestsFromModule(unittest_cost_model))
+    res.addTest(loader.loadTestsFromModule(unittest_dispatch))
+    res.addTest(loader.loadTestsFromModule(unittest_incremental))
+    res.addTest(loader.loadTestsFromModule(unittest_logcapture))
     res.addTest(loader.loadTestsFromModule(unittest_neos))
+    res.addTest(loader.loadTestsFromModule(unittest_progressive))
+    res.addTest(loader.loadTestsFromModule(unittest_resident))
+    res.addTest(loader.loadTestsFromModule(unittest_remote))
+    res.addTest(loader.loadTestsFromModule(unittest_result))
     res.addTest(loader.loadTestsFromModule(unittest_sedumi_writer))
+    res.addTest(loader.loadTestsFromModule(unittest_solve_cvxopt))
+    res.addTest(loader.loadTestsFromModule(unittest_solve_locally))
+    res.addTest(loader.loadTestsFromModule(unittest_workspace))
 
     return res
 
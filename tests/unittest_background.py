@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# tests/unittest_background.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Unit tests for background solves.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+import scipy.io
+
+import sdpt3glue
+import sdpt3glue.solve_neos as ns
+from sdpt3glue.background import SolveHandle
+
+
+class TestSolveHandle(unittest.TestCase):
+    '''
+    Testing the result handle of a background solve.
+    '''
+
+    def test_result_and_callbacks(self):
+        '''
+        Callbacks added before and after the solve finishes are both called.
+        '''
+        handle = SolveHandle()
+        called = []
+        handle.add_done_callback(called.append)
+        self.assertFalse(handle.done())
+        with self.assertRaises(RuntimeError):
+            handle.result(timeout=0)
+
+        threading.Timer(0.01, handle._finish, kwargs={'result': {'a': 1}}).start()
+        self.assertEqual(handle.result(timeout=5), {'a': 1})
+        handle.add_done_callback(called.append)
+        self.assertEqual(called, [handle, handle])
+        self.assertIsNone(handle.exception())
+
+    def test_error(self):
+        '''
+        An error finishing the handle is raised by result.
+        '''
+        handle = SolveHandle()
+        handle._finish(error=ValueError("bad"))
+        with self.assertRaises(ValueError):
+            handle.result()
+
+
+class TestBackgroundSolver(unittest.TestCase):
+    '''
+    Testing that failures of background solves reach their handles.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def test_failed_solve(self):
+        '''
+        A solve whose command produces no usable log finishes with an error
+        instead of hanging.
+        '''
+        matfile = os.path.join(self.temp_folder, "problem.mat")
+        output = os.path.join(self.temp_folder, "output.txt")
+        with sdpt3glue.BackgroundSolver(max_workers=2) as solver:
+            handle = solver.submit_mat(
+                matfile, sdpt3glue.OCTAVE, output_target=output,
+                discard_matfile=False, cmd="true")
+            self.assertIsInstance(handle.exception(timeout=30), AssertionError)
+
+    def test_cancel(self):
+        '''
+        Cancelling a running local solve finishes its handle with a result
+        marked cancelled.
+        '''
+        matfile = os.path.join(self.temp_folder, "problem.mat")
+        output = os.path.join(self.temp_folder, "output.txt")
+        open(matfile, "w").close()
+        with sdpt3glue.BackgroundSolver(max_workers=1) as solver:
+            handle = solver.submit_mat(
+                matfile, sdpt3glue.OCTAVE, output_target=output,
+                cmd="sh -c 'sleep 60'; true")
+            threading.Timer(0.3, handle.cancel).start()
+            result = handle.result(timeout=30)
+        self.assertTrue(result['cancelled'])
+        self.assertFalse(handle.cancel())
+        self.assertFalse(os.path.exists(matfile))
+
+    def test_neos_options(self):
+        '''
+        Options reach NEOS in the submitted .mat file, and the original is
+        left alone.
+        '''
+        matfile = os.path.join(self.temp_folder, "problem.mat")
+        sdpt3glue.write_sedumi_to_mat(
+            np.array([[1., 0., 0., 1.]]), np.array([[1.]]),
+            np.array([[2., 1., 1., 3.]]).T, {'s': [2.]}, matfile)
+        submitted = []
+
+        def handle_submission(path, no_prompt=False):
+            submitted.append(scipy.io.loadmat(path).get('OPTIONS'))
+            raise RuntimeError("not sent")
+
+        original, ns.handle_submission = ns.handle_submission, handle_submission
+        try:
+            with sdpt3glue.BackgroundSolver(max_workers=1) as solver:
+                handle = solver.submit_mat(
+                    matfile, sdpt3glue.NEOS, discard_matfile=False,
+                    options={'gaptol': 1e-4})
+                self.assertIsInstance(handle.exception(timeout=30),
+                                      RuntimeError)
+        finally:
+            ns.handle_submission = original
+        self.assertEqual(float(submitted[0][0, 0]['gaptol']), 1e-4)
+        self.assertNotIn('OPTIONS', scipy.io.loadmat(matfile))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# tests/unittest_batch.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Unit tests for batch solving.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import sdpt3glue
+import sdpt3glue.result as res
+from helpers import LOG_PATH
+
+
+class TestBatchErrors(unittest.TestCase):
+    '''
+    Testing that failing jobs don't stop a batch.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def test_errors_are_captured_in_order(self):
+        '''
+        Jobs whose .mat file doesn't exist fail on their own, the items come
+        back in input order, and no working folders are left behind.
+        '''
+        matfiles = [os.path.join(self.temp_folder, "missing{0}.mat".format(i))
+                    for i in range(4)]
+        items = sdpt3glue.sdpt3_solve_many(
+            matfiles, sdpt3glue.OCTAVE, max_workers=2,
+            workdir=self.temp_folder)
+
+        self.assertEqual([item.index for item in items], range(4))
+        self.assertEqual([item.source for item in items], matfiles)
+        for item in items:
+            self.assertIsNone(item.result)
+            self.assertIsInstance(item.error, EnvironmentError)
+        self.assertEqual(os.listdir(self.temp_folder), [])
+
+    def test_as_completed(self):
+        '''
+        Streaming gives one item per job.
+        '''
+        matfiles = [os.path.join(self.temp_folder, "missing{0}.mat".format(i))
+                    for i in range(3)]
+        items = list(sdpt3glue.sdpt3_solve_as_completed(
+            matfiles, sdpt3glue.OCTAVE, max_workers=3,
+            workdir=self.temp_folder))
+        self.assertEqual(sorted(item.index for item in items), range(3))
+
+    def test_bad_mode(self):
+        '''
+        An unknown mode is refused up front.
+        '''
+        with self.assertRaises(AssertionError):
+            sdpt3glue.sdpt3_solve_many([], "excel")
+
+
+class TestSolvePipeline(unittest.TestCase):
+    '''
+    Testing the pipelined batch runner.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+        self.workdir = os.path.join(self.temp_folder, "work")
+        os.mkdir(self.workdir)
+        self.matfile = os.path.join(self.temp_folder, "problem.mat")
+        sdpt3glue.write_sedumi_to_mat(
+            np.ones((3, 5)), np.ones((3, 1)), np.ones((5, 1)), {'l': 5},
+            self.matfile)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def test_solve_all(self):
+        '''
+        Every job is solved, failures are kept in their items, and each
+        stage reports how busy it was.
+        '''
+        missing = os.path.join(self.temp_folder, "missing.mat")
+        sources = [self.matfile, missing, self.matfile, self.matfile]
+        pipeline = sdpt3glue.SolvePipeline(
+            sdpt3glue.OCTAVE, solvers=2, max_queued=1, workdir=self.workdir,
+            cmd="sleep 0.2; cat {0} #".format(LOG_PATH))
+        items = pipeline.solve_all(sources)
+
+        self.assertEqual([item.index for item in items], range(4))
+        self.assertIsInstance(items[1].error, EnvironmentError)
+        for i in (0, 2, 3):
+            self.assertIsNone(items[i].error)
+            self.assertEqual(items[i].result['status_num'], 0)
+        self.assertEqual(os.listdir(self.workdir), [])
+
+        stats = pipeline.stats
+        self.assertEqual(stats['convert']['jobs'], 4)
+        self.assertEqual(stats['solve']['jobs'], 3)
+        self.assertGreater(stats['solve']['utilization'], 0.2)
+        self.assertLessEqual(stats['solve']['utilization'], 1.)
+        self.assertGreater(stats['convert']['blocked_time'], 0.)
+
+    def test_backpressure(self):
+        '''
+        No more than max_queued + solvers + 1 converted jobs exist at once.
+        '''
+        record = os.path.join(self.temp_folder, "record.txt")
+        cmd = "ls {0} | wc -l >> {1}; sleep 0.1; cat {2} #".format(
+            self.workdir, record, LOG_PATH)
+        pipeline = sdpt3glue.SolvePipeline(
+            sdpt3glue.OCTAVE, solvers=1, max_queued=2, workdir=self.workdir,
+            cmd=cmd)
+        items = pipeline.solve_all([self.matfile] * 6)
+        self.assertTrue(all(item.error is None for item in items))
+        with open(record) as fp:
+            counts = [int(line) for line in fp]
+        self.assertEqual(len(counts), 6)
+        self.assertLessEqual(max(counts), 4)
+
+    def test_stop_early(self):
+        '''
+        Leaving the iteration early stops the pipeline and cleans up.
+        '''
+        pipeline = sdpt3glue.SolvePipeline(
+            sdpt3glue.OCTAVE, workdir=self.workdir,
+            cmd="cat {0} #".format(LOG_PATH))
+        for item in pipeline.run([self.matfile] * 10):
+            break
+        self.assertIsNone(item.error)
+        self.assertEqual(os.listdir(self.workdir), [])
+        self.assertLess(pipeline.stats['solve']['jobs'], 10)
+
+    def test_results_without_output_folder(self):
+        '''
+        Without an output_folder, the log and the solution printed in it can
+        still be read from the results once the job folders are removed.
+        '''
+        with open(LOG_PATH) as fp:
+            log = fp.read()
+        X = res.extract_X(log)
+        cmd = "cat {0} #".format(LOG_PATH)
+        items = sdpt3glue.sdpt3_solve_many(
+            [self.matfile], sdpt3glue.OCTAVE, workdir=self.workdir, cmd=cmd)
+        pipeline = sdpt3glue.SolvePipeline(
+            sdpt3glue.OCTAVE, workdir=self.workdir, cmd=cmd)
+        items += pipeline.solve_all([self.matfile])
+        self.assertEqual(os.listdir(self.workdir), [])
+        for item in items:
+            self.assertIsNone(item.error)
+            self.assertEqual(str(item.result['msg']), log)
+            self.assertEqual(len(item.result['Xvars']), len(X))
+            for block, expected in zip(item.result['Xvars'], X):
+                np.testing.assert_array_equal(block, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# tests/unittest_cache.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Unit tests for the solve result cache.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import scipy.sparse
+
+import sdpt3glue
+from sdpt3glue import cache
+from helpers import LOG_PATH
+
+
+class TestResultCache(unittest.TestCase):
+    '''
+    Testing hits, misses and eviction.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+        self.cache = cache.ResultCache(os.path.join(self.temp_folder, "cache"))
+        self.record = os.path.join(self.temp_folder, "record.txt")
+        self.cmd = "echo x >> {0}; cat {1} #".format(self.record, LOG_PATH)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def write_problem(self, name, A, c=(2., 1., 1., 3.)):
+        path = os.path.join(self.temp_folder, name)
+        sdpt3glue.write_sedumi_to_mat(A, np.array([[1.]]),
+                                      np.array([c]).T, {'s': [2.]}, path)
+        return path
+
+    def solve(self, path, **kwargs):
+        output_target = os.path.join(self.temp_folder, "log.txt")
+        if os.path.exists(output_target):
+            os.remove(output_target)
+        return sdpt3glue.sdpt3_solve_mat(path, sdpt3glue.OCTAVE,
+                                         output_target=output_target,
+                                         cmd=self.cmd, cache=self.cache,
+                                         **kwargs)
+
+    def solves(self):
+        if not os.path.exists(self.record):
+            return 0
+        with open(self.record) as fp:
+            return len(fp.readlines())
+
+    def test_hit(self):
+        '''
+        The same problem stored another way is answered from the cache, with
+        the same result, and the solve log is still saved.
+        '''
+        first = self.solve(self.write_problem(
+            "dense.mat", np.array([[1., 0., 0., 1.]])))
+        second = self.solve(self.write_problem(
+            "sparse.mat", scipy.sparse.csc_matrix([[1., 0., 0., 1.]])))
+        self.assertEqual(self.solves(), 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(second['status_num'], first['status_num'])
+        self.assertEqual(second['iterations'], first['iterations'])
+        np.testing.assert_array_equal(second['Xvars'][0], first['Xvars'][0])
+        with open(os.path.join(self.temp_folder, "log.txt")) as fp:
+            self.assertEqual(fp.read(), str(first['msg']))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.temp_folder, "sparse.mat")))
+
+    def test_miss(self):
+        '''
+        Other data, other options or another solver are solved afresh.
+        '''
+        A = np.array([[1., 0., 0., 1.]])
+        self.solve(self.write_problem("a.mat", A))
+        self.solve(self.write_problem("b.mat", A, c=(2., 1., 1., 4.)))
+        self.solve(self.write_problem("c.mat", A), options={'gaptol': 1e-4})
+        self.assertEqual(self.solves(), 3)
+
+        path = self.write_problem("d.mat", A)
+        self.assertNotEqual(self.cache.key(path, 'sdpt3'),
+                            self.cache.key(path, 'cvxopt'))
+
+    def test_stored_zeros(self):
+        '''
+        Explicitly stored zeros do not change the key.
+        '''
+        A = scipy.sparse.csc_matrix(([1., 0., 1.], ([0, 0, 0], [0, 1, 3])),
+                                    shape=(1, 4))
+        self.assertEqual(A.nnz, 3)
+        self.assertEqual(
+            self.cache.key(self.write_problem("a.mat", A), 'sdpt3'),
+            self.cache.key(self.write_problem(
+                "b.mat", np.array([[1., 0., 0., 1.]])), 'sdpt3'))
+        self.assertEqual(A.nnz, 3)
+
+    def test_cvxopt_arrays(self):
+        '''
+        Results with dual arrays come back whole.
+        '''
+        path = self.write_problem("a.mat", np.array([[1., 0., 0., 1.]]))
+        first = sdpt3glue.sdpt3_solve_mat(path, sdpt3glue.CVXOPT,
+                                          cache=self.cache)
+        second = sdpt3glue.sdpt3_solve_mat(
+            self.write_problem("b.mat", np.array([[1., 0., 0., 1.]])),
+            sdpt3glue.CVXOPT, cache=self.cache)
+        self.assertEqual(self.cache.hits, 1)
+        np.testing.assert_array_equal(second['y'], first['y'])
+        np.testing.assert_array_equal(second['Zvars'][0], first['Zvars'][0])
+        self.assertEqual(second['status_verb'], first['status_verb'])
+
+    def test_eviction(self):
+        '''
+        The least recently used entries go first.
+        '''
+        self.cache.max_entries = 2
+        result = {'status_num': 0, 'Xvars': [np.eye(2)]}
+        for key in ("a", "b"):
+            self.cache.put(key, result)
+        os.utime(self.cache._path("a"), (0, 0))
+        os.utime(self.cache._path("b"), (1, 1))
+        self.assertIsNotNone(self.cache.get("a"))
+        self.cache.put("c", result)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("a"))
+
+        self.cache.max_bytes = 0
+        self.cache.evict()
+        self.assertEqual(os.listdir(self.cache.folder), [cache._LOCK_FILE])
+
+    def test_touch_failed(self):
+        '''
+        An entry evicted elsewhere just after it is read is still a hit.
+        '''
+        self.cache.put("a", {'status_num': 0, 'Xvars': [np.eye(2)]})
+        utime = os.utime
+
+        def evicted(path, times):
+            os.remove(path)
+            utime(path, times)
+        os.utime = evicted
+        try:
+            result = self.cache.get("a")
+        finally:
+            os.utime = utime
+        self.assertEqual(result['status_num'], 0)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 0))
+
+    def test_interrupted(self):
+        '''
+        Interrupted solves are not stored.
+        '''
+        self.cache.put("a", {'status_num': None, 'timed_out': True})
+        self.assertIsNone(self.cache.get("a"))
+
+
+if __name__ == '__main__':
+    unittest.main()
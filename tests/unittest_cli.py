@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# tests/unittest_cli.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Unit tests for the batch command.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import scipy.sparse
+
+import sdpt3glue
+from sdpt3glue import cli
+from helpers import LOG_PATH
+
+
+class TestBatchCommand(unittest.TestCase):
+    '''
+    Testing runs of the batch command and their resumption.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+        self.inputs = os.path.join(self.temp_folder, "inputs")
+        self.output = os.path.join(self.temp_folder, "output")
+        os.mkdir(self.inputs)
+        for name in ("a", "b"):
+            self.write_problem(name)
+        self.record = os.path.join(self.temp_folder, "record.txt")
+        self.cmd = "echo x >> {0}; cat {1} #".format(self.record, LOG_PATH)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def write_problem(self, name):
+        sdpt3glue.write_sedumi_to_mat(
+            scipy.sparse.eye(2, format='csc'), np.ones((2, 1)),
+            np.ones((2, 1)), {'l': 2.}, os.path.join(self.inputs, name + ".mat"))
+
+    def solves(self):
+        ''' The number of solver runs so far. '''
+        if not os.path.exists(self.record):
+            return 0
+        with open(self.record) as fp:
+            return len(fp.readlines())
+
+    def test_folder(self):
+        '''
+        Every .mat file of a folder is solved into the output folder, and a
+        second run does nothing.
+        '''
+        status = cli.main([self.inputs, self.output, "--workers", "2",
+                           "--cmd", self.cmd])
+        self.assertEqual(status, 0)
+        self.assertEqual(self.solves(), 2)
+        with open(os.path.join(self.output, cli.SUMMARIES)) as fp:
+            summaries = [json.loads(line) for line in fp]
+        self.assertEqual(sorted(os.path.basename(s['job']) for s in summaries),
+                         ["a.mat", "b.mat"])
+        self.assertEqual(summaries[0]['status_num'], 0)
+        with np.load(os.path.join(self.output, cli.SOLUTIONS, "a.npz")) as data:
+            self.assertEqual(data['X0'].shape, (2, 2))
+        self.assertTrue(os.path.exists(
+            os.path.join(self.output, cli.LOGS, "b.txt")))
+
+        counts = cli.run_batch(self.inputs, self.output, cmd=self.cmd)
+        self.assertEqual(counts, {'done': 0, 'failed': 0, 'skipped': 2})
+        self.assertEqual(self.solves(), 2)
+
+    def test_resume(self):
+        '''
+        A run started again retries the jobs which failed or were cut off,
+        and skips those done.
+        '''
+        manifest = os.path.join(self.temp_folder, "manifest.txt")
+        with open(manifest, "w") as fp:
+            fp.write("# nightly\ninputs/a.mat\ninputs/b.mat\n\ninputs/c.mat\n")
+        counts = cli.run_batch(manifest, self.output, cmd=self.cmd)
+        self.assertEqual(counts, {'done': 2, 'failed': 1, 'skipped': 0})
+
+        # b is cut off by a crash, which also leaves half a journal line.
+        journal = cli.Journal(os.path.join(self.output, cli.JOURNAL))
+        journal.record(os.path.join(self.inputs, "b.mat"), cli.STARTED)
+        with open(journal.path, "a") as fp:
+            fp.write('{"event": "do')
+        self.write_problem("c")
+
+        counts = cli.run_batch(manifest, self.output, cmd=self.cmd)
+        self.assertEqual(counts, {'done': 2, 'failed': 0, 'skipped': 1})
+        self.assertEqual(self.solves(), 4)
+        self.assertEqual(set(journal.states().values()), set([cli.DONE]))
+
+    def test_interrupted(self):
+        '''
+        A job cut off by its timeout is journaled as failed and run again.
+        '''
+        slow = "grep '|' {0} | head -3; sh -c 'sleep 60'; true".format(
+            LOG_PATH)
+        status = cli.main([self.inputs, self.output, "--workers", "2",
+                           "--cmd", slow, "--timeout", "0.5"])
+        self.assertEqual(status, 1)
+        journal = cli.Journal(os.path.join(self.output, cli.JOURNAL))
+        self.assertEqual(set(journal.states().values()), set([cli.FAILED]))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.output, cli.SUMMARIES)))
+
+        counts = cli.run_batch(self.inputs, self.output, cmd=self.cmd)
+        self.assertEqual(counts, {'done': 2, 'failed': 0, 'skipped': 0})
+
+    def test_duals_saved(self):
+        '''
+        The Z blocks are saved with X.
+        '''
+        cmd = "cat {0}; printf 'Z{{1}} =\\n 1 0\\n 0 1\\n>>\\n' #".format(
+            LOG_PATH)
+        cli.run_batch(self.inputs, self.output, cmd=cmd)
+        with np.load(os.path.join(self.output, cli.SOLUTIONS, "a.npz")) as data:
+            np.testing.assert_array_equal(data['Z0'], np.eye(2))
+
+    def test_summaries_deduplicated(self):
+        '''
+        The summary of a job which crashed before being journaled as done is
+        not repeated when it is run again.
+        '''
+        cli.run_batch(self.inputs, self.output, cmd=self.cmd)
+        journal = cli.Journal(os.path.join(self.output, cli.JOURNAL))
+        path_b = os.path.join(self.inputs, "b.mat")
+        journal.record(path_b, cli.STARTED)
+        with open(os.path.join(self.output, cli.SUMMARIES), "a") as fp:
+            fp.write(json.dumps({'job': path_b}) + "\n")
+
+        counts = cli.run_batch(self.inputs, self.output, cmd=self.cmd)
+        self.assertEqual(counts, {'done': 1, 'failed': 0, 'skipped': 1})
+        with open(os.path.join(self.output, cli.SUMMARIES)) as fp:
+            jobs = [json.loads(line)['job'] for line in fp]
+        self.assertEqual(sorted(jobs), [os.path.join(self.inputs, "a.mat"),
+                                        path_b])
+
+    def test_duplicate_names(self):
+        '''
+        Jobs which would overwrite each other's outputs are refused.
+        '''
+        with self.assertRaises(ValueError):
+            cli.job_names(["/one/a.mat", "/two/a.mat"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# tests/unittest_cores.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Unit tests for sharing cores between solves.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+
+import sdpt3glue
+from sdpt3glue import cores
+from sdpt3glue.worker import SolverPool
+from helpers import LOG_PATH
+
+
+class TestCoreScheduler(unittest.TestCase):
+    '''
+    Testing how CPUs are handed out to solves.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def test_parse_cpu_list(self):
+        '''
+        Ranges and single CPUs are both understood.
+        '''
+        self.assertEqual(cores.parse_cpu_list("0-3,6\n"), [0, 1, 2, 3, 6])
+        self.assertEqual(cores.parse_cpu_list("2"), [2])
+        self.assertTrue(cores.available_cpus())
+
+    def test_wanted(self):
+        '''
+        Larger problems ask for more cores, within the limits.
+        '''
+        scheduler = cores.CoreScheduler(cpus=range(8), rows_per_core=100,
+                                        max_cores=6)
+        self.assertEqual(scheduler.wanted(10), 1)
+        self.assertEqual(scheduler.wanted(250), 3)
+        self.assertEqual(scheduler.wanted(10 ** 6), 6)
+
+    def test_acquire(self):
+        '''
+        Solves get disjoint CPUs, as many of their share as are free, and
+        wait only when none are.
+        '''
+        scheduler = cores.CoreScheduler(cpus=range(4), rows_per_core=100)
+        large = scheduler.acquire(300)
+        self.assertEqual(large, [0, 1, 2])
+        small = scheduler.acquire(300)
+        self.assertEqual(small, [3])
+        self.assertEqual(scheduler.free, 0)
+
+        taken = []
+        waiter = threading.Thread(
+            target=lambda: taken.append(scheduler.acquire(100)))
+        waiter.start()
+        time.sleep(0.2)
+        self.assertEqual(taken, [])
+        scheduler.release(large)
+        waiter.join(5)
+        self.assertEqual(taken, [[0]])
+        scheduler.release(small)
+        scheduler.release(taken[0])
+        self.assertEqual(scheduler.free, 4)
+
+    def test_problem_size(self):
+        '''
+        The size of a problem is its number of constraints.
+        '''
+        matfile = os.path.join(self.temp_folder, "problem.mat")
+        A = np.ones((3, 5))
+        sdpt3glue.write_sedumi_to_mat(A, np.ones((3, 1)), np.ones((5, 1)),
+                                      {'l': 5}, matfile)
+        self.assertEqual(cores.problem_size(matfile), 3)
+
+    def test_scheduled_solve(self):
+        '''
+        A solve given a scheduler runs with a thread per CPU it was given,
+        which are free again afterwards.
+        '''
+        matfile = os.path.join(self.temp_folder, "problem.mat")
+        output = os.path.join(self.temp_folder, "output.txt")
+        record = os.path.join(self.temp_folder, "record.txt")
+        sdpt3glue.write_sedumi_to_mat(np.ones((3, 5)), np.ones((3, 1)), np.ones((5, 1)),
+                                      {'l': 5}, matfile)
+        scheduler = cores.CoreScheduler(cpus=cores.available_cpus()[:1])
+        cmd = "echo $OMP_NUM_THREADS > {0}; cat {1} #".format(record, LOG_PATH)
+        result = sdpt3glue.sdpt3_solve_mat(
+            matfile, sdpt3glue.OCTAVE, output_target=output, cmd=cmd,
+            scheduler=scheduler)
+        self.assertEqual(result['status_num'], 0)
+        with open(record) as fp:
+            self.assertEqual(fp.read().strip(), "1")
+        self.assertEqual(scheduler.free, 1)
+
+    def test_pool_cpus(self):
+        '''
+        A pool splits its CPUs between its workers.
+        '''
+        pool = SolverPool(size=2, cpus=[3, 0, 1, 2, 4])
+        self.assertEqual(sorted(pool._cpu_sets), [[0, 1], [2, 3, 4]])
+        with self.assertRaises(ValueError):
+            SolverPool(size=3, cpus=[0, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# tests/unittest_cost_model.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Unit tests for the solve cost model.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import scipy.sparse
+
+import sdpt3glue
+import sdpt3glue.solve_locally as ls
+from sdpt3glue import cost_model as cm
+from helpers import LOG_PATH
+
+
+def features(m, nnz=0, s=()):
+    ''' Features of a problem with m constraints and blocks s. '''
+    return {'m': m, 'n': 0, 'nnz': nnz, 'blocks': len(s),
+            'sum_s2': float(sum(x ** 2 for x in s)),
+            'sum_s3': float(sum(x ** 3 for x in s)),
+            'schur_density': 1.}
+
+
+class TestCostModel(unittest.TestCase):
+    '''
+    Testing features, fits and predictions.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def test_problem_features(self):
+        '''
+        Features are read off A and K, and constraints sharing no variable
+        don't count towards the Schur complement density.
+        '''
+        A = scipy.sparse.csc_matrix(np.array([
+            [1., 0., 1., 0., 0., 1.],
+            [0., 1., 0., 0., 0., 0.],
+        ]))
+        K = {'f': 0., 'l': 2., 'q': [], 's': [2.]}
+        result = cm.problem_features(A, np.ones(2), np.ones(6), K)
+        self.assertEqual(result['m'], 2)
+        self.assertEqual(result['nnz'], 4)
+        self.assertEqual(result['blocks'], 2)
+        self.assertEqual(result['sum_s2'], 4.)
+        self.assertEqual(result['sum_s3'], 8.)
+        # Row 0 alone touches column 0 and the semidefinite block, row 1
+        # alone touches column 1: three diagonal entries in all.
+        self.assertAlmostEqual(result['schur_density'], 3 / 4.)
+
+    def test_fit(self):
+        '''
+        Coefficients used to make records are recovered by the fit.
+        '''
+        model = cm.CostModel()
+        for m in (10, 50, 100, 200, 400):
+            f = features(m, nnz=5 * m, s=(m // 2,))
+            per_iteration = 0.01 + 2e-8 * m ** 3 / 3.
+            model.record(f, {'solve_time': 20 * per_iteration,
+                             'iterations': 20,
+                             'peak_rss': 1e8 + 8. * m ** 2})
+        model.record(features(10), {'solve_time': 1., 'iterations': 3,
+                                    'timed_out': True})
+        model.fit()
+        self.assertEqual(len(model.records), 5)
+        prediction = model.predict(features(300, nnz=1500, s=(150,)))
+        self.assertAlmostEqual(prediction['iterations'], 20.)
+        self.assertAlmostEqual(
+            prediction['solve_time'] / (20 * (0.01 + 2e-8 * 300 ** 3 / 3.)),
+            1., places=2)
+        self.assertAlmostEqual(
+            prediction['peak_rss'] / (1e8 + 8. * 300 ** 2), 1., places=2)
+
+        path = os.path.join(self.temp_folder, "records.json")
+        model.save(path)
+        loaded = cm.CostModel.load(path)
+        self.assertAlmostEqual(
+            loaded.predict(features(300))['solve_time'],
+            model.predict(features(300))['solve_time'])
+
+    def test_check_memory(self):
+        '''
+        Jobs predicted to need more than the memory available are refused.
+        '''
+        model = cm.CostModel()
+        model.check_memory(features(10), available=2 ** 40)
+        with self.assertRaises(cm.InsufficientMemory):
+            model.check_memory(features(10 ** 6), available=2 ** 30)
+
+    def test_peak_rss(self):
+        '''
+        The peak memory of a local command and its children is measured.
+        '''
+        command = "{0} -c \"x = ' ' * 100000000\"; cat {1}".format(
+            sys.executable, LOG_PATH)
+        log = ls._run_command_get_output(command)
+        self.assertGreater(log.peak_rss, 100000000)
+        self.assertEqual(sdpt3glue.solve.finish_solve(log)['peak_rss'],
+                         log.peak_rss)
+
+    def test_batch_plan(self):
+        '''
+        A batch with a cost model runs the larger problem first, refuses
+        missing files, and records what it solved.
+        '''
+        paths = []
+        for m in (2, 30):
+            path = os.path.join(self.temp_folder, "p{0}.mat".format(m))
+            sdpt3glue.write_sedumi_to_mat(
+                scipy.sparse.eye(m, format='csc'), np.ones((m, 1)),
+                np.ones((m, 1)), {'l': float(m)}, path)
+            paths.append(path)
+        paths.append(os.path.join(self.temp_folder, "missing.mat"))
+
+        model = cm.CostModel()
+        record = os.path.join(self.temp_folder, "order.txt")
+        cmd = "echo $PWD >> {0}; cat {1} #".format(record, LOG_PATH)
+        items = sdpt3glue.sdpt3_solve_many(
+            paths, sdpt3glue.OCTAVE, max_workers=1, cost_model=model,
+            workdir=self.temp_folder, cmd=cmd)
+        self.assertEqual([item.index for item in items], [0, 1, 2])
+        self.assertIsNone(items[0].error)
+        self.assertIsInstance(items[2].error, EnvironmentError)
+        with open(record) as fp:
+            order = [line.strip() for line in fp]
+        self.assertIn("sdpt3job1_", order[0])
+        self.assertIn("sdpt3job0_", order[1])
+        self.assertEqual([r['features']['m'] for r in model.records], [30, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
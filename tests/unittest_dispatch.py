@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# tests/unittest_dispatch.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Unit tests for routing solves between local slots and NEOS.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+import sdpt3glue
+from sdpt3glue import dispatch
+from helpers import LOG_PATH
+
+
+class TestHybridDispatcher(unittest.TestCase):
+    '''
+    Testing routing decisions and local priorities.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+        self.matfile = os.path.join(self.temp_folder, "problem.mat")
+        sdpt3glue.write_sedumi_to_mat(
+            np.array([[1., 0., 0., 1.]]), np.array([[1.]]),
+            np.array([[2., 1., 1., 3.]]).T, {'s': [2.]}, self.matfile)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def test_problem_work(self):
+        '''
+        The work counts the Schur complement and the semidefinite blocks.
+        '''
+        self.assertAlmostEqual(dispatch.problem_work(self.matfile),
+                               1 / 3. + 2 + 8)
+
+    def test_no_semidefinite_cone(self):
+        '''
+        Problems without a semidefinite cone are weighed and solved too.
+        '''
+        matfile = os.path.join(self.temp_folder, "lp.mat")
+        sdpt3glue.write_sedumi_to_mat(
+            np.array([[1., 1., 0., 0.], [0., 0., 1., 1.]]), np.ones((2, 1)),
+            np.ones((4, 1)), {'l': 4}, matfile)
+        self.assertAlmostEqual(dispatch.problem_work(matfile), 8 / 3. + 8)
+        with dispatch.HybridDispatcher(neos=False) as dispatcher:
+            result = dispatcher.submit(
+                matfile, cmd="cat {0} #".format(LOG_PATH)).result(30)
+        self.assertEqual(result['status_num'], 0)
+
+    def test_route(self):
+        '''
+        Large jobs go to NEOS, small latency sensitive ones stay local, and
+        the rest go where they are expected to finish first.
+        '''
+        with dispatch.HybridDispatcher(
+                local_slots=1, small_work=100, large_work=1e6,
+                local_overhead=1., local_rate=1e-3,
+                neos_turnaround=60.) as dispatcher:
+            self.assertEqual(dispatcher.route(1e6), dispatch.NEOS)
+            self.assertEqual(dispatcher.route(10, latency_sensitive=True),
+                             dispatch.LOCAL)
+            self.assertEqual(dispatcher.route(1e4), dispatch.LOCAL)
+            self.assertEqual(dispatcher.route(1e5), dispatch.NEOS)
+
+            # A busy local slot makes NEOS the faster choice.
+            dispatcher._local_jobs = 1
+            dispatcher._local_backlog = 100.
+            self.assertEqual(dispatcher.route(1e4), dispatch.NEOS)
+            self.assertEqual(dispatcher.route(10, latency_sensitive=True),
+                             dispatch.LOCAL)
+
+            # Without room on NEOS, everything stays local.
+            dispatcher._neos_jobs = dispatcher.neos_max_jobs
+            self.assertEqual(dispatcher.route(1e6), dispatch.LOCAL)
+            dispatcher._local_jobs = dispatcher._neos_jobs = 0
+
+        with dispatch.HybridDispatcher(neos=False) as dispatcher:
+            self.assertEqual(dispatcher.route(1e20), dispatch.LOCAL)
+
+    def test_local_priority(self):
+        '''
+        Local jobs run with their own kwargs over the dispatcher's, latency
+        sensitive ones ahead of the others, the .mat file given is left
+        alone, and the logs are kept in the results.
+        '''
+        record = os.path.join(self.temp_folder, "record.txt")
+        cmd = "echo {{0}} >> {0}; sleep 0.3; cat {1} #".format(record, LOG_PATH)
+        with dispatch.HybridDispatcher(local_slots=1, neos=False,
+                                       cmd="false") as dispatcher:
+            handles = [dispatcher.submit(self.matfile, cmd=cmd.format("first"))]
+            # The others are queued once the first has taken the only slot.
+            while not os.path.exists(record):
+                time.sleep(0.01)
+            handles += [
+                dispatcher.submit(self.matfile, latency_sensitive=urgent,
+                                  cmd=cmd.format(tag))
+                for tag, urgent in (("normal", False), ("urgent", True))]
+            results = [handle.result(30) for handle in handles]
+            stats = dispatcher.stats()
+
+        with open(LOG_PATH) as fp:
+            log = fp.read()
+        for result in results:
+            self.assertEqual(result['route'], dispatch.LOCAL)
+            self.assertEqual(result['status_num'], 0)
+            # Still readable once the job's folder is gone.
+            self.assertEqual(str(result['msg']), log)
+        self.assertEqual(stats['routed'], {'local': 3, 'neos': 0})
+        self.assertEqual(stats['local_jobs'], 0)
+        self.assertTrue(os.path.exists(self.matfile))
+        with open(record) as fp:
+            self.assertEqual(fp.read().split(), ["first", "urgent", "normal"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=E1101
+#
+# tests/unittest_incremental.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Unit tests for the append-only problem builder and its solves.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import scipy.io
+
+import sdpt3glue.solve_locally as ls
+from sdpt3glue.incremental import IncrementalProblem
+from sdpt3glue.worker import SolverProcess, WorkerJobError
+from helpers import LOG_PATH
+
+
+# Stands in for an interpreter running SDPT3worker.m.  SDPT3append records
+# the variables of its .mat file, refuses a delta for a key it doesn't hold,
+# and otherwise saves an X to the result file and prints the log.  forget
+# drops the held keys, and die stops the worker in the middle of a job.
+# Every job prints a line outside of its frame too.
+FAKE_WORKER = """
+import sys
+import numpy as np
+import scipy.io
+
+held = set()
+while True:
+    line = sys.stdin.readline()
+    if not line.strip():
+        break
+    fields = line.rstrip("\\n").split("\\t")
+    jobid, function, args = fields[0], fields[1], fields[2:]
+    print "outside of the frame"
+    print "@@SDPT3GLUE BEGIN " + jobid
+    if function == "SDPT3append":
+        key, in_file, result_file = args
+        data = scipy.io.loadmat(in_file)
+        with open({0!r}, "a") as fp:
+            fp.write(" ".join(sorted(k for k in data if k[0] != "_")) + "\\n")
+        if "dA" in data and key not in held:
+            print "@@SDPT3GLUE ERROR SDPT3glue:notheld\\tNo problem is held."
+        else:
+            held.add(key)
+            X = np.empty((1, 1), dtype=object)
+            X[0, 0] = np.array([[1., 1. / 3], [1. / 3, 1.]])
+            scipy.io.savemat(result_file, {{
+                "obj": np.zeros((1, 2)), "X": X, "Z": X, "y": np.ones((2, 1)),
+                "info": {{"termcode": 0.}}}})
+            sys.stdout.write(open({1!r}).read())
+    elif function == "forget":
+        held.clear()
+    elif function == "die":
+        print "part of a log"
+        sys.stdout.flush()
+        sys.exit(1)
+    print "@@SDPT3GLUE END " + jobid
+    sys.stdout.flush()
+"""
+
+
+class TestIncrementalProblem(unittest.TestCase):
+    '''
+    Testing row appends and deltas of an IncrementalProblem.
+    '''
+
+    def setUp(self):
+        '''
+        Start from the two constraints X00 = 1, X11 = 1 on a 2x2 PSD block.
+        '''
+        self.A = 1.*np.array([[1, 0, 0, 0],
+                              [0, 0, 0, 1]])
+        self.b = 1.*np.array([1, 1]).reshape(2, 1)
+        self.c = 1.*np.array([0, 1, 1, 0]).reshape(1, 4)
+        self.K = {'f': 0, 'l': 0, 'q': [], 's': [2]}
+        self.temp_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def test_append_rows(self):
+        '''
+        Appended rows show up at the bottom of A and b, across several
+        appends which need the storage to grow.
+        '''
+        problem = IncrementalProblem(self.A, self.b, self.c, self.K)
+        new_rows = []
+        for k in range(5):
+            row = 1.*np.array([[0, k, k, 0]])
+            new_rows.append(row)
+            problem.append_rows(row, [0.1 * k])
+
+        self.assertEqual(problem.num_rows, 7)
+        self.assertTrue(np.allclose(
+            problem.A.toarray(), np.vstack([self.A] + new_rows)))
+        self.assertTrue(np.allclose(
+            problem.b.ravel(), [1, 1, 0, 0.1, 0.2, 0.3, 0.4]))
+
+    def test_append_rows_shape_check(self):
+        '''
+        Rows with the wrong number of columns are refused.
+        '''
+        problem = IncrementalProblem(self.A, self.b, self.c, self.K)
+        with self.assertRaises(ValueError):
+            problem.append_rows(np.ones((1, 3)), [0.])
+        with self.assertRaises(ValueError):
+            problem.append_rows(np.ones((2, 4)), [0.])
+
+    def test_delta(self):
+        '''
+        Before anything is sent the delta is the whole problem, and only
+        the rows appended since then once it has been sent.
+        '''
+        problem = IncrementalProblem(self.A, self.b, self.c, self.K)
+        dA, db, m0 = problem.delta()
+        self.assertEqual(m0, 0)
+        self.assertTrue(np.allclose(dA.toarray(), self.A))
+
+        problem._sent_rows = problem.num_rows
+        problem._sent_nnz = problem._nnz
+        problem.append_rows(1.*np.array([[0, 1, 1, 0]]), [-0.5])
+        dA, db, m0 = problem.delta()
+        self.assertEqual(m0, 2)
+        self.assertTrue(np.allclose(dA.toarray(), [[0, 1, 1, 0]]))
+        self.assertTrue(np.allclose(db, [[-0.5]]))
+
+    def test_write_to_mat(self):
+        '''
+        The full problem and the delta are both written in a form that
+        loads back as the same matrices.
+        '''
+        problem = IncrementalProblem(self.A, self.b, self.c, self.K)
+        problem.append_rows(1.*np.array([[0, 1, 1, 0]]), [-0.5])
+
+        full = os.path.join(self.temp_folder, 'full.mat')
+        problem.write_to_mat(full)
+        data = scipy.io.loadmat(full)
+        self.assertTrue(np.allclose(data['A'].toarray(), problem.A.toarray()))
+        self.assertTrue(np.allclose(data['b'].toarray(), problem.b))
+
+        delta = os.path.join(self.temp_folder, 'delta.mat')
+        problem.write_delta_to_mat(delta)
+        data = scipy.io.loadmat(delta)
+        self.assertEqual(data['m0'][0, 0], 0)
+        self.assertEqual(data['dA'].shape, (3, 4))
+
+
+class TestIncrementalSolve(unittest.TestCase):
+    '''
+    Testing solves on a SolverProcess, and the framing of its jobs' output.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+        self.workdir = os.path.join(self.temp_folder, "work")
+        os.mkdir(self.workdir)
+        self.record = os.path.join(self.temp_folder, "record.txt")
+        script = os.path.join(self.temp_folder, "fake_worker.py")
+        with open(script, "w") as fp:
+            fp.write(FAKE_WORKER.format(self.record, LOG_PATH))
+        self.process = SolverProcess(
+            cmd="{0} {1}".format(sys.executable, script), workdir=self.workdir)
+        self.problem = IncrementalProblem(
+            1.*np.array([[1, 0, 0, 0], [0, 0, 0, 1]]),
+            1.*np.array([[1], [1]]), 1.*np.array([[0, 1, 1, 0]]),
+            {'f': 0, 'l': 0, 'q': [], 's': [2]})
+
+    def tearDown(self):
+        self.process.kill()
+        shutil.rmtree(self.temp_folder)
+
+    def sent(self):
+        with open(self.record) as fp:
+            return fp.read().splitlines()
+
+    def test_solve(self):
+        '''
+        The whole problem is sent first and only the new rows after that.
+        The result is read from the result file, the log only holds what
+        was printed inside the job's frame, and no files are left behind.
+        '''
+        with open(LOG_PATH) as fp:
+            log = fp.read()
+        result = self.problem.solve(self.process)
+        self.problem.append_rows(1.*np.array([[0, 1, 1, 0]]), [-0.5])
+        result = self.problem.solve(self.process)
+
+        self.assertEqual(self.sent(), ["A K b c", "dA db m0"])
+        self.assertEqual(result['status_num'], 0)
+        self.assertEqual(result['Xvars'][0][0, 1], 1. / 3)
+        self.assertEqual(str(result['msg']), log)
+        self.process.close()
+        self.assertEqual(os.listdir(self.workdir), [])
+
+    def test_lost_problem(self):
+        '''
+        If the process no longer holds the problem, the error it reports
+        makes the whole problem be sent again.
+        '''
+        self.problem.solve(self.process)
+        self.process.call("forget")
+        self.problem.append_rows(1.*np.array([[0, 1, 1, 0]]), [-0.5])
+        result = self.problem.solve(self.process)
+        self.assertEqual(self.sent(), ["A K b c", "dA db m0", "A K b c"])
+        self.assertEqual(result['status_num'], 0)
+
+    def test_error_frame(self):
+        '''
+        An error reported in a job's frame is raised with its identifier,
+        and the process carries on with the next job.
+        '''
+        self.problem.write_delta_to_mat(
+            os.path.join(self.temp_folder, "delta.mat"))
+        with self.assertRaises(WorkerJobError) as context:
+            self.process.call("SDPT3append", "missing",
+                              os.path.join(self.temp_folder, "delta.mat"),
+                              os.path.join(self.temp_folder, "result.mat"))
+        self.assertEqual(context.exception.identifier, "SDPT3glue:notheld")
+        self.assertEqual(str(context.exception), "No problem is held.")
+        self.assertTrue(self.process.alive)
+        self.assertEqual(str(self.process.call("forget")), "")
+
+    def test_died_in_frame(self):
+        '''
+        A process which stops in the middle of a job is reported as such.
+        '''
+        with self.assertRaises(ls.SubprocessCallError):
+            self.process.call("die")
+        self.process._proc.wait()
+        self.assertFalse(self.process.alive)
+
+
+if __name__ == '__main__':
+    unittest.main()
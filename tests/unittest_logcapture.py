@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# tests/unittest_logcapture.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Unit tests for the capture of solver logs.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import sdpt3glue.result as res
+from sdpt3glue.logcapture import SolverLog, save_log
+from helpers import LOG_PATH
+
+
+class TestSolverLog(unittest.TestCase):
+    '''
+    Testing logs kept in memory and logs moved to a file.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+        with open(LOG_PATH) as fp:
+            self.text = fp.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def make_log(self, spill_threshold):
+        log = SolverLog(spill_threshold, spill_dir=self.temp_folder)
+        for line in self.text.splitlines(True):
+            log.append(line)
+        return log
+
+    def test_in_memory(self):
+        '''
+        A small log stays in memory.
+        '''
+        log = self.make_log(len(self.text))
+        self.assertFalse(log.spilled)
+        self.assertEqual(str(log), self.text)
+        self.assertEqual(len(log), len(self.text))
+        self.assertEqual(os.listdir(self.temp_folder), [])
+
+    def test_spilled(self):
+        '''
+        Past the threshold the log moves to a file, and only its summary
+        stays in memory.
+        '''
+        log = self.make_log(100)
+        self.assertTrue(log.spilled)
+        self.assertEqual(os.path.dirname(log.path), self.temp_folder)
+        self.assertEqual(str(log), self.text)
+        self.assertNotIn("X{1}", log.summary)
+        self.assertIn("obj =", log.summary)
+        self.assertIn("number of iterations", log.summary)
+        self.assertIsNone(log._lines)
+
+        self.assertIn("SDPT3: Infeasible path-following algorithms", log)
+        self.assertIn("X{1} =\n", log)
+        self.assertNotIn("X{2}", log)
+
+        log.close()
+        self.assertEqual(os.listdir(self.temp_folder), [])
+
+    def test_results_agree(self):
+        '''
+        The result of a log moved to a file is the same as that of the string.
+        '''
+        log = self.make_log(100)
+        from_log = res.make_result_dict(log)
+        from_text = res.make_result_dict(self.text)
+        self.assertIs(from_log['msg'], log)
+        for key in ('iterations', 'primal_z', 'dual_z', 'status_num', 'rel_gap'):
+            self.assertEqual(from_log[key], from_text[key])
+        self.assertEqual(len(from_log['Xvars']), 1)
+        self.assertTrue(np.allclose(from_log['Xvars'][0], from_text['Xvars'][0]))
+
+    def test_save_log(self):
+        '''
+        Logs and strings are saved alike.
+        '''
+        for msg in (self.make_log(100), self.text):
+            target = os.path.join(self.temp_folder, "saved.txt")
+            save_log(msg, target)
+            with open(target) as fp:
+                self.assertEqual(fp.read(), self.text)
+            os.remove(target)
+
+
+class TestExtractX(unittest.TestCase):
+    '''
+    Testing X read one row at a time.
+    '''
+
+    def test_blocks(self):
+        '''
+        Scalars, vectors and matrices are read as extract_X reads them.
+        '''
+        text = ("obj =\n1 1\n>>\n"
+                "X{1} =\n2.5\n>>\n"
+                "X{2} =\n1  -2  Inf\n>>\n"
+                "X{3} =\n   1  0\n   0  3e-05\n>>\n")
+        lines = res.extract_X_from_lines(text.splitlines(True))
+        whole = res.extract_X(text)
+        self.assertEqual(lines[0], whole[0])
+        for i in (1, 2):
+            self.assertTrue(np.array_equal(lines[i], whole[i]))
+        self.assertEqual(lines[1].shape, (1, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# tests/unittest_progressive.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Unit tests for progressive-accuracy solves.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import scipy.io
+
+import sdpt3glue
+from helpers import LOG_PATH
+
+
+class TestProgressiveSolve(unittest.TestCase):
+    '''
+    Testing the screening and refinement stages.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+        self.matfile = os.path.join(self.temp_folder, "problem.mat")
+        open(self.matfile, "w").close()
+        # A stand-in for Octave which keeps a copy of the settings file each
+        # solve is given, and prints a finished log.
+        fake = os.path.join(self.temp_folder, "fake_octave.sh")
+        with open(fake, "w") as fp:
+            fp.write(
+                "settings=$(tail -1 \"$1\" | cut -d\"'\" -f4)\n"
+                "calls={0}/calls\n"
+                "echo x >> $calls\n"
+                "cp \"$settings\" {0}/settings$(wc -l < $calls).mat\n"
+                "cat {1}\n".format(self.temp_folder, LOG_PATH))
+        self.cmd = "sh " + fake
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def output(self, name):
+        return os.path.join(self.temp_folder, name)
+
+    def test_stages(self):
+        '''
+        Screening runs with loose tolerances, and refinement with tight ones
+        from the screening solution; both are recorded.
+        '''
+        with sdpt3glue.ProgressiveSolve(
+                self.matfile, sdpt3glue.OCTAVE, cmd=self.cmd) as solve:
+            screened = solve.screen(output_target=self.output("loose.txt"))
+            self.assertEqual(screened['stage'], 'screening')
+            self.assertEqual(len(screened['stages']), 1)
+            self.assertFalse(screened['stages'][0]['warm_started'])
+            self.assertEqual(screened['stages'][0]['options']['gaptol'], 1e-3)
+
+            refined = solve.refine(output_target=self.output("tight.txt"))
+            self.assertEqual(refined['stage'], 'refinement')
+            self.assertEqual([s['stage'] for s in refined['stages']],
+                             ['screening', 'refinement'])
+            self.assertTrue(refined['stages'][1]['warm_started'])
+            self.assertEqual(refined['stages'][1]['iterations'], 6)
+            folder = os.path.dirname(solve.matfile)
+
+        self.assertFalse(os.path.exists(folder))
+        self.assertTrue(os.path.exists(self.matfile))
+
+        loose = scipy.io.loadmat(self.output("settings1.mat"))
+        tight = scipy.io.loadmat(self.output("settings2.mat"))
+        self.assertNotIn('X0', loose)
+        self.assertEqual(loose['OPTIONS']['gaptol'][0, 0], 1e-3)
+        self.assertEqual(tight['OPTIONS']['gaptol'][0, 0], 1e-8)
+        self.assertEqual(tight['X0'][0, 0].shape, (2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
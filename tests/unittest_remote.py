@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# tests/unittest_remote.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Unit tests for solves on a solver server.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+import sdpt3glue
+import sdpt3glue.solve_locally as ls
+from sdpt3glue import remote
+from helpers import LOG_PATH
+
+
+SLOW_COMMAND = "grep '|' {0} | head -3; sh -c 'sleep 60'; true".format(LOG_PATH)
+
+PROBLEM = (np.array([[1., 0., 0., 1.]]), np.array([[1.]]),
+           np.array([[2., 1., 1., 3.]]).T, {'s': [2.]})
+
+
+class TestProtocol(unittest.TestCase):
+    '''
+    Testing the parts of the messages.
+    '''
+
+    def test_arrays(self):
+        '''
+        A Sedumi problem survives being packed and unpacked.
+        '''
+        header, payload = remote.pack_sedumi(*PROBLEM)
+        A, b, c, K = remote.unpack_sedumi(header, payload)
+        np.testing.assert_array_equal(A.toarray(), PROBLEM[0])
+        np.testing.assert_array_equal(b, PROBLEM[1])
+        np.testing.assert_array_equal(c, PROBLEM[2])
+        self.assertEqual(K, {'s': [2.]})
+
+    def test_address(self):
+        '''
+        Hosts may be given with or without a port.
+        '''
+        self.assertEqual(remote._address("example.org:9000"),
+                         ("example.org", 9000))
+        self.assertEqual(remote._address("example.org"),
+                         ("example.org", remote.DEFAULT_PORT))
+        self.assertEqual(remote._address(("example.org", "9000")),
+                         ("example.org", 9000))
+
+
+class TestRemoteSolve(unittest.TestCase):
+    '''
+    Testing solves on a local solver server.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+        self.matfile = os.path.join(self.temp_folder, "problem.mat")
+        sdpt3glue.write_sedumi_to_mat(*(PROBLEM + (self.matfile,)))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def server(self, cmd="cat {0} #".format(LOG_PATH)):
+        return remote.SolverServer(port=0, cmd=cmd)
+
+    def test_solve(self):
+        '''
+        A .mat file or arrays are solved on the server, with progress sent
+        back as it is made, and one connection serves both solves.
+        '''
+        rows = []
+        with self.server() as server, \
+                remote.RemoteClient([server.server_address]) as client:
+            log = client.solve(self.matfile, progress_callback=rows.append)
+            self.assertEqual(len(client._idle[server.server_address]), 1)
+            other = client.solve(arrays=PROBLEM)
+            self.assertEqual(len(client._idle[server.server_address]), 1)
+
+        self.assertEqual([row['iteration'] for row in rows], range(7))
+        self.assertEqual(len(log.blocks), 1)
+        np.testing.assert_array_equal(log.blocks[0], other.blocks[0])
+        self.assertIsNotNone(log.peak_rss)
+        self.assertTrue(os.path.exists(self.matfile))
+
+    def test_solve_mat(self):
+        '''
+        The REMOTE mode of sdpt3_solve_mat gives the same result as a local
+        solve.
+        '''
+        cmd = "cat {0} #".format(LOG_PATH)
+        local = sdpt3glue.sdpt3_solve_mat(
+            self.matfile, sdpt3glue.OCTAVE,
+            output_target=os.path.join(self.temp_folder, "local.txt"),
+            discard_matfile=False, cmd=cmd)
+        with self.server(cmd) as server:
+            result = sdpt3glue.sdpt3_solve_mat(
+                self.matfile, sdpt3glue.REMOTE,
+                hosts=["{0}:{1}".format(*server.server_address)])
+        self.assertEqual(result['status_num'], local['status_num'])
+        self.assertEqual(result['iterations'], local['iterations'])
+        np.testing.assert_array_equal(result['Xvars'][0], local['Xvars'][0])
+        self.assertFalse(os.path.exists(self.matfile))
+
+    def test_timeout(self):
+        '''
+        A timed out solve is stopped on the server, with the progress made
+        until then, and the connection stays usable.
+        '''
+        with self.server(SLOW_COMMAND) as server, \
+                remote.RemoteClient([server.server_address]) as client:
+            start = time.time()
+            with self.assertRaises(ls.SolveTimeout) as context:
+                client.solve(self.matfile, timeout=0.5)
+            self.assertLess(time.time() - start, 10)
+            self.assertEqual(context.exception.progress['iteration'], 2)
+
+            server.solve_kwargs['cmd'] = "cat {0} #".format(LOG_PATH)
+            self.assertEqual(len(client.solve(self.matfile).blocks), 1)
+
+    def test_unreachable(self):
+        '''
+        A solve with no reachable host fails.
+        '''
+        with self.server() as server:
+            address = server.server_address
+        client = remote.RemoteClient([address], connect_timeout=1.)
+        with self.assertRaises(ls.SubprocessCallError):
+            client.solve(self.matfile)
+        self.assertGreater(client._down_until[address], time.time())
+
+
+if __name__ == '__main__':
+    unittest.main()
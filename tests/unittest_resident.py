@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# tests/unittest_resident.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Unit tests for problems kept resident in a solver process.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import scipy.io
+import scipy.sparse
+
+import sdpt3glue.sedumi_writer as sw
+from sdpt3glue import logcapture
+from sdpt3glue.resident import ResidentProblem
+from sdpt3glue.worker import WorkerJobError
+from helpers import LOG_PATH
+
+
+class FakeProcess(object):
+    '''
+    Stands in for a SolverProcess running SDPT3update.m: it records the
+    variables of each job's .mat file, holds the keys of full problems and
+    saves X to the result file.
+    '''
+
+    def __init__(self, workdir):
+        self.workdir = workdir
+        self.alive = True
+        self.resident = set()
+        self.held = set()
+        self.sent = []
+
+    def job_path(self, path):
+        return path
+
+    def call(self, function, key, path, result_file):
+        data = scipy.io.loadmat(path)
+        self.sent.append(sorted(k for k in data if not k.startswith('__')))
+        if 'A' in data:
+            self.held.add(key)
+        elif key not in self.held:
+            raise WorkerJobError("SDPT3glue:notheld", "not held")
+        X = np.empty((1, 1), dtype=object)
+        X[0, 0] = np.array([[1., 1. / 3], [1. / 3, 1.]])
+        scipy.io.savemat(result_file, {
+            'obj': np.zeros((1, 2)), 'X': X, 'Z': X, 'y': np.ones((2, 1)),
+            'info': {'termcode': 0.}})
+        log = logcapture.SolverLog()
+        with open(LOG_PATH) as fp:
+            for line in fp:
+                log.append(line)
+        return log
+
+
+class TestResidentProblem(unittest.TestCase):
+    '''
+    Testing which data is sent to the solver process.
+    '''
+
+    def setUp(self):
+        self.A = 1.*np.array([[1, 0, 0, 0],
+                              [0, 0, 0, 1]])
+        self.b = 1.*np.array([1, 1]).reshape(2, 1)
+        self.c = 1.*np.array([0, 1, 1, 0]).reshape(1, 4)
+        self.K = {'f': 0, 'l': 0, 'q': [], 's': [2]}
+        self.temp_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def test_content_hash(self):
+        '''
+        The key depends on the contents of A and K, not on their storage.
+        '''
+        first = ResidentProblem(self.A, self.b, self.c, self.K)
+        second = ResidentProblem(
+            scipy.sparse.coo_matrix(self.A), 2 * self.b, 2 * self.c, self.K)
+        self.assertEqual(first.key, second.key)
+        other = ResidentProblem(2 * self.A, self.b, self.c, self.K)
+        self.assertNotEqual(first.key, other.key)
+        self.assertNotEqual(
+            sw.content_hash(self.A, self.K, self.b),
+            sw.content_hash(self.A, self.K, 2 * self.b))
+
+    def test_only_vectors_sent(self):
+        '''
+        After the first solve only b and c are sent, along with the solve's
+        settings, and X comes back in the result file.
+        '''
+        process = FakeProcess(self.temp_folder)
+        problem = ResidentProblem(self.A, self.b, self.c, self.K)
+        result = problem.solve(process)
+        self.assertEqual(result['status_num'], 0)
+        self.assertEqual(result['Xvars'][0][0, 1], 1. / 3)
+        self.assertIs(problem.holder, process)
+
+        problem.solve(process, b=[2, 2])
+        problem.solve(process, c=[0, 2, 2, 0], options={'maxit': 10})
+        self.assertEqual(process.sent, [['A', 'K', 'b', 'c'],
+                                        ['b', 'c'],
+                                        ['OPTIONS', 'b', 'c']])
+        self.assertTrue(np.allclose(problem.b.ravel(), [2, 2]))
+        self.assertEqual(os.listdir(self.temp_folder), [])
+
+    def test_shared_key(self):
+        '''
+        A second problem with the same A and K uses what the process holds.
+        '''
+        process = FakeProcess(self.temp_folder)
+        ResidentProblem(self.A, self.b, self.c, self.K).solve(process)
+        ResidentProblem(self.A, -self.b, self.c, self.K).solve(process)
+        self.assertEqual(process.sent[1], ['b', 'c'])
+
+    def test_lost_problem(self):
+        '''
+        If the process no longer holds the problem, the whole of it is sent.
+        '''
+        process = FakeProcess(self.temp_folder)
+        problem = ResidentProblem(self.A, self.b, self.c, self.K)
+        problem.solve(process)
+        process.held.clear()
+        problem.solve(process)
+        self.assertEqual(process.sent[1:], [['b', 'c'], ['A', 'K', 'b', 'c']])
+
+    def test_vector_sizes(self):
+        '''
+        b and c must fit A.
+        '''
+        problem = ResidentProblem(self.A, self.b, self.c, self.K)
+        with self.assertRaises(ValueError):
+            problem.set_vectors(b=[1, 2, 3])
+        with self.assertRaises(ValueError):
+            problem.set_vectors(c=[1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,407 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# tests/unittest_result.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Unit tests for reading SDPT3 solve logs.
+"""
+
+import collections
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+import numpy as np
+import scipy.io
+
+import sdpt3glue
+import sdpt3glue.result as res
+import sdpt3glue.solve_locally as ls
+from helpers import LOG_PATH
+
+
+class TestMakeResultDict(unittest.TestCase):
+    '''
+    Testing result extraction from a complete SDPT3 log.
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        with open(LOG_PATH) as fp:
+            cls.msg = fp.read()
+
+    def test_summary(self):
+        '''
+        The summary section is read into the result dict.
+        '''
+        result = res.make_result_dict(self.msg)
+        self.assertEqual(result['status_num'], 0)
+        self.assertEqual(result['iterations'], 6)
+        self.assertAlmostEqual(result['primal_z'], -2.)
+        self.assertAlmostEqual(result['rel_gap'], 3.61e-10)
+        self.assertAlmostEqual(result['solve_time'], 0.21)
+        self.assertFalse(result['stopped_early'])
+
+    def test_duals(self):
+        '''
+        Printed y and Z blocks are read into the result, and kept out of the
+        log's summary.
+        '''
+        msg = self.msg + "y =\n         1.5\n>>\nZ{1} =\n 1 1\n 1 1\n>>\n"
+        for log in (msg, ls.logcapture.SolverLog()):
+            if not isinstance(log, str):
+                for line in msg.splitlines(True):
+                    log.append(line)
+                self.assertNotIn("Z{1}", log.summary)
+            result = res.make_result_dict(log)
+            np.testing.assert_array_equal(result['y'], [1.5])
+            np.testing.assert_array_equal(result['Zvars'][0], np.ones((2, 2)))
+            self.assertEqual(len(result['Xvars']), 1)
+
+        result = res.make_result_dict(self.msg)
+        self.assertIsNone(result['y'])
+        self.assertEqual(result['Zvars'], [])
+
+    def test_X(self):
+        '''
+        X is rebuilt from its printed form.
+        '''
+        result = res.make_result_dict(self.msg)
+        self.assertEqual(len(result['Xvars']), 1)
+        self.assertTrue(np.allclose(result['Xvars'][0], [[1, -1], [-1, 1]]))
+
+
+class TestLogParser(unittest.TestCase):
+    '''
+    Testing the single scan parser of printed logs.
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        with open(LOG_PATH) as fp:
+            cls.msg = fp.read()
+
+    def test_split(self):
+        '''
+        The blocks are cut out of the summary, in the order printed.
+        '''
+        msg = self.msg + "y =\n  1\n  2\n>>\nZ{1} =\n 1 1\n 1 1\n>>\n"
+        summary, sections = res.split_log(msg)
+        self.assertEqual([name for name, _ in sections], ['X', 'y', 'Z'])
+        self.assertNotIn("X{1}", summary)
+        self.assertIn("norm(X), norm(y), norm(Z)", summary)
+        self.assertEqual(res.extract_prop_dict(summary),
+                         res.extract_prop_dict(msg))
+
+    def test_summary_skips_blocks(self):
+        '''
+        Only the summary is read for the result information, so a block
+        which can't be parsed doesn't matter to it.
+        '''
+        msg = self.msg.replace("-1           1", "-1  garbled  1")
+        self.assertEqual(res.extract_prop_dict(msg)['iterations'], 6)
+        with self.assertRaises(ValueError):
+            res.extract_X(msg)
+
+    def test_chunked(self):
+        '''
+        A matrix printed in chunks of columns is put back together.
+        '''
+        msg = ("X{1} =\n\n  Columns 1 through 3\n\n   1   2   3\n   4   5   6\n"
+               "\n  Column 4\n\n   7\n   8\n\n>>\n"
+               "X{2} =\n\n Columns 1 and 2:\n\n   1   2\n\n Column 3:\n\n"
+               "   3\n\n>>\n")
+        Xvars = res.extract_X(msg)
+        np.testing.assert_array_equal(Xvars[0], [[1, 2, 3, 7], [4, 5, 6, 8]])
+        np.testing.assert_array_equal(Xvars[1], [[1, 2, 3]])
+
+    def test_blocks(self):
+        '''
+        Scalars and matrices, with blank lines or special values, are read.
+        '''
+        blocks = res.extract_blocks(
+            "X{1} =\n2.5\n>>\nX{2} =\n 1 NaN\n\n -Inf 3e-05\n>>\ny =\n 1\n>>\n",
+            ('X',))
+        self.assertEqual(blocks.keys(), ['X'])
+        self.assertEqual(blocks['X'][0], 2.5)
+        np.testing.assert_array_equal(blocks['X'][1],
+                                      [[1, np.nan], [-np.inf, 3e-05]])
+
+
+class TestSolveResult(unittest.TestCase):
+    '''
+    Testing the result object and its lazily read solution.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+        with open(LOG_PATH) as fp:
+            self.msg = fp.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def test_dict_access(self):
+        '''
+        The result is looked up, changed and copied as a dict.
+        '''
+        result = res.make_result_dict(self.msg)
+        self.assertIsInstance(result, collections.MutableMapping)
+        self.assertEqual(set(result.keys()), set(res.RESULT_KEYS))
+        self.assertEqual(result['iterations'], 6)
+        self.assertIn('Xvars', result)
+        self.assertIsNone(result.get('restore'))
+
+        result['restore'] = {'row_perm': None}
+        self.assertEqual(dict(result)['restore'], {'row_perm': None})
+        self.assertEqual(len(result), len(res.RESULT_KEYS) + 1)
+        del result['restore']
+        with self.assertRaises(KeyError):
+            result['restore']
+        with self.assertRaises(TypeError):
+            del result['y']
+
+        self.assertEqual(result.setdefault('route', 'local'), 'local')
+        self.assertEqual(result.pop('route'), 'local')
+        self.assertNotIn('route', result)
+
+    def test_copy_and_compare(self):
+        '''
+        A copy, or a dict of the same values, compares equal, arrays and
+        all, and changing the copy leaves the original alone.
+        '''
+        result = res.make_result_dict(
+            self.msg + "y =\n  1\n  2\n>>\n")
+        copy = result.copy()
+        self.assertIsInstance(copy, res.SolveResult)
+        self.assertEqual(copy, result)
+        self.assertEqual(result, dict(result))
+        copy['y'] = np.array([1., 3.])
+        self.assertNotEqual(copy, result)
+        np.testing.assert_array_equal(result['y'], [1., 2.])
+
+    def test_changes_kept(self):
+        '''
+        Blocks changed in place stay changed.
+        '''
+        result = res.make_result_dict(self.msg)
+        result['Xvars'][0][0, 0] = 7.
+        result['Xvars'].append(2.)
+        self.assertEqual(result['Xvars'][0][0, 0], 7.)
+        self.assertEqual(len(result['Xvars']), 2)
+
+    def test_lazy_solution(self):
+        '''
+        The solution is read from the log when it is first looked up.
+        '''
+        result = res.make_result_dict(self.msg)
+        self.assertTrue(result._unread)
+        self.assertIsNone(result._Xvars)
+        self.assertTrue(np.allclose(result['Xvars'][0], [[1, -1], [-1, 1]]))
+        self.assertFalse(result._unread)
+
+        # Setting part of the solution keeps the rest.
+        other = res.make_result_dict(self.msg)
+        other['y'] = np.array([1.])
+        self.assertEqual(len(other['Xvars']), 1)
+        np.testing.assert_array_equal(other['y'], [1.])
+
+    def test_packed_blocks(self):
+        '''
+        Symmetric blocks are stored as their upper triangle, and others as
+        they are.
+        '''
+        sym = np.array([[2., 1., 0.], [1., 3., 4.], [0., 4., 5.]])
+        other = np.arange(4.).reshape(2, 2)
+        result = res.SolveResult({'Xvars': [sym, other, 2.5]})
+        packed, kept, _ = result._Xvars
+        np.testing.assert_array_equal(packed.upper, [2, 1, 0, 3, 4, 5])
+        self.assertIs(kept, other)
+        Xvars = result['Xvars']
+        np.testing.assert_array_equal(Xvars[0], sym)
+        np.testing.assert_array_equal(Xvars[1], other)
+        self.assertEqual(Xvars[2], 2.5)
+
+        copy = pickle.loads(pickle.dumps(result))
+        np.testing.assert_array_equal(copy['Xvars'][0], sym)
+
+    def test_log_on_disk(self):
+        '''
+        A log kept as the path of its file is read from there when needed.
+        '''
+        path = os.path.join(self.temp_folder, "log.txt")
+        with open(path, "w") as fp:
+            fp.write(self.msg)
+        log = ls.logcapture.SolverLog()
+        for line in self.msg.splitlines(True):
+            log.append(line)
+        result = res.make_result_dict(log, log_path=path)
+        self.assertIsNone(result._msg)
+        self.assertEqual(result['status_num'], 0)
+        self.assertEqual(result['msg'], self.msg)
+        self.assertEqual(result['Xvars'][0].shape, (2, 2))
+
+
+class TestIterationRows(unittest.TestCase):
+    '''
+    Testing the parsing of rows of SDPT3's iteration table.
+    '''
+
+    def test_parse_iteration_line(self):
+        '''
+        A row gives its numbers, the relative gap and the time in seconds.
+        '''
+        row = res.parse_iteration_line(
+            " 3|0.984|0.990|2.2e-16|2.0e-06|1.3e-03|-1.999024e+00 "
+            "-2.000306e+00| 0:1:02| chol  1  1 \n")
+        self.assertEqual(row['iteration'], 3)
+        self.assertAlmostEqual(row['pstep'], 0.984)
+        self.assertAlmostEqual(row['dinfeas'], 2.0e-6)
+        self.assertAlmostEqual(row['dual_obj'], -2.000306)
+        self.assertAlmostEqual(row['rel_gap'], 1.3e-3 / (1 + 1.999024 + 2.000306))
+        self.assertEqual(row['cputime'], 62)
+
+    def test_other_lines(self):
+        '''
+        Lines which aren't iteration rows are ignored.
+        '''
+        for line in ["it pstep dstep pinfeas dinfeas  gap      prim-obj",
+                     "-------------------------------------------------",
+                     " number of iterations   =  6",
+                     "1|2|3"]:
+            self.assertIsNone(res.parse_iteration_line(line))
+
+    def test_all_rows_of_log(self):
+        '''
+        Every row of the sample log's table is found.
+        '''
+        with open(LOG_PATH) as fp:
+            rows = [res.parse_iteration_line(line) for line in fp]
+        self.assertEqual(
+            [row['iteration'] for row in rows if row is not None], range(7))
+
+
+class TestProgressCallback(unittest.TestCase):
+    '''
+    Testing that solver output is watched while it is printed.
+    '''
+
+    def test_stop(self):
+        '''
+        A callback returning True stops the command long before it would
+        have finished on its own.
+        '''
+        seen = []
+
+        def callback(row):
+            seen.append(row['iteration'])
+            return row['iteration'] >= 1
+
+        command = "grep '|' {0}; sleep 30".format(LOG_PATH)
+        start = time.time()
+        with self.assertRaises(ls.SolveStopped) as context:
+            ls._run_command_get_output(command, progress_callback=callback)
+        self.assertLess(time.time() - start, 10)
+        self.assertEqual(seen, [0, 1])
+        self.assertEqual(context.exception.progress['iteration'], 1)
+
+        result = res.make_interrupted_result(
+            context.exception.msg, context.exception.progress, "stopped",
+            stopped_early=True)
+        self.assertTrue(result['stopped_early'])
+        self.assertTrue(res.was_interrupted(result))
+        self.assertEqual(result['iterations'], 1)
+        self.assertAlmostEqual(result['dual_z'], -1.898052)
+
+    def test_no_stop(self):
+        '''
+        Without a stop, the whole output is returned.
+        '''
+        msg = ls._run_command_get_output(
+            "cat {0}".format(LOG_PATH), progress_callback=lambda row: False)
+        with open(LOG_PATH) as fp:
+            self.assertEqual(str(msg), fp.read())
+        self.assertFalse(res.was_interrupted(res.make_result_dict(msg)))
+
+
+# Stands in for Octave: saves RESULT_SOURCE where the runner script asks for
+# the results, and prints the log.
+FAKE_INTERPRETER = """
+import re, shutil, sys
+call = open(sys.argv[-1]).read().splitlines()[-1]
+shutil.copy({0!r}, re.findall("'([^']*)'", call)[2])
+sys.stdout.write(open({1!r}).read())
+"""
+
+
+class TestResultFile(unittest.TestCase):
+    '''
+    Testing results saved by the solver as a .mat file.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+        self.result_mat = os.path.join(self.temp_folder, "saved.mat")
+        X = np.empty((1, 2), dtype=object)
+        X[0, 0] = np.array([[5., 1. / 3], [1. / 3, 7.]])
+        X[0, 1] = np.array([[2.]])
+        Z = np.empty((1, 2), dtype=object)
+        Z[0, 0] = np.eye(2)
+        Z[0, 1] = np.array([[0.]])
+        scipy.io.savemat(self.result_mat, {
+            'obj': np.array([[1.5, 1.4]]), 'X': X, 'Z': Z,
+            'y': np.array([[1.], [2.]]),
+            'info': {'termcode': 0., 'iter': 12., 'msg': 'done'}})
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def test_read_result_mat(self):
+        '''
+        Blocks, y and the info struct are read at full precision.
+        '''
+        solution = res.read_result_mat(self.result_mat)
+        self.assertEqual(solution['Xvars'][0][0, 1], 1. / 3)
+        self.assertEqual(solution['Xvars'][1], 2.)
+        np.testing.assert_array_equal(solution['y'], [1., 2.])
+        np.testing.assert_array_equal(solution['Zvars'][0], np.eye(2))
+        np.testing.assert_array_equal(solution['obj'], [1.5, 1.4])
+        self.assertEqual(solution['info'],
+                         {'termcode': 0, 'iter': 12, 'msg': 'done'})
+
+    def test_solve(self):
+        '''
+        A local solve takes X, y and Z from the result file rather than the
+        log, and removes the file.
+        '''
+        script = os.path.join(self.temp_folder, "fake.py")
+        with open(script, "w") as fp:
+            fp.write(FAKE_INTERPRETER.format(self.result_mat, LOG_PATH))
+        matfile = os.path.join(self.temp_folder, "problem.mat")
+        open(matfile, "w").close()
+        result = sdpt3glue.sdpt3_solve_mat(
+            matfile, sdpt3glue.OCTAVE,
+            output_target=os.path.join(self.temp_folder, "output.txt"),
+            cmd="{0} {1}".format(sys.executable, script))
+        self.assertEqual(result['status_num'], 0)
+        self.assertEqual(result['Xvars'][0][0, 1], 1. / 3)
+        np.testing.assert_array_equal(result['y'], [1., 2.])
+        self.assertEqual(len(result['Zvars']), 2)
+        self.assertEqual(result['info']['iter'], 12)
+        self.assertEqual(sorted(os.listdir(self.temp_folder)),
+                         ["fake.py", "output.txt", "saved.mat"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -16,12 +16,18 @@ Created on Thu Apr  7 16:22:17 2016
 @author: trish
 """
 
+import os
+import shutil
+import tempfile
 import unittest
 
 import numpy as np
 import scipy
+import scipy.io
 
 import sdpt3glue.sedumi_writer as sw
+import sdpt3glue.result as res
+from sdpt3glue.solve_cvxopt import solve_sedumi
 
 
 class TestSlackSimplification(unittest.TestCase):
@@ -219,6 +225,173 @@ class TestSWHelpers(unittest.TestCase):
         self.assertIsInstance(K['p'][0], (np.float32, np.float64, float))
         self.assertIsInstance(K['q'][1], (np.float32, np.float64, float))
 
+    def test_read_sedumi_mat(self):
+        '''
+        Test that a problem written by write_sedumi_to_mat reads back the same.
+        '''
+        A = 1.*np.array([[1, 0, 0, 0, 2],
+                         [0, 0, 0, 1, 0]])
+        b = 1.*np.array([1, 1]).reshape(2, 1)
+        c = 1.*np.array([0, 1, 1, 0, 3]).reshape(1, 5)
+        K = {'f': 0, 'l': 1, 'q': [], 's': [2]}
+        temp_folder = tempfile.mkdtemp()
+        try:
+            target = os.path.join(temp_folder, 'problem.mat')
+            sw.write_sedumi_to_mat(A, b, c, dict(K), target)
+            A2, b2, c2, K2 = sw.read_sedumi_mat(target)
+        finally:
+            shutil.rmtree(temp_folder)
+
+        self.assertTrue(np.allclose(A2.toarray(), A))
+        self.assertTrue(np.allclose(b2, b))
+        self.assertTrue(np.allclose(c2, c))
+        self.assertEqual(K2['l'], 1)
+        self.assertEqual(K2['s'], [2])
+
+    def test_write_solve_settings(self):
+        '''
+        Test that warm starts are saved as the cell arrays and column vector
+        SDPT3warmstart.m expects, from a result dict or a tuple, and options
+        as a struct.
+        '''
+        X = [np.array([[2., 1.], [1., 2.]]), 3., np.array([1., 2., 3.])]
+        temp_folder = tempfile.mkdtemp()
+        try:
+            target = os.path.join(temp_folder, 'warm.mat')
+            sw.write_solve_settings(target, {'Xvars': X, 'y': [1., -1.]})
+            data = scipy.io.loadmat(target)
+            self.assertNotIn('Z0', data)
+            self.assertNotIn('OPTIONS', data)
+            self.assertEqual(data['X0'].shape, (1, 3))
+            self.assertTrue(np.allclose(data['X0'][0, 0], X[0]))
+            self.assertEqual(data['X0'][0, 1].shape, (1, 1))
+            self.assertEqual(data['X0'][0, 2].shape, (3, 1))
+            self.assertTrue(np.allclose(data['y0'], [[1.], [-1.]]))
+
+            sw.write_solve_settings(target, (None, None, X[:1]), {'maxit': 5.})
+            data = scipy.io.loadmat(target)
+            self.assertEqual(data['OPTIONS']['maxit'][0, 0], 5.)
+            self.assertNotIn('X0', data)
+            self.assertNotIn('y0', data)
+            self.assertTrue(np.allclose(data['Z0'][0, 0], X[0]))
+        finally:
+            shutil.rmtree(temp_folder)
+
+    def test_write_options_to_mat(self):
+        '''
+        Test that a copy of a problem with options added reads back the same.
+        '''
+        A = 1.*np.array([[1, 0, 2]])
+        K = {'f': 0, 'l': 3, 'q': [], 's': []}
+        temp_folder = tempfile.mkdtemp()
+        try:
+            source = os.path.join(temp_folder, 'problem.mat')
+            target = os.path.join(temp_folder, 'copy.mat')
+            sw.write_sedumi_to_mat(A, np.ones((1, 1)), np.ones((1, 3)),
+                                   dict(K), source)
+            sw.write_options_to_mat({'gaptol': 1e-3}, source, target)
+            A2, _, _, K2 = sw.read_sedumi_mat(target)
+            data = scipy.io.loadmat(target)
+        finally:
+            shutil.rmtree(temp_folder)
+        self.assertTrue(np.allclose(A2.toarray(), A))
+        self.assertEqual(K2['l'], 3)
+        self.assertEqual(data['OPTIONS']['gaptol'][0, 0], 1e-3)
+
+
+class TestReordering(unittest.TestCase):
+    '''
+    Testing fill-reducing reordering of constraints.
+    '''
+
+    def setUp(self):
+        '''
+        Set up a chain of constraints over nonnegative variables, listed out
+        of order, followed by one constraint on a 2x2 PSD block.
+        '''
+        self.K = {'f': 0, 'l': 4, 'q': [], 's': [2]}
+        self.A = 1.*np.array([[1, 1, 0, 0, 0, 0, 0, 0],
+                              [0, 0, 1, 1, 0, 0, 0, 0],
+                              [0, 1, 1, 0, 0, 0, 0, 0],
+                              [0, 0, 0, 1, 1, 0, 0, 0],
+                              [0, 0, 0, 0, 0, 1, 1, 0]])
+        self.b = 1.*np.array([1, 2, 3, 4, 5]).reshape(5, 1)
+
+    def test_schur_complement_pattern(self):
+        '''
+        Constraints are coupled when they share a variable or a PSD block.
+        '''
+        pattern = sw.schur_complement_pattern(self.A, self.K).toarray()
+        self.assertTrue(np.allclose(
+            pattern, np.array([[1, 0, 1, 0, 0],
+                               [0, 1, 1, 1, 0],
+                               [1, 1, 1, 0, 0],
+                               [0, 1, 0, 1, 1],
+                               [0, 0, 0, 1, 1]])), "pattern was {0}".format(pattern))
+
+    def test_reorder_constraints(self):
+        '''
+        The reordered problem holds the same rows, and restore_duals puts
+        duals computed for it back in the original order.
+        '''
+        A, b, row_perm = sw.reorder_constraints(self.A, self.b, self.K)
+        self.assertEqual(sorted(row_perm), range(5))
+        self.assertTrue(np.allclose(A, self.A[row_perm, :]))
+        self.assertTrue(np.allclose(b, self.b[row_perm, :]))
+
+        result = {'y': self.b[row_perm, 0]}
+        res.restore_duals(result, {'row_perm': row_perm})
+        self.assertTrue(np.allclose(result['y'], self.b[:, 0]))
+
+
+class TestDualRecovery(unittest.TestCase):
+    '''
+    Testing that duals of a simplified problem are mapped back to the rows of
+    the problem before simplification.
+    '''
+
+    def setUp(self):
+        '''
+        Set up min x + 2 X12 s.t. x = X11, trace(X) = 1, with a trivial row,
+        where x is free and X is 2x2 PSD.
+        '''
+        self.A = 1.*np.array([[1, -1, 0, 0, 0],
+                              [0, 1, 0, 0, 1],
+                              [0, 0, 0, 0, 0]])
+        self.b = 1.*np.array([0, 1, 0]).reshape(3, 1)
+        self.c = 1.*np.array([1, 0, 1, 1, 0]).reshape(1, 5)
+        self.K = {'f': 1, 'l': 0, 'q': [], 's': [2]}
+
+    def test_recover_duals(self):
+        '''
+        The recovered duals are feasible for the original problem and reach
+        its optimal value, and restore_duals applies a reordering first.
+        '''
+        recovery = {}
+        A, b, c, K, _ = sw.simplify_sedumi_model(
+            self.A.copy(), self.b.copy(), self.c.copy(), dict(self.K),
+            recovery=recovery)
+        self.assertEqual(recovery['rows_kept'], [1])
+        result = solve_sedumi(A, b, c, K)
+
+        y = res.recover_duals(result['y'], recovery)
+        self.assertEqual(y.shape, (3,))
+        self.assertEqual(y[2], 0.)
+        z = self.c.ravel() - self.A.T.dot(y)
+        self.assertAlmostEqual(z[0], 0.)
+        self.assertGreater(np.linalg.eigvalsh(z[1:].reshape(2, 2)).min(),
+                           -1e-6)
+        self.assertAlmostEqual(self.b.ravel().dot(y), result['dual_z'],
+                               places=6)
+
+        restored = res.restore_duals(
+            {'y': result['y']}, {'row_perm': [0], 'recovery': recovery})
+        self.assertTrue(np.allclose(restored['y'], y))
+
+        X, warm_y, Z = res.reorder_warm_start(
+            (None, y, None), {'row_perm': [0], 'recovery': recovery})
+        self.assertTrue(np.allclose(warm_y, result['y']))
+
 
 if __name__ == '__main__':
     unittest.main()
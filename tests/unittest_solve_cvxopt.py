@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# tests/unittest_solve_cvxopt.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Unit tests for in-process solves with cvxopt.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import scipy.sparse
+
+import sdpt3glue
+import sdpt3glue.solve_cvxopt as sc
+from helpers import LOG_PATH
+
+
+def eigenvalue_problem():
+    '''
+    The smallest eigenvalue of C as an SDP: min <C, X> s.t. trace(X) = 1,
+    X psd, in Sedumi format.
+    '''
+    A = np.array([[1., 0., 0., 1.]])
+    b = np.array([[1.]])
+    c = np.array([[2., 1., 1., 3.]]).T
+    return A, b, c, {'s': [2.]}
+
+
+class TestCvxoptSolve(unittest.TestCase):
+    '''
+    Testing solves with cvxopt's conelp.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def test_sdp(self):
+        '''
+        X, y and Z agree with the known solution, and Z = c - A'y is dual
+        feasible.
+        '''
+        A, b, c, K = eigenvalue_problem()
+        result = sc.solve_sedumi(A, b, c, K)
+        smallest = (5 - np.sqrt(5)) / 2
+        self.assertEqual(result['status_num'], 0)
+        self.assertAlmostEqual(result['primal_z'], smallest, places=5)
+        self.assertAlmostEqual(result['dual_z'], smallest, places=5)
+        self.assertAlmostEqual(result['y'][0], smallest, places=5)
+
+        X, = result['Xvars']
+        self.assertEqual(X.shape, (2, 2))
+        self.assertTrue(np.allclose(X, X.T))
+        self.assertAlmostEqual(np.trace(X), 1., places=6)
+        Z, = result['Zvars']
+        self.assertGreater(np.linalg.eigvalsh(Z).min(), -1e-6)
+        self.assertAlmostEqual(np.sum(X * Z), 0., places=5)
+
+    def test_mixed_cones(self):
+        '''
+        Free, linear and second order cone variables are split into SDPT3's
+        blocks: min x2 s.t. x1 = 1, x1 + x2 >= 0 (i.e. x3 = x1 + x2 in l),
+        ||(x1)|| <= t with t = 2 (x4, x5 in q).
+        '''
+        A = scipy.sparse.csc_matrix(np.array([
+            [1., 0., 0., 0., 0.],
+            [1., 1., -1., 0., 0.],
+            [0., 0., 0., 1., 0.],
+            [-1., 0., 0., 0., 1.],
+        ]))
+        b = np.array([[1.], [0.], [2.], [0.]])
+        c = np.array([[0., 1., 0., 0., 0.]])
+        K = {'f': 2., 'l': 1., 'q': [2.], 's': []}
+        result = sc.solve_sedumi(A, b, c, K, options={'gaptol': 1e-9})
+        self.assertEqual(result['status_num'], 0)
+        self.assertAlmostEqual(result['primal_z'], -1., places=5)
+        self.assertEqual([block.shape for block in result['Xvars']],
+                         [(2, 1), (1, 1), (2, 1)])
+
+    def test_infeasible(self):
+        '''
+        An infeasible problem is reported as such, without X.
+        '''
+        A = np.array([[1.]])
+        b = np.array([[-1.]])
+        c = np.array([[1.]])
+        result = sc.solve_sedumi(A, b, c, {'l': 1.})
+        self.assertEqual(result['status_num'], 1)
+        self.assertEqual(result['Xvars'], [])
+
+    def test_unsupported_cones(self):
+        '''
+        Rotated cones are refused.
+        '''
+        with self.assertRaises(ValueError):
+            sc.solve_sedumi(np.ones((1, 3)), [[1.]], [[1., 1., 1.]],
+                            {'r': [3.]})
+
+    def test_solve_mat(self):
+        '''
+        The CVXOPT mode solves a .mat file, saves its log and removes the
+        file.
+        '''
+        matfile = os.path.join(self.temp_folder, "problem.mat")
+        output = os.path.join(self.temp_folder, "output.txt")
+        sdpt3glue.write_sedumi_to_mat(*eigenvalue_problem(), target=matfile)
+        result = sdpt3glue.sdpt3_solve_mat(
+            matfile, sdpt3glue.CVXOPT, output_target=output,
+            options={'maxit': 50})
+        self.assertEqual(result['status_num'], 0)
+        self.assertFalse(result['timed_out'])
+        self.assertEqual(os.listdir(self.temp_folder), ["output.txt"])
+        with open(output) as fp:
+            self.assertIn("termination code = 0", fp.read())
+
+    def test_auto(self):
+        '''
+        AUTO uses cvxopt for small problems and the fallback for larger ones.
+        '''
+        small = os.path.join(self.temp_folder, "small.mat")
+        sdpt3glue.write_sedumi_to_mat(*eigenvalue_problem(), target=small)
+        self.assertTrue(sc.suits_cvxopt(small))
+        result = sdpt3glue.sdpt3_solve_mat(small, sdpt3glue.AUTO)
+        self.assertIn("cvxopt", result['msg'])
+
+        large = os.path.join(self.temp_folder, "large.mat")
+        m = sc.MAX_ROWS + 1
+        sdpt3glue.write_sedumi_to_mat(
+            scipy.sparse.eye(m, format='csc'), np.ones((m, 1)),
+            np.ones((m, 1)), {'l': float(m)}, large)
+        self.assertFalse(sc.suits_cvxopt(large))
+        result = sdpt3glue.sdpt3_solve_mat(
+            large, sdpt3glue.AUTO, fallback=sdpt3glue.OCTAVE,
+            output_target=os.path.join(self.temp_folder, "output.txt"),
+            cmd="cat {0} #".format(LOG_PATH))
+        self.assertIn("SDPT3", str(result['msg']))
+
+
+if __name__ == '__main__':
+    unittest.main()
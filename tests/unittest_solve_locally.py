@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# tests/unittest_solve_locally.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Unit tests for running local solves.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from distutils.spawn import find_executable
+
+import numpy as np
+
+import sdpt3glue
+import sdpt3glue.solve_locally as ls
+from sdpt3glue.cores import available_cpus
+from sdpt3glue.worker import SolverProcess
+from helpers import LOG_PATH
+
+
+# Prints the start of a log, then hangs in a child process of its own which
+# only a signal to the whole process group stops.
+SLOW_COMMAND = "grep '|' {0} | head -3; sh -c 'sleep 60'; true".format(LOG_PATH)
+
+
+class TestTimeout(unittest.TestCase):
+    '''
+    Testing timeouts and cancellation of solver commands.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def test_timeout(self):
+        '''
+        The command is stopped once the timeout passes, and the progress made
+        until then is kept.
+        '''
+        start = time.time()
+        with self.assertRaises(ls.SolveTimeout) as context:
+            ls._run_command_get_output(SLOW_COMMAND, timeout=0.5)
+        self.assertLess(time.time() - start, 10)
+        self.assertEqual(context.exception.progress['iteration'], 2)
+
+    def test_term_ignored(self):
+        '''
+        A child which ignores the polite signal is killed along with the
+        rest of the group, even once the command's shell has exited.
+        '''
+        start = time.time()
+        with self.assertRaises(ls.SolveTimeout) as context:
+            ls._run_command_get_output(
+                "sh -c 'trap \"\" TERM; sleep 20; echo late'; true",
+                timeout=0.5)
+        self.assertLess(time.time() - start, 15)
+        self.assertNotIn("late", str(context.exception.msg))
+
+    def test_cancel(self):
+        '''
+        Setting the cancel event stops the command.
+        '''
+        cancel = threading.Event()
+        threading.Timer(0.3, cancel.set).start()
+        with self.assertRaises(ls.SolveCancelled):
+            ls._run_command_get_output(SLOW_COMMAND, cancel=cancel)
+
+    def test_no_timeout(self):
+        '''
+        A command finishing in time is unaffected.
+        '''
+        msg = ls._run_command_get_output("cat {0}".format(LOG_PATH), timeout=30)
+        with open(LOG_PATH) as fp:
+            self.assertEqual(str(msg), fp.read())
+
+    def test_solve_mat(self):
+        '''
+        A timed out solve gives a result marked as such, and its .mat file
+        and runner script are removed.
+        '''
+        matfile = os.path.join(self.temp_folder, "problem.mat")
+        output = os.path.join(self.temp_folder, "output.txt")
+        open(matfile, "w").close()
+        result = sdpt3glue.sdpt3_solve_mat(
+            matfile, sdpt3glue.OCTAVE, output_target=output,
+            cmd=SLOW_COMMAND, timeout=0.5)
+        self.assertTrue(result['timed_out'])
+        self.assertFalse(result['stopped_early'])
+        self.assertEqual(result['status_verb'], "timed out")
+        self.assertEqual(result['iterations'], 2)
+        self.assertEqual(os.listdir(self.temp_folder), ["output.txt"])
+
+    def test_solver_process(self):
+        '''
+        A worker job which runs too long stops the worker.
+        '''
+        proc = SolverProcess(cmd=SLOW_COMMAND, workdir=self.temp_folder)
+        with self.assertRaises(ls.SolveTimeout):
+            proc.call("SDPT3solve", "problem.mat", timeout=0.5)
+        self.assertFalse(proc.alive)
+        self.assertEqual(os.listdir(self.temp_folder), [])
+
+
+class TestSolveSettings(unittest.TestCase):
+    '''
+    Testing that options and warm starts reach the solve script.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def test_settings_file(self):
+        '''
+        A warm start and options are saved next to the .mat file, handed to
+        SDPT3solve, and removed afterwards.
+        '''
+        matfile = os.path.join(self.temp_folder, "problem.mat")
+        output = os.path.join(self.temp_folder, "output.txt")
+        record = os.path.join(self.temp_folder, "call.txt")
+        open(matfile, "w").close()
+        # The runner script's path is given to cmd as its last argument.
+        cmd = "sh -c 'tail -1 \"$0\" > {0}; cat {1}'".format(record, LOG_PATH)
+        sdpt3glue.sdpt3_solve_mat(
+            matfile, sdpt3glue.OCTAVE, output_target=output, cmd=cmd,
+            warm_start=([np.eye(2)], None, None), options={'gaptol': 1e-4})
+        with open(record) as fp:
+            call = fp.read().strip()
+        self.assertRegexpMatches(
+            call, r"^SDPT3solve\('[^']*problem.mat', '[^']*_settings.mat', "
+            r"'[^']*_result.mat'\);$")
+        self.assertEqual(sorted(os.listdir(self.temp_folder)),
+                         ["call.txt", "output.txt"])
+
+    def test_check_options(self):
+        '''
+        Options are checked against the ones sqlp knows.
+        '''
+        self.assertEqual(sdpt3glue.check_options(None), {})
+        self.assertEqual(
+            sdpt3glue.check_options({'gaptol': 1e-4, 'maxit': 30}),
+            {'gaptol': 1e-4, 'maxit': 30.})
+        for options in ({'gaptoll': 1e-4}, {'gaptol': -1}, {'maxit': 2.5},
+                        {'printlevel': 0}, {'spdensity': "dense"}):
+            with self.assertRaises(ValueError):
+                sdpt3glue.check_options(options)
+
+
+class TestThreads(unittest.TestCase):
+    '''
+    Testing the thread limits and CPU pinning of solver processes.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def test_thread_environment(self):
+        '''
+        Every BLAS thread variable is set, and nothing is changed without a
+        thread count.
+        '''
+        self.assertIsNone(ls.thread_environment(None))
+        env = ls.thread_environment(2)
+        for name in ls.BLAS_THREAD_VARIABLES:
+            self.assertEqual(env[name], "2")
+        self.assertEqual(env.get("PATH"), os.environ.get("PATH"))
+        for threads in (0, 1.5):
+            with self.assertRaises(ValueError):
+                ls.thread_environment(threads)
+
+    def test_matlab_thread_limit(self):
+        '''
+        Matlab is told its thread count before the solve.
+        '''
+        self.assertEqual(ls.matlab_thread_limit(None), "")
+        self.assertEqual(ls.matlab_thread_limit(3), "maxNumCompThreads(3); ")
+
+    @unittest.skipIf(find_executable("taskset") is None, "needs taskset")
+    def test_pinned_solve(self):
+        '''
+        The solver command runs with the thread count in its environment and
+        on the CPUs given.
+        '''
+        matfile = os.path.join(self.temp_folder, "problem.mat")
+        output = os.path.join(self.temp_folder, "output.txt")
+        record = os.path.join(self.temp_folder, "record.txt")
+        open(matfile, "w").close()
+        cpu = available_cpus()[0]
+        cmd = ("echo $OPENBLAS_NUM_THREADS > {0}; taskset -cp $$ >> {0}; "
+               "cat {1} #").format(record, LOG_PATH)
+        result = sdpt3glue.sdpt3_solve_mat(
+            matfile, sdpt3glue.OCTAVE, output_target=output, cmd=cmd,
+            threads=1, cpus=[cpu])
+        self.assertEqual(result['status_num'], 0)
+        with open(record) as fp:
+            threads, affinity = fp.read().splitlines()
+        self.assertEqual(threads, "1")
+        self.assertTrue(affinity.endswith(": {0}".format(cpu)))
+
+    def test_pin_without_cpus(self):
+        '''
+        Without cpus, the command is left as it is.
+        '''
+        self.assertEqual(ls.pin_command("octave x.m", None), "octave x.m")
+
+
+if __name__ == '__main__':
+    unittest.main()
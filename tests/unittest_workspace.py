@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# tests/unittest_workspace.py
+#
+# Copyright (c) 2016 Trish Gillett-Kawamoto
+#
+# This software is released under the MIT License.
+#
+# http://opensource.org/licenses/mit-license.php
+#
+"""
+Unit tests for solving from workspace folders.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import sdpt3glue
+import sdpt3glue.workspace as ws
+from helpers import LOG_PATH
+
+
+class TestWorkspace(unittest.TestCase):
+    '''
+    Testing that workspaces are made in the right place and cleaned up.
+    '''
+
+    def setUp(self):
+        self.temp_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_folder)
+
+    def test_folders(self):
+        '''
+        RAM workspaces are made on a tmpfs folder when there is one.
+        '''
+        self.assertEqual(ws.transport_folder(ws.DISK), tempfile.gettempdir())
+        if os.access("/dev/shm", os.W_OK):
+            self.assertEqual(ws.transport_folder(ws.RAM), "/dev/shm")
+        with self.assertRaises(AssertionError):
+            ws.transport_folder("floppy")
+
+        with ws.workspace(ws.RAM) as folder:
+            self.assertEqual(os.path.dirname(folder), ws.transport_folder(ws.RAM))
+            open(os.path.join(folder, "problem.mat"), "w").close()
+        self.assertFalse(os.path.exists(folder))
+
+    def test_solve_mat(self):
+        '''
+        With a transport, the runner script is written to a workspace, the
+        workspace is removed, and the .mat file given is kept unless it is to
+        be discarded.
+        '''
+        matfile = os.path.join(self.temp_folder, "problem.mat")
+        output = os.path.join(self.temp_folder, "output.txt")
+        record = os.path.join(self.temp_folder, "script.txt")
+        open(matfile, "w").close()
+        # The runner script's path is given to cmd as its last argument.
+        cmd = "sh -c 'echo \"$0\" > {0}; cat {1}'".format(record, LOG_PATH)
+
+        result = sdpt3glue.sdpt3_solve_mat(
+            matfile, sdpt3glue.OCTAVE, output_target=output,
+            discard_matfile=False, cmd=cmd, transport=sdpt3glue.RAM)
+        self.assertEqual(result['status_num'], 0)
+        with open(record) as fp:
+            script = os.path.abspath(fp.read().strip())
+        folder = os.path.dirname(script)
+        self.assertEqual(os.path.dirname(folder), ws.transport_folder(ws.RAM))
+        self.assertFalse(os.path.exists(folder))
+        self.assertTrue(os.path.exists(matfile))
+
+        os.remove(output)
+        sdpt3glue.sdpt3_solve_mat(
+            matfile, sdpt3glue.OCTAVE, output_target=output, cmd=cmd,
+            transport=sdpt3glue.DISK)
+        self.assertFalse(os.path.exists(matfile))
+
+
+if __name__ == '__main__':
+    unittest.main()